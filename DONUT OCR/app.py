@@ -1,75 +1,183 @@
 import gradio as gr
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from ocr_engine import DonutOCR
-from llm_enhancer import GOTEnhancer
 from PIL import Image
+from model_manager import ModelManager
 
-# Initialize Models (Lazy loading recommended for apps, but we do it globally for simple demo)
-# Note: This will download GBs of data on first run.
-print("Initializing models... (This may take time)")
-try:
-    donut_engine = DonutOCR()
-    # got_engine = GOTEnhancer() # Uncomment if you have GPU and want to load both at once. 
-    # For a GitHub demo, we might want to flag this.
-    got_engine = None 
-except Exception as e:
-    print(f"Error loading models: {e}")
-    donut_engine = None
-    got_engine = None
-
-def process_file(file_obj, use_enhancement):
+# Models are loaded lazily on first use and shared across requests.
+# MODEL_RAM_BUDGET_MB caps how much the engines may hold at once: when both don't fit,
+# the idle one is unloaded (LRU) before the other loads. MODEL_IDLE_SECONDS unloads
+# engines nobody has used for a while.
+# Note: the first use of each model downloads GBs of weights.
+models = ModelManager()
+
+
+def load_donut():
+    from ocr_engine import DonutOCR
+    # DONUT_BACKEND=int8 or onnx selects a CPU-optimized backend (see ocr_engine.load_model)
+    # DONUT_TASK=cord-v2-fast trades encoder resolution and output length for speed (see ocr_engine.TASKS)
+    return DonutOCR(backend=os.getenv("DONUT_BACKEND", "eager"), task=os.getenv("DONUT_TASK", "cord-v2"))
+
+
+def load_got():
+    from llm_enhancer import GOTEnhancer
+    return GOTEnhancer()
+
+
+# Estimates are replaced by the measured footprint after the first load
+models.register("donut", load_donut, estimated_mb=850)
+models.register("got", load_got, estimated_mb=2300)
+models.start_reaper()
+
+
+# Image decoding runs here so it overlaps with model inference
+io_pool = ThreadPoolExecutor(max_workers=int(os.getenv("IO_WORKERS", "4")), thread_name_prefix="image-io")
+
+
+def load_image(path):
+    return Image.open(path).convert("RGB")
+
+
+def model_status_markdown():
+    status = models.status()
+    budget = f"{status['budget_mb']} MB" if status["budget_mb"] else "unlimited"
+    lines = [
+        f"**RAM budget:** {budget} &nbsp; **Resident:** {status['resident_mb']} MB",
+        "",
+        "| Model | State | In use | Size (MB) | Loads | Last load (s) | Unloads | Last unload (s) |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for m in status["models"]:
+        lines.append(
+            f"| {m['name']} | {m['state']} | {m['in_use']} | {m['size_mb']} | {m['loads']} | "
+            f"{m['last_load_seconds'] or '-'} | {m['unloads']} | {m['last_unload_seconds'] or '-'} |"
+        )
+    return "\n".join(lines)
+
+def process_file(file_obj, use_enhancement, donut_result=None, image=None, got_engine=None):
     """
     Main processing pipeline.
+    `donut_result` (and the decoded `image`) can be passed in when Donut already ran
+    on this file as part of a batch; `got_engine` when the caller already holds GOT.
     """
-    if not donut_engine:
-        return "Models not loaded. Check console for errors."
-
-    image = Image.open(file_obj.name).convert("RGB")
+    if image is None:
+        image = load_image(file_obj.name)
     
     # 1. Donut OCR (Structure Extraction)
-    print(f"Running Donut on {file_obj.name}...")
-    donut_result = donut_engine.process_image(image)
+    if donut_result is None:
+        print(f"Running Donut on {file_obj.name}...")
+        with models.use("donut") as donut_engine:
+            donut_result = donut_engine.process_image(image)
     donut_json_str = json.dumps(donut_result, indent=2)
     
     final_output = f"--- Donut OCR (Structured) ---\n{donut_json_str}\n"
 
     # 2. GOT Enhancement (VLM Refinement)
     if use_enhancement:
-        if got_engine is None:
-            # Lazy load GOT if selected
-            try:
-                global got_ocr # Using global to keep it loaded
-                if 'got_ocr' not in globals() or got_ocr is None:
-                     # This is just a simulation of lazy loading.
-                     # In real code, we'd initialize the class instance here.
-                     pass 
-                # For now, let's assume we proceed or fail gracefully
-                final_output += "\n\n--- GOT-OCR 2.0 Enhancement ---\n(GOT Engine not fully loaded in this snippet to save RAM, uncomment in code)\n"
-                # real call:
-                # got_res = got_engine.enhance_text(image, donut_json_str)
-                # final_output += got_res
-            except Exception as e:
-                final_output += f"\nError in Enhancement: {e}"
-        else:
+        try:
             print(f"Running GOT Enhancement...")
-            got_res = got_engine.enhance_text(image, donut_json_str)
+            if got_engine is None:
+                with models.use("got") as got_engine:
+                    got_res = got_engine.enhance_text(image, donut_json_str)
+            else:
+                got_res = got_engine.enhance_text(image, donut_json_str)
             final_output += f"\n\n--- GOT-OCR 2.0 Enhancement ---\n{got_res}"
+        except Exception as e:
+            final_output += f"\nError in Enhancement: {e}"
 
     return final_output
 
+def file_section(file_obj, body):
+    return f"### File: {os.path.basename(file_obj.name)}\n\n{body}\n{'='*40}\n"
+
+def progress_markdown(sections, total, enhancing=0):
+    if len(sections) < total:
+        status = "Scanning..."
+    elif enhancing:
+        status = f"Enhancing {enhancing} file(s)..."
+    else:
+        status = "Scan complete"
+    return "\n".join([f"**{status}** {len(sections)}/{total} file(s)\n"] + sections)
+
 def app_interface(files, enhance_chk):
-    results = []
+    """
+    Streams each file's result as soon as it is ready.
+    Images are decoded on the I/O pool one batch ahead of the model, so loading the
+    next batch overlaps with Donut inference on the current one.
+    With enhancement on, each file's Donut result is still shown as soon as its batch
+    finishes; once every Donut batch has run, GOT enhances all files in one session
+    (so each model is loaded, and possibly swapped out, once per scan) and each file's
+    section is replaced by its enhanced result.
+    """
     if not files:
-        return "No files uploaded."
-        
-    for f in files:
-        file_name = os.path.basename(f.name)
-        res = process_file(f, enhance_chk)
-        results.append(f"### File: {file_name}\n\n{res}\n{'='*40}\n")
-    
-    return "\n".join(results)
+        yield "No files uploaded."
+        return
+
+    try:
+        with models.use("donut") as donut_engine:
+            batch_size = donut_engine.estimate_batch_size()
+    except Exception as e:
+        print(f"Error loading models: {e}")
+        yield f"Models not loaded: {e}"
+        return
+
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    print(f"Running Donut on {len(files)} file(s) in {len(batches)} batch(es)...")
+    sections, donut_done = [], []
+    yield progress_markdown(sections, len(files))
+
+    prefetched = [io_pool.submit(load_image, f.name) for f in batches[0]]
+    for index, batch in enumerate(batches):
+        loading, prefetched = prefetched, []
+        if index + 1 < len(batches):
+            prefetched = [io_pool.submit(load_image, f.name) for f in batches[index + 1]]
+
+        ready = []
+        for f, future in zip(batch, loading):
+            try:
+                ready.append((f, future.result()))
+            except Exception as e:
+                sections.append(file_section(f, f"Could not read file: {e}"))
+                yield progress_markdown(sections, len(files))
+        if not ready:
+            continue
+
+        # The model is borrowed per batch so another session can get it in between
+        try:
+            with models.use("donut") as donut_engine:
+                donut_results = donut_engine.process_images([image for _, image in ready], batch_size=len(ready))
+        except Exception as e:
+            for f, _ in ready:
+                sections.append(file_section(f, f"Error in Donut OCR: {e}"))
+            yield progress_markdown(sections, len(files))
+            continue
+
+        for (f, image), donut_result in zip(ready, donut_results):
+            sections.append(file_section(f, process_file(f, False, donut_result=donut_result, image=image)))
+            if enhance_chk:
+                # Remember where the Donut-only section is, to replace it once GOT has run
+                donut_done.append((len(sections) - 1, f, image, donut_result))
+            yield progress_markdown(sections, len(files), enhancing=len(donut_done))
+
+    if not donut_done:
+        return
+    print(f"Running GOT Enhancement on {len(donut_done)} file(s)...")
+    remaining = len(donut_done)
+    try:
+        with models.use("got") as got_engine:
+            for index, f, image, donut_result in donut_done:
+                res = process_file(f, True, donut_result=donut_result, image=image, got_engine=got_engine)
+                sections[index] = file_section(f, res)
+                remaining -= 1
+                yield progress_markdown(sections, len(files), enhancing=remaining)
+    except Exception as e:
+        # GOT failed to load; the files it did not reach keep their Donut output
+        for index, f, image, donut_result in donut_done[len(donut_done) - remaining:]:
+            res = process_file(f, False, donut_result=donut_result, image=image)
+            sections[index] = file_section(f, f"{res}\nError in Enhancement: {e}")
+        yield progress_markdown(sections, len(files))
 
 # CSS for a "kickass" look
 custom_css = """
@@ -94,7 +202,16 @@ with gr.Blocks(css=custom_css, theme=gr.themes.Soft()) as demo:
         with gr.Column(scale=2):
             output_display = gr.Markdown(label="System Output", value="Waiting for input stream...")
 
+    with gr.Accordion("Model Status", open=False):
+        status_display = gr.Markdown(value=model_status_markdown())
+        refresh_btn = gr.Button("Refresh")
+
     submit_btn.click(fn=app_interface, inputs=[file_input, enhance_chk], outputs=output_display)
+    refresh_btn.click(fn=model_status_markdown, inputs=None, outputs=status_display)
+
+# Several browser sessions can scan at once; the model manager shares the engines
+# between them and GOT serializes its own inference.
+demo.queue(default_concurrency_limit=int(os.getenv("GRADIO_CONCURRENCY", "4")))
 
 if __name__ == "__main__":
     demo.launch()
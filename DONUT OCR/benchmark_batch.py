@@ -0,0 +1,80 @@
+"""
+Measures DonutOCR throughput (images/sec) against batch size.
+
+Usage:
+    python benchmark_batch.py --images ./samples --batch-sizes 1,2,4,8 --device cpu
+Without --images a set of synthetic receipt images is rendered.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from ocr_engine import DonutOCR
+
+
+def synthetic_receipts(count):
+    images = []
+    for i in range(count):
+        image = Image.new("RGB", (480, 640), "white")
+        draw = ImageDraw.Draw(image)
+        y = 20
+        for line in range(12):
+            draw.text((20, y), f"ITEM {i}-{line}   x{line % 3 + 1}   {(i + 1) * (line + 2) * 1.25:.2f}", fill="black")
+            y += 40
+        draw.text((20, y + 20), f"TOTAL {(i + 1) * 99.5:.2f}", fill="black")
+        images.append(image)
+    return images
+
+
+def load_images(folder, count):
+    paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in (".png", ".jpg", ".jpeg", ".bmp", ".tiff"))
+    if not paths:
+        raise SystemExit(f"No images found in {folder}")
+    # Repeat the set if needed so every batch size sees the same workload
+    return [Image.open(paths[i % len(paths)]).convert("RGB") for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Folder of images (default: synthetic receipts)")
+    parser.add_argument("--count", type=int, default=16, help="Images per measurement")
+    parser.add_argument("--batch-sizes", default="1,2,4,8")
+    parser.add_argument("--repeats", type=int, default=2, help="Timed runs per batch size (best is kept)")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--model", default="naver-clova-ix/donut-base-finetuned-cord-v2")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    images = load_images(args.images, args.count) if args.images else synthetic_receipts(args.count)
+    engine = DonutOCR(model_name=args.model, device=args.device, max_batch_size=max(batch_sizes))
+
+    # Warm-up so the first measurement doesn't pay for lazy initialisation
+    engine.process_images(images[:1], batch_size=1)
+
+    results = []
+    for batch_size in batch_sizes:
+        timings = []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            engine.process_images(images, batch_size=batch_size)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        results.append({
+            "batch_size": batch_size,
+            "images": len(images),
+            "seconds": round(best, 3),
+            "images_per_sec": round(len(images) / best, 3),
+        })
+        print(f"batch={batch_size:>3}  {len(images) / best:8.3f} img/s  ({best:.2f}s for {len(images)} images)")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"device": args.device, "model": args.model, "results": results}, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
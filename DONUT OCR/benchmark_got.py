@@ -0,0 +1,80 @@
+"""
+Measures GOTEnhancer throughput on CPU with several concurrent callers.
+
+Every caller submits its images through the shared inference queue, so this
+shows end-to-end throughput and per-request latency (queue wait included)
+for the in-memory image path versus the tmpfs-file fallback.
+
+Usage:
+    python benchmark_got.py --images ./samples --count 8 --clients 4 --transports memory,file
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from pathlib import Path
+
+from benchmark_batch import load_images, synthetic_receipts
+from llm_enhancer import GOTEnhancer
+
+
+def run(engine, images, clients):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(worker_images):
+        for image in worker_images:
+            started = time.perf_counter()
+            engine.enhance_text(image, "")
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    shards = [images[i::clients] for i in range(clients)]
+    threads = [threading.Thread(target=client, args=(shard,)) for shard in shards]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Folder of images (default: synthetic receipts)")
+    parser.add_argument("--count", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent callers")
+    parser.add_argument("--transports", default="memory,file")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count) if args.images else synthetic_receipts(args.count)
+    engine = GOTEnhancer(device=args.device)
+    engine.enhance_text(images[0], "")  # warm-up
+
+    results = []
+    for transport in args.transports.split(","):
+        engine.image_transport = transport.strip()
+        wall, latencies = run(engine, images, args.clients)
+        row = {
+            "transport": engine.image_transport,
+            "clients": args.clients,
+            "images": len(images),
+            "images_per_sec": round(len(images) / wall, 3),
+            "p50_latency_s": round(statistics.median(latencies), 2),
+            "max_latency_s": round(max(latencies), 2),
+        }
+        results.append(row)
+        print(f"{row['transport']:<7} {row['images_per_sec']:>7} img/s  p50 {row['p50_latency_s']}s  "
+              f"max {row['max_latency_s']}s  ({args.clients} clients)")
+    engine.close()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"device": args.device, "results": results}, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
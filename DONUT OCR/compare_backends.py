@@ -0,0 +1,87 @@
+"""
+Compares DonutOCR inference backends (eager / int8 / onnx) on a fixed image set.
+
+Reports per-image latency and how closely each backend's output matches the
+eager PyTorch baseline (exact JSON match rate and character similarity).
+
+Usage:
+    python compare_backends.py --images ./samples --backends eager,int8,onnx
+Without --images the synthetic receipts from benchmark_batch.py are used.
+The first run of int8/onnx performs the one-time export into the cache dir.
+"""
+import argparse
+import difflib
+import json
+import statistics
+import time
+from pathlib import Path
+
+from benchmark_batch import load_images, synthetic_receipts
+from ocr_engine import BACKENDS, DEFAULT_CACHE_DIR, DonutOCR
+
+
+def flatten(result):
+    """Stable text form of a token2json result for similarity scoring"""
+    return json.dumps(result, sort_keys=True, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Folder of images (default: synthetic receipts)")
+    parser.add_argument("--count", type=int, default=8)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--model", default="naver-clova-ix/donut-base-finetuned-cord-v2")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if "eager" not in backends:
+        backends.insert(0, "eager")  # the baseline everything is compared against
+    images = load_images(args.images, args.count) if args.images else synthetic_receipts(args.count)
+
+    outputs, report = {}, []
+    for backend in backends:
+        started = time.perf_counter()
+        engine = DonutOCR(model_name=args.model, device="cpu", backend=backend, cache_dir=args.cache_dir)
+        load_seconds = time.perf_counter() - started
+
+        engine.process_image(images[0])  # warm-up
+        latencies, results = [], []
+        for image in images:
+            t0 = time.perf_counter()
+            results.append(engine.process_image(image))
+            latencies.append(time.perf_counter() - t0)
+        outputs[backend] = results
+
+        baseline = outputs["eager"]
+        exact = sum(flatten(a) == flatten(b) for a, b in zip(results, baseline)) / len(results)
+        similarity = statistics.mean(
+            difflib.SequenceMatcher(None, flatten(a), flatten(b)).ratio() for a, b in zip(results, baseline)
+        )
+        row = {
+            "backend": backend,
+            "load_seconds": round(load_seconds, 2),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1),
+            "exact_match_vs_eager": round(exact, 3),
+            "similarity_vs_eager": round(similarity, 3),
+        }
+        report.append(row)
+        del engine
+
+    eager_ms = report[0]["mean_ms"]
+    print(f"{'backend':<8} {'load s':>8} {'mean ms':>9} {'speedup':>8} {'exact':>7} {'similar':>8}")
+    for row in report:
+        row["speedup_vs_eager"] = round(eager_ms / row["mean_ms"], 2) if row["mean_ms"] else None
+        print(f"{row['backend']:<8} {row['load_seconds']:>8} {row['mean_ms']:>9} {row['speedup_vs_eager']:>8} "
+              f"{row['exact_match_vs_eager']:>7} {row['similarity_vs_eager']:>8}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"model": args.model, "images": len(images), "results": report}, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,25 @@
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import Future
+
 import torch
 from transformers import AutoModel, AutoTokenizer
 from PIL import Image
 
+# /dev/shm is RAM-backed on Linux, so the file fallback never touches disk there
+TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+IN_MEMORY_IMAGE = "in-memory-image"  # placeholder path; the PIL image is injected via load_image
+
 class GOTEnhancer:
     """
     Uses the GOT-OCR 2.0 model (General OCR Theory) as a VLM to refine/enhance text.
     Model repo: stepfun-ai/GOT-OCR2.0
     """
-    def __init__(self, model_name="stepfun-ai/GOT-OCR2.0", device=None):
+    def __init__(self, model_name="stepfun-ai/GOT-OCR2.0", device=None, image_transport="memory", max_queue=64):
+        # image_transport: "memory" hands PIL images straight to the model, "file" uses unique tmpfs files
+        self.image_transport = image_transport
         self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
         print(f"Loading GOT-OCR 2.0 model: {model_name} on {self.device}...")
         
@@ -25,20 +37,56 @@ class GOTEnhancer:
         if self.device == "cuda":
             self.model = self.model.half() # Use FP16 for speed on GPU
 
+        # All inference goes through one worker thread: the model is not safe to call
+        # concurrently and requests from several app users are simply queued.
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._worker = threading.Thread(target=self._serve, name="got-inference", daemon=True)
+        self._worker.start()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        """Stops the inference worker once queued requests are done (lets the model be freed)."""
+        self._queue.put(None)
+        self._worker.join()
+
+    def submit(self, image_path_or_pil, previous_ocr_text=""):
+        """
+        Queues an enhancement request and returns a concurrent.futures.Future.
+        Raises queue.Full if `max_queue` requests are already waiting.
+        """
+        future = Future()
+        self._queue.put_nowait((image_path_or_pil, previous_ocr_text, future))
+        return future
+
+    def _serve(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            image, previous_ocr_text, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._run(image, previous_ocr_text))
+            except BaseException as e:
+                future.set_exception(e)
+
     def enhance_text(self, image_path_or_pil, previous_ocr_text):
         """
         Uses GOT to 're-read' the image specifically looking to verify/correct the provided text.
+        Safe to call from several threads; calls are served one at a time.
         """
-        if isinstance(image_path_or_pil, str):
-            image_path = image_path_or_pil
-        else:
-            # GOT implementation often expects a file path for its internal processor, 
-            # or we need to pass the PIL image directly if the model supports it.
-            # For safety in this 'file creation' phase, we assume the model's `chat` API handles paths best.
-            # If strictly in-memory, we might need a temp file. Here we assume paths are passed often.
-            image_path = "temp_got_input.jpg"
-            image_path_or_pil.save(image_path)
-        
+        return self.submit(image_path_or_pil, previous_ocr_text).result()
+
+    def _chat(self, image_path):
+        with torch.no_grad():
+             # The model.chat signature depends on the specific implementation in remote code
+             # Standard pattern for LVLMs:
+            return self.model.chat(self.tokenizer, image_path, ocr_type='ocr')
+
+    def _run(self, image_path_or_pil, previous_ocr_text):
         # Prompt engineering for "Enhancement".
         # Since GOT is fundamentally an OCR model, asking it to "correct" might be tricky.
         # Strategy: We ask it to output the text in plain format, then validte.
@@ -47,20 +95,30 @@ class GOTEnhancer:
         
         # For this prototype, we will use GOT to generate a "high quality" reading
         # and assume it is the "enhanced" version compared to Donut's specialized JSON output.
-        # We can also append the specific prompt:
-        
-        query = "OCR: " # Standard GOT prompt trigger
-        
         # Note: True "Language Enhancement" (Text-to-Text) is not GOT's strength. 
         # It is an Image-to-Text model.
         # We will use it to provide a 'Ground Truth' textual representation to compare/merge.
-        
-        with torch.no_grad():
-             # The model.chat signature depends on the specific implementation in remote code
-             # Standard pattern for LVLMs:
-            res = self.model.chat(self.tokenizer, image_path, ocr_type='ocr')
+        if isinstance(image_path_or_pil, str):
+            return self._chat(image_path_or_pil)
+
+        image = image_path_or_pil.convert("RGB")
+        if self.image_transport == "memory" and hasattr(self.model, "load_image"):
+            # GOT's remote code opens `image_file` via self.load_image(path). Hand it the
+            # PIL image directly instead of round-tripping through a JPEG on disk.
+            self.model.load_image = lambda _path: image
+            try:
+                return self._chat(IN_MEMORY_IMAGE)
+            finally:
+                del self.model.load_image  # back to the class implementation
 
-        return res
+        # Fallback: a unique, uncompressed file on tmpfs when available
+        fd, image_path = tempfile.mkstemp(suffix=".bmp", prefix="got-", dir=TMP_DIR)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                image.save(fh, format="BMP")
+            return self._chat(image_path)
+        finally:
+            os.unlink(image_path)
 
 if __name__ == "__main__":
     enhancer = GOTEnhancer()
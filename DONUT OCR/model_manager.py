@@ -0,0 +1,229 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+
+def measure_bytes(engine):
+    """
+    Resident size of an engine's torch weights (parameters + buffers).
+    Returns None when the engine holds no torch module (e.g. ONNX Runtime sessions).
+    """
+    try:
+        import torch
+    except ImportError:
+        return None
+    model = getattr(engine, "model", engine)
+    if not isinstance(model, torch.nn.Module):
+        return None
+    tensors = list(model.parameters()) + list(model.buffers())
+    total = sum(t.numel() * t.element_size() for t in tensors)
+    if total == 0:
+        # Dynamically quantized linears keep packed weights outside .parameters()
+        total = sum(
+            v.numel() * v.element_size()
+            for v in model.state_dict().values()
+            if hasattr(v, "numel") and hasattr(v, "element_size")
+        )
+    return total or None
+
+
+class _Entry:
+    def __init__(self, engine, size_bytes, load_seconds):
+        self.engine = engine
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.in_use = 0
+        self.last_used = time.monotonic()
+
+
+class ModelManager:
+    """
+    Lazily loads heavy model engines and shares one instance of each across requests.
+
+    Engines are registered with a factory and an estimated size. The first `use()`
+    loads the engine; concurrent callers wait for that single load instead of
+    starting their own. When a load would exceed the RAM budget, the least recently
+    used *idle* engines are unloaded first. If every resident engine is busy, the
+    caller waits until one is released. Engines idle for longer than `idle_seconds`
+    are unloaded by a background reaper.
+    """
+
+    def __init__(self, budget_mb=None, idle_seconds=None):
+        if budget_mb is None and os.getenv("MODEL_RAM_BUDGET_MB"):
+            budget_mb = float(os.getenv("MODEL_RAM_BUDGET_MB"))
+        if idle_seconds is None:
+            idle_seconds = float(os.getenv("MODEL_IDLE_SECONDS", "600"))
+        self.budget_bytes = int(budget_mb * MB) if budget_mb else None
+        self.idle_seconds = idle_seconds
+
+        self._specs = {}
+        self._entries = OrderedDict()  # name -> _Entry, least recently used first
+        self._loading = set()
+        self._cond = threading.Condition()
+        self._stats = {}
+        self._reaper = None
+
+    def register(self, name, factory, estimated_mb):
+        """Declare an engine; nothing is loaded until it is first used."""
+        with self._cond:
+            self._specs[name] = {"factory": factory, "estimated_bytes": int(estimated_mb * MB)}
+            self._stats.setdefault(name, {"loads": 0, "unloads": 0, "last_load_seconds": None,
+                                          "last_unload_seconds": None, "total_load_seconds": 0.0})
+
+    @contextmanager
+    def use(self, name):
+        """Borrow a loaded engine for the duration of the block."""
+        engine = self.acquire(name)
+        try:
+            yield engine
+        finally:
+            self.release(name)
+
+    def acquire(self, name):
+        with self._cond:
+            if name not in self._specs:
+                raise KeyError(f"Unknown model '{name}'")
+            while True:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    entry.in_use += 1
+                    self._entries.move_to_end(name)
+                    return entry.engine
+                if name in self._loading:
+                    self._cond.wait()
+                    continue
+                if self._make_room(self._specs[name]["estimated_bytes"]):
+                    self._loading.add(name)
+                    break
+                self._cond.wait()
+
+        # Load outside the lock so other engines stay usable meanwhile
+        try:
+            started = time.perf_counter()
+            engine = self._specs[name]["factory"]()
+            load_seconds = time.perf_counter() - started
+        except BaseException:
+            with self._cond:
+                self._loading.discard(name)
+                self._cond.notify_all()
+            raise
+
+        size = measure_bytes(engine) or self._specs[name]["estimated_bytes"]
+        with self._cond:
+            self._loading.discard(name)
+            # Remember the real footprint so future budget decisions are accurate
+            self._specs[name]["estimated_bytes"] = size
+            entry = _Entry(engine, size, load_seconds)
+            entry.in_use = 1
+            self._entries[name] = entry
+            stats = self._stats[name]
+            stats["loads"] += 1
+            stats["last_load_seconds"] = round(load_seconds, 2)
+            stats["total_load_seconds"] = round(stats["total_load_seconds"] + load_seconds, 2)
+            self._cond.notify_all()
+        print(f"Loaded model '{name}' in {load_seconds:.1f}s ({size / MB:.0f} MB)")
+        return engine
+
+    def release(self, name):
+        with self._cond:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry.in_use = max(0, entry.in_use - 1)
+                entry.last_used = time.monotonic()
+            self._cond.notify_all()
+
+    def _resident_bytes(self):
+        loading = sum(self._specs[n]["estimated_bytes"] for n in self._loading)
+        return sum(e.size_bytes for e in self._entries.values()) + loading
+
+    def _make_room(self, needed):
+        """Evict idle engines (LRU first) until `needed` fits. Caller holds the lock."""
+        if self.budget_bytes is None:
+            return True
+        for name in list(self._entries):
+            if self._resident_bytes() + needed <= self.budget_bytes:
+                break
+            if self._entries[name].in_use == 0:
+                self._unload_locked(name)
+        if self._resident_bytes() + needed <= self.budget_bytes:
+            return True
+        # A model bigger than the whole budget can still load once nothing else is resident
+        return not self._entries and not self._loading
+
+    def _unload_locked(self, name):
+        entry = self._entries.pop(name)
+        started = time.perf_counter()
+        close = getattr(entry.engine, "close", None)
+        if close is not None:
+            close()  # e.g. stop GOTEnhancer's inference worker, which holds a reference
+        del entry.engine
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        unload_seconds = time.perf_counter() - started
+        stats = self._stats[name]
+        stats["unloads"] += 1
+        stats["last_unload_seconds"] = round(unload_seconds, 2)
+        print(f"Unloaded model '{name}' in {unload_seconds:.1f}s")
+        self._cond.notify_all()
+
+    def unload(self, name):
+        """Unload an engine now if nobody is using it. Returns True if it was unloaded."""
+        with self._cond:
+            entry = self._entries.get(name)
+            if entry is None or entry.in_use:
+                return False
+            self._unload_locked(name)
+            return True
+
+    def unload_idle(self, max_idle_seconds=None):
+        """Unload every engine idle for longer than `max_idle_seconds`."""
+        max_idle = self.idle_seconds if max_idle_seconds is None else max_idle_seconds
+        now = time.monotonic()
+        with self._cond:
+            for name, entry in list(self._entries.items()):
+                if entry.in_use == 0 and now - entry.last_used >= max_idle:
+                    self._unload_locked(name)
+
+    def start_reaper(self, interval=60):
+        """Background thread that periodically unloads idle engines."""
+        if self._reaper is not None or not self.idle_seconds:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.unload_idle()
+
+        self._reaper = threading.Thread(target=loop, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def status(self):
+        """Snapshot of every registered engine with load/unload timings."""
+        now = time.monotonic()
+        with self._cond:
+            rows = []
+            for name, spec in self._specs.items():
+                entry = self._entries.get(name)
+                rows.append({
+                    "name": name,
+                    "state": "loading" if name in self._loading else ("loaded" if entry else "unloaded"),
+                    "in_use": entry.in_use if entry else 0,
+                    "size_mb": round((entry.size_bytes if entry else spec["estimated_bytes"]) / MB),
+                    "idle_seconds": round(now - entry.last_used) if entry and not entry.in_use else 0,
+                    **self._stats[name],
+                })
+            return {
+                "budget_mb": round(self.budget_bytes / MB) if self.budget_bytes else None,
+                "resident_mb": round(self._resident_bytes() / MB),
+                "models": rows,
+            }
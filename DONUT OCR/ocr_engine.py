@@ -1,63 +1,272 @@
+import os
 import torch
-from transformers import DonutProcessor, VisionEncoderDecoderModel
+from transformers import DonutProcessor, StoppingCriteria, StoppingCriteriaList, VisionEncoderDecoderModel
 from PIL import Image
 import re
 import json
 
+BACKENDS = ("eager", "int8", "onnx")
+DEFAULT_CACHE_DIR = os.getenv("DONUT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "donut-ocr"))
+
+# Per-task decoding configuration:
+#   prompt          task start token the model was fine-tuned with
+#   max_new_tokens  expected worst-case output length (None = model limit)
+#   image_size      (height, width) fed to the encoder (None = processor default);
+#                   lowering it makes simple documents much cheaper to encode
+#   stop_after_key  optional top-level key whose closing tag ends decoding
+TASKS = {
+    "cord-v2": {"prompt": "<s_cord-v2>", "max_new_tokens": None, "image_size": None, "stop_after_key": None},
+    "cord-v2-fast": {"prompt": "<s_cord-v2>", "max_new_tokens": 256, "image_size": (960, 720), "stop_after_key": None},
+}
+
+
+class StructureClosedCriteria(StoppingCriteria):
+    """
+    Stops each sequence as soon as Donut's tag structure (<s_key>...</s_key>) is closed.
+
+    Once at least one top-level key has been closed and nothing is open, decoding
+    ends when the model emits anything other than a new top-level key, re-opens a
+    key it already closed (the usual repetition loop), or closes `stop_after_key`.
+    Plain EOS still ends a sequence as usual. `cut_at[i]` records where row i's
+    structure ended so the trailing token can be dropped before decoding.
+    """
+
+    def __init__(self, tokenizer, prompt_length, batch_size, stop_after_key=None):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_after_key = stop_after_key
+        self.depth = [0] * batch_size
+        self.closed_keys = [set() for _ in range(batch_size)]
+        self.done = [False] * batch_size
+        self.cut_at = [None] * batch_size
+        self._kinds = {}
+
+    def _kind(self, token_id):
+        if token_id not in self._kinds:
+            token = self.tokenizer.convert_ids_to_tokens(token_id)
+            m = re.fullmatch(r"<(/?)s_(.+)>", token or "")
+            self._kinds[token_id] = (("close" if m.group(1) else "open"), m.group(2)) if m else ("text", None)
+        return self._kinds[token_id]
+
+    def __call__(self, input_ids, scores, **kwargs):
+        position = input_ids.shape[1] - 1
+        if position < self.prompt_length:
+            return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        for row, token_id in enumerate(input_ids[:, -1].tolist()):
+            if self.done[row]:
+                continue
+            kind, key = self._kind(token_id)
+            depth, closed = self.depth[row], self.closed_keys[row]
+            if depth == 0 and closed and (kind != "open" or key in closed):
+                self.done[row], self.cut_at[row] = True, position
+                continue
+            if kind == "open":
+                self.depth[row] = depth + 1
+            elif kind == "close":
+                self.depth[row] = max(0, depth - 1)
+                if self.depth[row] == 0:
+                    closed.add(key)
+                    if key == self.stop_after_key:
+                        self.done[row], self.cut_at[row] = True, position + 1
+        return torch.tensor(self.done, dtype=torch.bool, device=input_ids.device)
+
+
+def _cache_path(cache_dir, model_name, backend):
+    return os.path.join(cache_dir, model_name.strip("/").replace("/", "--"), backend)
+
+
+def load_model(model_name, backend="eager", device="cpu", cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Loads the Donut encoder-decoder for the requested inference backend.
+
+    - eager: full-precision PyTorch (baseline)
+    - int8:  dynamic int8 quantization of every nn.Linear (CPU only). The quantized
+             module is pickled to the cache on first use so later loads skip the
+             fp32 checkpoint entirely.
+    - onnx:  ONNX Runtime encoder + decoder with KV-cache, exported once via
+             optimum and reused from the cache afterwards.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+
+    if backend == "eager":
+        model = VisionEncoderDecoderModel.from_pretrained(model_name)
+        model.to(device)
+        return model.eval()
+
+    if device != "cpu":
+        raise ValueError(f"The '{backend}' backend runs on CPU only")
+    path = _cache_path(cache_dir, model_name, backend)
+
+    if backend == "int8":
+        model_file = os.path.join(path, "model_int8.pt")
+        if os.path.exists(model_file):
+            print(f"Loading cached int8 Donut from {model_file}")
+            return torch.load(model_file, weights_only=False).eval()
+        print("Quantizing Donut linear layers to int8 (one-time)...")
+        model = VisionEncoderDecoderModel.from_pretrained(model_name).eval()
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        os.makedirs(path, exist_ok=True)
+        torch.save(model, model_file)
+        return model
+
+    # ONNX Runtime via optimum (pip install "optimum[onnxruntime]")
+    from optimum.onnxruntime import ORTModelForVision2Seq
+
+    if os.path.exists(os.path.join(path, "config.json")):
+        print(f"Loading cached ONNX Donut from {path}")
+        return ORTModelForVision2Seq.from_pretrained(path, use_cache=True)
+    print("Exporting Donut to ONNX (one-time, may take a few minutes)...")
+    model = ORTModelForVision2Seq.from_pretrained(model_name, export=True, use_cache=True)
+    model.save_pretrained(path)
+    return model
+
+
 class DonutOCR:
     """
     Handles Optical Character Recognition using the Donut model.
     Default model: naver-clova-ix/donut-base-finetuned-cord-v2 (Receipts/Invoices focus)
     """
-    def __init__(self, model_name="naver-clova-ix/donut-base-finetuned-cord-v2", device=None):
+    def __init__(self, model_name="naver-clova-ix/donut-base-finetuned-cord-v2", device=None,
+                 max_batch_size=8, sample_memory_mb=768, backend="eager", cache_dir=DEFAULT_CACHE_DIR,
+                 task="cord-v2"):
+        if task not in TASKS:
+            raise ValueError(f"Unknown task '{task}'. Known tasks: {', '.join(TASKS)}")
+        self.task = task
+        self.max_batch_size = max_batch_size
+        self.sample_memory_mb = sample_memory_mb  # rough activation footprint per image
+        self.backend = backend
+        if backend != "eager":
+            device = "cpu"
         self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Loading Donut model: {model_name} on {self.device}...")
+        print(f"Loading Donut model: {model_name} on {self.device} ({backend})...")
         
         self.processor = DonutProcessor.from_pretrained(model_name)
-        self.model = VisionEncoderDecoderModel.from_pretrained(model_name)
-        self.model.to(self.device)
-        self.model.eval()
+        self.model = load_model(model_name, backend=backend, device=self.device, cache_dir=cache_dir)
+
+    def _load_image(self, image_path_or_pil):
+        if isinstance(image_path_or_pil, str):
+            return Image.open(image_path_or_pil).convert("RGB")
+        return image_path_or_pil.convert("RGB")
 
-    def process_image(self, image_path_or_pil):
+    def available_memory(self):
+        """
+        Bytes free for activations on the inference device (best effort).
+        """
+        if self.device == "cuda":
+            free, _ = torch.cuda.mem_get_info()
+            return free
+        try:
+            with open("/proc/meminfo") as fh:
+                for line in fh:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        try:
+            return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        except (ValueError, OSError, AttributeError):
+            return None
+
+    def estimate_batch_size(self):
+        """
+        Largest batch that fits in half of the currently available memory,
+        assuming roughly `sample_memory_mb` of activations per image.
+        """
+        available = self.available_memory()
+        if available is None:
+            return self.max_batch_size
+        fits = int(available * 0.5 // (self.sample_memory_mb * 1024 * 1024))
+        return max(1, min(self.max_batch_size, fits))
+
+    def process_image(self, image_path_or_pil, task=None):
         """
         Runs the image through Donut and returns the extracted JSON/Text.
         """
-        if isinstance(image_path_or_pil, str):
-            image = Image.open(image_path_or_pil).convert("RGB")
-        else:
-            image = image_path_or_pil.convert("RGB")
+        return self.process_images([image_path_or_pil], batch_size=1, task=task)[0]
 
-        # Prepare input
-        pixel_values = self.processor(image, return_tensors="pt").pixel_values
-        pixel_values = pixel_values.to(pass_device_here_later_fix_this) # Small fix in logic below
+    def process_images(self, images, batch_size=None, task=None):
+        """
+        Runs several images through Donut with one batched `generate` call per chunk.
+        Returns one JSON/Text result per input image, in order.
+        Batch size defaults to what fits in available memory and is halved on OOM.
+        `task` picks an entry from TASKS (defaults to the engine's task).
+        """
+        task = task or self.task
+        if task not in TASKS:
+            raise ValueError(f"Unknown task '{task}'. Known tasks: {', '.join(TASKS)}")
+        images = [self._load_image(img) for img in images]
+        batch_size = batch_size or self.estimate_batch_size()
+
+        results = []
+        start = 0
+        while start < len(images):
+            chunk = images[start:start + batch_size]
+            try:
+                results.extend(self._generate_batch(chunk, TASKS[task]))
+            except RuntimeError as e:
+                message = str(e).lower()
+                oom = "out of memory" in message or "can't allocate memory" in message
+                if not oom or batch_size == 1:
+                    raise
+                if self.device == "cuda":
+                    torch.cuda.empty_cache()
+                batch_size = max(1, batch_size // 2)
+                print(f"Donut OOM, retrying with batch size {batch_size}")
+                continue
+            start += len(chunk)
+        return results
+
+    def _generate_batch(self, images, task):
+        # The processor resizes/pads every image to the same size, so pixel values stack
+        processor_kwargs = {}
+        if task["image_size"]:
+            height, width = task["image_size"]
+            processor_kwargs["size"] = {"height": height, "width": width}
+        pixel_values = self.processor(images, return_tensors="pt", **processor_kwargs).pixel_values
         pixel_values = pixel_values.to(self.device)
 
         # Generate output
-        task_prompt = "<s_cord-v2>" # Specific prompt for CORD dataset; change if using different model
-        decoder_input_ids = self.processor.tokenizer(task_prompt, add_special_tokens=False, return_tensors="pt").input_ids
-        decoder_input_ids = decoder_input_ids.to(self.device)
+        tokenizer = self.processor.tokenizer
+        decoder_input_ids = tokenizer(task["prompt"], add_special_tokens=False, return_tensors="pt").input_ids
+        decoder_input_ids = decoder_input_ids.expand(len(images), -1).to(self.device)
+        prompt_length = decoder_input_ids.shape[1]
+
+        # Budget only what the task needs, never more than the decoder can address
+        max_new_tokens = self.model.config.decoder.max_position_embeddings - prompt_length
+        if task["max_new_tokens"]:
+            max_new_tokens = min(max_new_tokens, task["max_new_tokens"])
+        structure_closed = StructureClosedCriteria(
+            tokenizer, prompt_length, len(images), stop_after_key=task["stop_after_key"]
+        )
 
         with torch.no_grad():
             outputs = self.model.generate(
                 pixel_values,
                 decoder_input_ids=decoder_input_ids,
-                max_length=self.model.decoder.config.max_position_embeddings,
-                early_stopping=True,
-                pad_token_id=self.processor.tokenizer.pad_token_id,
-                eos_token_id=self.processor.tokenizer.eos_token_id,
+                max_new_tokens=max_new_tokens,
+                pad_token_id=tokenizer.pad_token_id,
+                eos_token_id=tokenizer.eos_token_id,
                 use_cache=True,
                 num_beams=1,
-                bad_words_ids=[[self.processor.tokenizer.unk_token_id]],
+                bad_words_ids=[[tokenizer.unk_token_id]],
+                stopping_criteria=StoppingCriteriaList([structure_closed]),
                 return_dict_in_generate=True,
             )
 
-        # Decode output
-        sequence = self.processor.batch_decode(outputs.sequences)[0]
-        sequence = sequence.replace(self.processor.tokenizer.eos_token, "").replace(self.processor.tokenizer.pad_token, "")
-        sequence = re.sub(r"<.*?>", "", sequence, count=1).strip()  # remove first task start token
-        
-        # Convert to JSON if possible
-        return self.processor.token2json(sequence)
+        # Decode output. Sequences that finished early are padded to the batch length,
+        # so each one is cut where its structure closed (or at its first EOS) before
+        # stripping padding.
+        results = []
+        for row, ids in enumerate(outputs.sequences):
+            if structure_closed.cut_at[row] is not None:
+                ids = ids[:structure_closed.cut_at[row]]
+            sequence = tokenizer.decode(ids)
+            sequence = sequence.split(tokenizer.eos_token, 1)[0].replace(tokenizer.pad_token, "")
+            sequence = re.sub(r"<.*?>", "", sequence, count=1).strip()  # remove first task start token
+            # Convert to JSON if possible
+            results.append(self.processor.token2json(sequence))
+        return results
 
 if __name__ == "__main__":
     # Test stub
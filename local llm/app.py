@@ -3,6 +3,13 @@ from llm_processor import LocalLLMProcessor
 
 st.set_page_config(page_title="Local LLM OCR Enhancer", layout="wide")
 
+
+@st.cache_resource(show_spinner=False)
+def get_processor(model_name):
+    """One processor (LLM client, compiled chains, result cache) per model, shared across reruns and sessions."""
+    return LocalLLMProcessor(model_name=model_name)
+
+
 st.title("📄 Local LLM OCR Enhancer")
 st.markdown("Enhance OCR output and ask questions using your local LLM (via Ollama).")
 
@@ -12,6 +19,8 @@ with st.sidebar:
     model_name = st.text_input("Ollama Model Name", value="llama3")
     st.info("Make sure you have Ollama running and the model installed: `ollama pull llama3`")
 
+processor = get_processor(model_name)
+
 # Initialize Session State
 if "enhanced_text" not in st.session_state:
     st.session_state.enhanced_text = ""
@@ -19,23 +28,34 @@ if "enhanced_text" not in st.session_state:
 # Main Layout
 col1, col2 = st.columns(2)
 
+with col2:
+    st.subheader("Enhanced Output")
+    output_slot = st.empty()
+
 with col1:
     st.subheader("Input OCR Text")
     ocr_input = st.text_area("Paste your raw OCR output here:", height=300)
-    
+
     if st.button("Enhance Text"):
         if ocr_input:
-            with st.spinner("Processing with Local LLM..."):
-                processor = LocalLLMProcessor(model_name=model_name)
-                enhanced = processor.enhance_text(ocr_input)
-                st.session_state.enhanced_text = enhanced
+            # Tokens appear in the output column as the model produces them; long input is
+            # enhanced in concurrent chunks that appear in order as they complete
+            progress_bar = st.progress(0.0, text="Enhancing...")
+
+            def report_progress(done, total):
+                progress_bar.progress(done / total, text=f"Enhanced chunk {done}/{total}")
+
+            with output_slot.container():
+                st.session_state.enhanced_text = st.write_stream(
+                    processor.stream_enhance(ocr_input, progress=report_progress)
+                )
+            progress_bar.empty()
+            st.session_state.output_area = st.session_state.enhanced_text
             st.success("Enhancement Complete!")
         else:
             st.warning("Please paste some text first.")
 
-with col2:
-    st.subheader("Enhanced Output")
-    st.text_area("Result:", value=st.session_state.enhanced_text, height=300, key="output_area")
+output_slot.text_area("Result:", height=300, key="output_area")
 
 # Query Section
 st.divider()
@@ -44,11 +64,8 @@ query = st.text_input("Ask a question based on the text:")
 
 if st.button("Get Answer"):
     if st.session_state.enhanced_text and query:
-        with st.spinner("Thinking..."):
-            processor = LocalLLMProcessor(model_name=model_name)
-            answer = processor.query_text(st.session_state.enhanced_text, query)
         st.write("### Answer:")
-        st.write(answer)
+        st.write_stream(processor.stream_query(st.session_state.enhanced_text, query))
     elif not st.session_state.enhanced_text:
         st.warning("Please enhance some text first to provide context.")
     else:
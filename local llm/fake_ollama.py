@@ -0,0 +1,112 @@
+"""
+Minimal fake Ollama server for trying the app and LocalLLMProcessor without a model.
+
+Implements /api/generate (streaming NDJSON and non-streaming), /api/tags and
+/api/version. Responses echo a fixed reply word by word with a configurable
+per-token delay, and every request is printed (including keep_alive) so caching
+and keep-alive behaviour can be checked.
+
+Usage:
+    python fake_ollama.py --port 11435 --token-delay 0.05
+    OLLAMA_HOST=http://127.0.0.1:11435 streamlit run app.py
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_reply(prompt):
+    """Deterministic reply so repeated prompts give identical output"""
+    if "Question:" in prompt:
+        question = prompt.split("Question:", 1)[1].split("Answer:", 1)[0].strip()
+        return f"Based on the context, the answer to '{question}' is not stated explicitly."
+    text = prompt.split("Raw OCR Text:", 1)[-1].strip()
+    # "Correct" the text by collapsing runs of spaces, keeping the line structure
+    return "\n".join(" ".join(line.split()) for line in text.splitlines()) or "(empty)"
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, token_delay=0.02):
+        super().__init__(address, FakeOllamaHandler)
+        self.token_delay = token_delay
+        self.requests = []  # parsed request bodies, for inspection in scripts
+        self.lock = threading.Lock()
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            return self._json(200, {"version": "0.0.0-fake"})
+        if self.path == "/api/tags":
+            return self._json(200, {"models": [{"name": "llama3:latest", "model": "llama3:latest"}]})
+        self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            return self._json(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.requests.append(request)
+        print(f"generate model={request.get('model')} keep_alive={request.get('keep_alive')} "
+              f"stream={request.get('stream', True)} prompt_chars={len(request.get('prompt', ''))}")
+
+        words = fake_reply(request.get("prompt", "")).split(" ")
+        tokens = [word if i == 0 else " " + word for i, word in enumerate(words)]
+        base = {"model": request.get("model"), "created_at": datetime.now(timezone.utc).isoformat()}
+        final = {**base, "response": "", "done": True, "done_reason": "stop",
+                 "prompt_eval_count": len(request.get("prompt", "").split()), "eval_count": len(tokens)}
+
+        if not request.get("stream", True):
+            time.sleep(self.server.token_delay * len(tokens))
+            return self._json(200, {**final, "response": "".join(tokens)})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens + [None]:
+            if token is not None:
+                time.sleep(self.server.token_delay)
+            payload = final if token is None else {**base, "response": token, "done": False}
+            line = (json.dumps(payload) + "\n").encode()
+            self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer((args.host, args.port), token_delay=args.token_delay)
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
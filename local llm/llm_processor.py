@@ -1,20 +1,14 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from difflib import SequenceMatcher
+
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import ChatPromptTemplate
 
-class LocalLLMProcessor:
-    def __init__(self, model_name="llama3"):
-        """
-        Initialize the LLM processor with a specific local model.
-        Ensure you have Ollama installed and the model pulled: `ollama pull <model_name>`
-        """
-        self.llm = OllamaLLM(model=model_name)
-
-    def enhance_text(self, ocr_text):
-        """
-        Takes raw OCR text and uses the LLM to clean and correct it.
-        """
-        prompt = ChatPromptTemplate.from_template(
-            """
+ENHANCE_TEMPLATE = """
             You are an expert editor. Your task is to correct the following text generated by an OCR system.
             The text may contain typos, misread characters, or formatting issues.
             Please output ONLY the corrected text. Do not add any conversational filler.
@@ -22,34 +16,230 @@ class LocalLLMProcessor:
             Raw OCR Text:
             {text}
             """
-        )
-        chain = prompt | self.llm
-        try:
-            result = chain.invoke({"text": ocr_text})
-            return result
-        except Exception as e:
-            return f"Error processing text: {str(e)}"
 
-    def query_text(self, context_text, query):
-        """
-        Allows the user to ask questions based on the provided context text.
-        """
-        prompt = ChatPromptTemplate.from_template(
-            """
+QUERY_TEMPLATE = """
             Answer the question strictly based on the following context.
-            
+
             Context:
             {context}
 
             Question:
             {question}
-            
+
             Answer:
             """
+
+
+def _units(text, max_chars):
+    """
+    Pages (form feeds) and paragraphs (blank lines) as (piece, joiner) pairs.
+    Paragraphs longer than max_chars fall back to lines, and very long lines to hard cuts.
+    """
+    for page in text.split("\f"):
+        for para in re.split(r"\n\s*\n", page):
+            para = para.strip("\n")
+            if not para.strip():
+                continue
+            if len(para) <= max_chars:
+                yield para, "\n\n"
+                continue
+            joiner = "\n\n"
+            for line in para.splitlines():
+                for start in range(0, max(len(line), 1), max_chars):
+                    yield line[start:start + max_chars], joiner
+                    joiner = "\n"
+
+
+def _tail_lines(text, max_chars):
+    """Trailing whole lines of text totalling at most max_chars"""
+    lines, size = [], 0
+    for line in reversed(text.splitlines()):
+        if size + len(line) + 1 > max_chars:
+            break
+        lines.insert(0, line)
+        size += len(line) + 1
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    return lines
+
+
+def chunk_text(text, max_chars=4000, overlap_chars=400):
+    """
+    Splits text into chunks of about max_chars on page/paragraph boundaries.
+    Every chunk after the first starts with the last lines (up to overlap_chars) of the
+    previous one, so the model sees sentences that straddle a boundary in full.
+    Returns (chunk, overlap_lines) pairs, overlap_lines counting the repeated non-blank lines.
+    """
+    bodies, current = [], None
+    for piece, joiner in _units(text, max_chars):
+        if current and len(current[1]) + len(joiner) + len(piece) > max_chars:
+            bodies.append(current)
+            current = None
+        if current is None:
+            current = (joiner, piece)
+        else:
+            current = (current[0], current[1] + joiner + piece)
+    if current:
+        bodies.append(current)
+
+    chunks = []
+    for i, (joiner, body) in enumerate(bodies):
+        overlap = _tail_lines(bodies[i - 1][1], overlap_chars) if i and overlap_chars else []
+        repeated = sum(1 for line in overlap if line.strip())
+        # Keep the paragraph break between the repeated lines and the new text
+        chunks.append(("\n".join(overlap) + joiner + body if overlap else body, repeated))
+    return chunks
+
+
+def _similar(a, b, threshold=0.8):
+    a, b = " ".join(a.lower().split()), " ".join(b.lower().split())
+    return a == b or SequenceMatcher(None, a, b).ratio() >= threshold
+
+
+def overlap_length(previous_lines, lines, expected):
+    """
+    How many leading lines of `lines` repeat the end of `previous_lines`, given that
+    about `expected` non-blank lines were sent twice. Blank lines are ignored and lines
+    are compared fuzzily, since the model may correct the overlap slightly differently
+    each time (or merge/split a line). Counts closest to `expected` are tried first; when
+    nothing matches, 0 is returned so text is duplicated rather than lost.
+    """
+    if not expected:
+        return 0
+    tail = [line for line in previous_lines if line.strip()]
+    head = [i for i, line in enumerate(lines) if line.strip()]
+    slack = max(1, expected // 4)
+    candidates = sorted(range(max(1, expected - slack), expected + slack + 1), key=lambda k: abs(k - expected))
+    for k in candidates:
+        if k > len(tail) or k > len(head):
+            continue
+        if all(_similar(a, lines[j]) for a, j in zip(tail[-k:], head[:k])):
+            return head[k - 1] + 1
+    return 0
+
+
+class LocalLLMProcessor:
+    def __init__(self, model_name="llama3", base_url=None, keep_alive=None, cache_size=None,
+                 chunk_chars=None, chunk_overlap=None, max_concurrency=None):
+        """
+        Initialize the LLM processor with a specific local model.
+        Ensure you have Ollama installed and the model pulled: `ollama pull <model_name>`
+
+        base_url defaults to OLLAMA_HOST (or Ollama's own default, http://127.0.0.1:11434).
+        keep_alive (OLLAMA_KEEP_ALIVE, default "30m") keeps the model loaded between requests.
+        Finished results are kept in an LRU cache of cache_size entries (LLM_RESULT_CACHE_SIZE).
+        Text longer than chunk_chars (LLM_CHUNK_CHARS) is enhanced in overlapping chunks,
+        at most max_concurrency (LLM_MAX_CONCURRENCY) at a time; match it to OLLAMA_NUM_PARALLEL.
+        """
+        self.model_name = model_name
+        self.llm = OllamaLLM(
+            model=model_name,
+            base_url=base_url or os.getenv("OLLAMA_HOST"),
+            keep_alive=keep_alive or os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
         )
-        chain = prompt | self.llm
+        # Chains are built once and reused for every call
+        self.enhance_chain = ChatPromptTemplate.from_template(ENHANCE_TEMPLATE) | self.llm
+        self.query_chain = ChatPromptTemplate.from_template(QUERY_TEMPLATE) | self.llm
+
+        if cache_size is None:
+            cache_size = int(os.getenv("LLM_RESULT_CACHE_SIZE", "128"))
+        self.cache_size = cache_size
+        self.chunk_chars = chunk_chars or int(os.getenv("LLM_CHUNK_CHARS", "4000"))
+        self.chunk_overlap = int(os.getenv("LLM_CHUNK_OVERLAP", "400")) if chunk_overlap is None else chunk_overlap
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _stream(self, chain, inputs, cache_key, error_prefix):
+        """
+        Yields the completion chunk by chunk. A cached result is yielded in one piece;
+        a completed (error-free) stream is added to the cache.
+        """
+        with self._cache_lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
         try:
-            result = chain.invoke({"context": context_text, "question": query})
-            return result
+            for chunk in chain.stream(inputs):
+                chunks.append(chunk)
+                yield chunk
         except Exception as e:
-            return f"Error answering query: {str(e)}"
+            yield f"{error_prefix}: {str(e)}"
+            return
+
+        if self.cache_size > 0:
+            with self._cache_lock:
+                self._cache[cache_key] = "".join(chunks)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+    def stream_enhance(self, ocr_text, progress=None):
+        """
+        Streams the corrected version of raw OCR text.
+        Short text streams token by token. Long text is split with chunk_text, the
+        chunks are enhanced concurrently, and each one is yielded (minus the part that
+        repeats the previous chunk) as soon as everything before it is done.
+        progress(done, total) is called whenever a chunk finishes.
+        """
+        chunks = chunk_text(ocr_text, self.chunk_chars, self.chunk_overlap)
+        if len(chunks) <= 1:
+            yield from self._stream(self.enhance_chain, {"text": ocr_text},
+                                    ("enhance", ocr_text), "Error processing text")
+            if progress:
+                progress(1, 1)
+            return
+        yield from self._enhance_chunks(chunks, progress)
+
+    def _enhance_chunk(self, chunk):
+        """Enhanced text of one chunk (through the result cache)"""
+        return "".join(self._stream(self.enhance_chain, {"text": chunk},
+                                    ("enhance", chunk), "Error processing text"))
+
+    def _enhance_chunks(self, chunks, progress):
+        results = [None] * len(chunks)
+        merged = []
+        next_index = 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm-chunk") as pool:
+            pending = {pool.submit(self._enhance_chunk, chunk): i for i, (chunk, _) in enumerate(chunks)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+                if progress:
+                    progress(len(chunks) - len(pending), len(chunks))
+                # Emit every chunk whose predecessors have all been stitched
+                while next_index < len(chunks) and results[next_index] is not None:
+                    lines = results[next_index].splitlines()
+                    lines = lines[overlap_length(merged, lines, chunks[next_index][1]):]
+                    paragraph_break = bool(lines) and not lines[0].strip()
+                    while lines and not lines[0].strip():
+                        lines.pop(0)
+                    if lines:
+                        separator = ("\n\n" if paragraph_break else "\n") if merged else ""
+                        yield separator + "\n".join(lines)
+                        merged += lines
+                    next_index += 1
+
+    def stream_query(self, context_text, query):
+        """
+        Streams an answer to a question about the provided context text.
+        """
+        return self._stream(self.query_chain, {"context": context_text, "question": query},
+                            ("query", context_text, query), "Error answering query")
+
+    def enhance_text(self, ocr_text, progress=None):
+        """
+        Takes raw OCR text and uses the LLM to clean and correct it.
+        """
+        return "".join(self.stream_enhance(ocr_text, progress=progress))
+
+    def query_text(self, context_text, query):
+        """
+        Allows the user to ask questions based on the provided context text.
+        """
+        return "".join(self.stream_query(context_text, query))
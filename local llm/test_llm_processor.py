@@ -0,0 +1,133 @@
+"""
+Tests for LocalLLMProcessor against the fake Ollama server (no model needed).
+
+Run from this directory:
+    python -m unittest test_llm_processor
+"""
+import threading
+import unittest
+from unittest import mock
+
+from fake_ollama import FakeOllamaServer
+from llm_processor import LocalLLMProcessor, chunk_text, overlap_length
+
+
+def normalized(text):
+    """What the fake server "corrects" text to: runs of spaces collapsed, lines kept"""
+    return "\n".join(" ".join(line.split()) for line in text.splitlines())
+
+
+class FakeOllamaTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.quiet = mock.patch("fake_ollama.print", create=True)
+        cls.quiet.start()
+        cls.server = FakeOllamaServer(("127.0.0.1", 0), token_delay=0)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.quiet.stop()
+
+    def setUp(self):
+        with self.server.lock:
+            self.server.requests.clear()
+
+    def processor(self, **options):
+        return LocalLLMProcessor(base_url=self.base_url, **options)
+
+    def generate_requests(self):
+        with self.server.lock:
+            return list(self.server.requests)
+
+
+class ResultCacheTests(FakeOllamaTestCase):
+    def test_repeated_enhance_is_served_from_cache(self):
+        processor = self.processor()
+        first = processor.enhance_text("Name:   John   Smith")
+        second = processor.enhance_text("Name:   John   Smith")
+        self.assertEqual(first, "Name: John Smith")
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.generate_requests()), 1)
+
+    def test_repeated_query_is_served_from_cache(self):
+        processor = self.processor()
+        answer = processor.query_text("Name: John", "Who is it?")
+        self.assertEqual(processor.query_text("Name: John", "Who is it?"), answer)
+        self.assertIn("Who is it?", answer)
+        self.assertEqual(len(self.generate_requests()), 1)
+
+    def test_cache_evicts_least_recently_used(self):
+        processor = self.processor(cache_size=1)
+        processor.enhance_text("first")
+        processor.enhance_text("second")
+        processor.enhance_text("first")
+        self.assertEqual(len(self.generate_requests()), 3)
+
+    def test_cache_size_zero_disables_caching(self):
+        processor = self.processor(cache_size=0)
+        processor.enhance_text("same text")
+        processor.enhance_text("same text")
+        self.assertEqual(len(self.generate_requests()), 2)
+
+    def test_keep_alive_is_sent(self):
+        self.processor(keep_alive="5m").enhance_text("text")
+        self.assertEqual(self.generate_requests()[0]["keep_alive"], "5m")
+
+    def test_stream_yields_tokens_then_cached_result_whole(self):
+        processor = self.processor()
+        streamed = list(processor.stream_enhance("one two three"))
+        self.assertGreater(len(streamed), 1)
+        self.assertEqual(list(processor.stream_enhance("one two three")), ["".join(streamed)])
+
+
+class ChunkStitchingTests(FakeOllamaTestCase):
+    def paragraphs(self, count):
+        return [f"Paragraph {i}  line one has   some words\nline two of   paragraph {i} here" for i in range(count)]
+
+    def test_long_text_is_enhanced_in_chunks_and_stitched_without_duplicates(self):
+        paragraphs = self.paragraphs(6)
+        text = "\n\n".join(paragraphs)
+        chunks = chunk_text(text, 120, 40)
+        self.assertGreater(len(chunks), 1)
+
+        progress = []
+        result = self.processor(chunk_chars=120, chunk_overlap=40, max_concurrency=3).enhance_text(
+            text, progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(result, "\n\n".join(normalized(p) for p in paragraphs))
+        self.assertEqual(len(self.generate_requests()), len(chunks))
+        self.assertEqual(progress[-1], (len(chunks), len(chunks)))
+
+    def test_chunks_repeat_the_previous_tail(self):
+        chunks = chunk_text("\n\n".join(self.paragraphs(4)), 120, 40)
+        for (previous, _), (chunk, repeated) in zip(chunks, chunks[1:]):
+            self.assertGreater(repeated, 0)
+            overlap = [line for line in chunk.splitlines() if line.strip()][:repeated]
+            self.assertEqual(overlap, [line for line in previous.splitlines() if line.strip()][-repeated:])
+
+    def test_short_text_is_a_single_request(self):
+        self.processor(chunk_chars=4000).enhance_text("short   text")
+        self.assertEqual(len(self.generate_requests()), 1)
+
+
+class OverlapLengthTests(unittest.TestCase):
+    def test_matches_fuzzily_corrected_overlap(self):
+        previous = ["first line", "Name: Jonh Smith", "DOB: 01/02/1980"]
+        lines = ["Name: John Smith", "DOB: 01/02/1980", "City: Springfield"]
+        self.assertEqual(overlap_length(previous, lines, 2), 2)
+
+    def test_ignores_blank_lines(self):
+        self.assertEqual(overlap_length(["a line", "b line"], ["", "b line", "c line"], 1), 2)
+
+    def test_no_match_keeps_everything(self):
+        self.assertEqual(overlap_length(["alpha"], ["something else entirely"], 1), 0)
+        self.assertEqual(overlap_length(["alpha"], ["alpha"], 0), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,24 +1,38 @@
 from django.contrib import admin
-from .models import Document, ChatMessage
+from .models import Document, DocumentText, ChatMessage, ProcessingRun, ProcessingStage
+
+
+class DocumentTextInline(admin.StackedInline):
+    """OCR text on the change page only; the changelist never loads it"""
+    model = DocumentText
+    verbose_name = 'OCR Processing'
+    verbose_name_plural = 'OCR Processing'
+    readonly_fields = ('raw_ocr_text', 'enhanced_text')
+    can_delete = False
+    classes = ('collapse',)
+    
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'file_type', 'email', 'phone')
+    readonly_fields = ('dob_date',)
     search_fields = ('name', 'email', 'phone', 'address')
-    list_filter = ('file_type', 'gender')
-    readonly_fields = ('raw_ocr_text', 'enhanced_text')
+    list_filter = ('file_type', 'gender', 'marital_status', 'state')
+    inlines = (DocumentTextInline,)
     
     fieldsets = (
         ('File Information', {
             'fields': ('uploaded_file', 'file_type')
         }),
         ('Extracted Fields', {
-            'fields': ('name', 'dob', 'address', 'city', 'state', 'phone', 'email', 'gender', 'date')
+            'fields': ('name', 'dob', 'dob_date', 'address', 'city', 'state', 'zip', 'phone', 'email',
+                       'gender', 'marital_status', 'occupation', 'policy_number', 'date')
         }),
-        ('OCR Processing', {
-            'fields': ('raw_ocr_text', 'enhanced_text'),
-            'classes': ('collapse',)
+        ('Emergency Contact', {
+            'fields': ('emergency_contact_name', 'emergency_contact_phone')
         }),
     )
 
@@ -34,3 +48,17 @@ class ChatMessageAdmin(admin.ModelAdmin):
         return obj.question[:50] + '...' if len(obj.question) > 50 else obj.question
     question_preview.short_description = 'Question'
 
+
+
+@admin.register(ProcessingRun)
+class ProcessingRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'document', 'status', 'duration', 'created_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('document', 'status', 'duration', 'stage_timings', 'counters', 'error', 'created_at')
+
+
+@admin.register(ProcessingStage)
+class ProcessingStageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'document', 'stage', 'fingerprint', 'duration', 'updated_at')
+    list_filter = ('stage',)
+    readonly_fields = ('document', 'stage', 'fingerprint', 'artifact', 'duration', 'updated_at')
@@ -0,0 +1,225 @@
+"""
+Admission control
+Bounds concurrent work per endpoint and per client with a short FIFO wait queue; overload is
+rejected fast with 429 and a Retry-After estimated from recent service times
+"""
+import asyncio
+import functools
+import math
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS
+
+
+# Per endpoint: concurrent requests served, requests allowed to wait for a slot, requests
+# (served + waiting) per client, and the longest wait in seconds. Override with ADMISSION_LIMITS.
+DEFAULT_LIMITS = {
+    "upload": {"concurrency": 2, "queue": 8, "per_client": 2, "queue_timeout": 30.0},
+    "chat": {"concurrency": 32, "queue": 64, "per_client": 8, "queue_timeout": 10.0},
+}
+EWMA_ALPHA = 0.2  # weight of the newest service time
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A queued request; woken by a thread Event (sync views) or a Future on its loop (async views)"""
+
+    def __init__(self, client, loop=None):
+        self.client = client
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.admitted = False
+
+    def wake(self):
+        self.admitted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(True))
+
+
+class AdmissionController:
+    """
+    Admits at most `concurrency` requests at once. Up to `queue` more wait in FIFO order for
+    at most `queue_timeout` seconds. A client never holds more than `per_client` of either.
+    """
+
+    def __init__(self, name, concurrency, queue, per_client, queue_timeout):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue
+        self.per_client = per_client
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiters = deque()
+        self.clients = {}
+        self.service_time = None  # EWMA of seconds per admitted request
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: the queue ahead drains `concurrency` at a time"""
+        per_request = self.service_time or 1.0
+        return max(1, math.ceil(per_request * (len(self.waiters) + 1) / self.concurrency))
+
+    def _publish(self):
+        ADMISSION_IN_FLIGHT.set(self.in_flight, endpoint=self.name)
+        ADMISSION_QUEUE_DEPTH.set(len(self.waiters), endpoint=self.name)
+
+    def _reject(self, reason):
+        ADMISSION_REJECTIONS.inc(endpoint=self.name, reason=reason)
+        return Rejected(reason, self.retry_after())
+
+    def _try_enter(self, client, loop=None):
+        """Admit now (None), queue (a _Waiter) or raise Rejected; called with the lock held"""
+        if self.clients.get(client, 0) >= self.per_client:
+            raise self._reject("client")
+        if self.in_flight < self.concurrency and not self.waiters:
+            self.in_flight += 1
+            self.clients[client] = self.clients.get(client, 0) + 1
+            self._publish()
+            return None
+        if len(self.waiters) >= self.queue_size:
+            raise self._reject("queue_full")
+        waiter = _Waiter(client, loop)
+        self.waiters.append(waiter)
+        self.clients[client] = self.clients.get(client, 0) + 1
+        self._publish()
+        return waiter
+
+    def _abandon(self, waiter):
+        """Stop waiting; False when the slot was granted in the meantime and must be used or released"""
+        with self._lock:
+            if waiter.admitted:
+                return False
+            self.waiters.remove(waiter)
+            self._drop_client(waiter.client)
+            self._publish()
+            return True
+
+    def _drop_client(self, client):
+        remaining = self.clients.get(client, 0) - 1
+        if remaining > 0:
+            self.clients[client] = remaining
+        else:
+            self.clients.pop(client, None)
+
+    def release(self, client, seconds):
+        with self._lock:
+            if seconds:
+                self.service_time = seconds if self.service_time is None else (
+                    EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.service_time
+                )
+            self._drop_client(client)
+            if self.waiters:
+                # Hand the slot straight to the next waiter
+                self.waiters.popleft().wake()
+            else:
+                self.in_flight -= 1
+            self._publish()
+
+    def acquire(self, client):
+        with self._lock:
+            waiter = self._try_enter(client)
+        if waiter is not None and not waiter.event.wait(self.queue_timeout) and self._abandon(waiter):
+            raise self._reject("queue_timeout")
+
+    async def aacquire(self, client):
+        with self._lock:
+            waiter = self._try_enter(client, asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                raise self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            # Client went away while queued: give the slot back if it was already granted
+            if not self._abandon(waiter):
+                self.release(client, 0.0)
+            raise
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(name):
+    """Controller for an endpoint, built once from ADMISSION_LIMITS / DEFAULT_LIMITS"""
+    with _controllers_lock:
+        if name not in _controllers:
+            limits = {**DEFAULT_LIMITS.get(name, {}), **getattr(settings, "ADMISSION_LIMITS", {}).get(name, {})}
+            _controllers[name] = AdmissionController(name, **limits)
+        return _controllers[name]
+
+
+def client_id(request):
+    """Who the per-client bound applies to: the remote address (or the first X-Forwarded-For hop)"""
+    if getattr(settings, "ADMISSION_TRUST_FORWARDED_FOR", False):
+        forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "unknown")
+
+
+def too_many_requests(rejected):
+    response = JsonResponse(
+        {"error": "Server is busy, please retry later", "reason": rejected.reason,
+         "retry_after": rejected.retry_after},
+        status=429,
+    )
+    response["Retry-After"] = str(rejected.retry_after)
+    return response
+
+
+def admission(name):
+    """View decorator: run the view only once admitted by the endpoint's controller"""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not getattr(settings, "ADMISSION_ENABLED", True):
+                    return await view(request, *args, **kwargs)
+                controller, client = get_controller(name), client_id(request)
+                try:
+                    await controller.aacquire(client)
+                except Rejected as rejected:
+                    return too_many_requests(rejected)
+                started = time.perf_counter()
+                try:
+                    return await view(request, *args, **kwargs)
+                finally:
+                    controller.release(client, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not getattr(settings, "ADMISSION_ENABLED", True):
+                return view(request, *args, **kwargs)
+            controller, client = get_controller(name), client_id(request)
+            try:
+                controller.acquire(client)
+            except Rejected as rejected:
+                return too_many_requests(rejected)
+            started = time.perf_counter()
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                controller.release(client, time.perf_counter() - started)
+        return wrapper
+    return decorator
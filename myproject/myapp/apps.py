@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
+
+    def ready(self):
+        # Binary/package checks run once here instead of on every OCR call
+        from .preflight import preflight
+        preflight()
@@ -0,0 +1,102 @@
+"""
+Document filtering and facets
+Query-string filters over the indexed extracted fields, and facet counts aggregated in the database
+"""
+from datetime import date
+
+from django.db import connection
+from django.db.models import Count, F, Q
+from django.db.models.functions import Collate
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+
+
+# Query parameter -> (model field, lookups allowed). "exact" is the bare parameter name,
+# the others are written as <param>__<lookup>, e.g. ?state=CA&zip__prefix=94&dob__gte=1980-01-01
+FILTERS = {
+    'state': ('state', ('exact', 'prefix')),
+    'city': ('city', ('exact', 'prefix')),
+    'zip': ('zip', ('exact', 'prefix')),
+    'dob': ('dob_date', ('exact', 'gte', 'lte', 'gt', 'lt')),
+    'policy_number': ('policy_number', ('exact', 'prefix')),
+    'name': ('name', ('exact', 'prefix')),
+    'gender': ('gender', ('exact',)),
+    'marital_status': ('marital_status', ('exact',)),
+    'occupation': ('occupation', ('exact', 'prefix')),
+    'file_type': ('file_type', ('exact',)),
+}
+# Fields that can be faceted; low-cardinality, indexed columns
+FACETS = ('state', 'city', 'zip', 'gender', 'marital_status', 'occupation', 'file_type')
+FACET_LIMIT = 20
+LOOKUPS = {'exact': 'exact', 'gte': 'gte', 'lte': 'lte', 'gt': 'gt', 'lt': 'lt'}
+IGNORED_PARAMS = {'facets', 'limit', 'offset', 'search', 'format'}
+# Byte-order collation per backend, for prefix ranges; SQLite text columns are BINARY already
+BINARY_COLLATIONS = {'postgresql': 'C', 'mysql': 'utf8mb4_bin'}
+
+
+class FilterError(ValueError):
+    """Invalid filter or facet parameter"""
+
+
+def prefix_range(field, prefix):
+    """
+    Case-sensitive prefix match as the range prefix <= value < next(prefix), compared in
+    byte order. A locale collation would let 'jo' match 'John', so on backends whose columns
+    are not binary-collated the column is compared under BINARY_COLLATIONS. On SQLite (binary
+    already) the field's plain B-tree index serves it, unlike LIKE 'x%' with an ESCAPE clause;
+    PostgreSQL and MySQL need an index in that collation to do the same.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    column = F(field)
+    collation = BINARY_COLLATIONS.get(connection.vendor)
+    if collation:
+        column = Collate(column, collation)
+    return GreaterThanOrEqual(column, prefix) & LessThan(column, upper)
+
+
+def parse_filters(params):
+    """Q object for the query parameters; raises FilterError on anything unknown"""
+    condition = Q()
+    for key in params:
+        if key in IGNORED_PARAMS:
+            continue
+        name, _, lookup = key.partition('__')
+        lookup = lookup or 'exact'
+        if name not in FILTERS or lookup not in FILTERS[name][1]:
+            raise FilterError(f"Unknown filter '{key}'")
+        field = FILTERS[name][0]
+        value = params.get(key)
+        if field == 'dob_date':
+            try:
+                value = date.fromisoformat(value)
+            except ValueError:
+                raise FilterError(f"'{key}' must be a date (YYYY-MM-DD)")
+        if lookup == 'prefix':
+            if value:
+                condition &= prefix_range(field, value)
+            continue
+        condition &= Q(**{f"{field}__{LOOKUPS[lookup]}": value})
+    return condition
+
+
+def parse_facets(value):
+    """Facet field names from a comma-separated parameter"""
+    facets = [f.strip() for f in (value or '').split(',') if f.strip()]
+    unknown = [f for f in facets if f not in FACETS]
+    if unknown:
+        raise FilterError(f"Unknown facets: {', '.join(unknown)}. Available: {', '.join(FACETS)}")
+    return facets
+
+
+def facet_counts(queryset, facets, limit=FACET_LIMIT):
+    """{facet: [{"value", "count"}, ...]} via GROUP BY on the filtered queryset, largest first"""
+    result = {}
+    for field in facets:
+        rows = (
+            queryset.order_by()
+            .exclude(**{field: ''})
+            .values(field)
+            .annotate(count=Count('id'))
+            .order_by('-count', field)[:limit]
+        )
+        result[field] = [{'value': row[field], 'count': row['count']} for row in rows]
+    return result
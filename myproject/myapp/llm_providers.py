@@ -0,0 +1,193 @@
+"""
+LLM providers
+chat() talks to whichever backend LLM_PROVIDER selects: OpenAI (or any OpenAI-compatible
+server), a local Ollama, or a deterministic fake for offline tests and benchmarks
+"""
+import asyncio
+import json
+import re
+import threading
+import urllib.error
+import urllib.request
+import weakref
+
+from django.conf import settings
+
+
+def _fake_fields(keys, text):
+    """Fill keys from "Label: value" lines so the offline pipeline still extracts something"""
+    found = {}
+    for line in text.splitlines():
+        label, sep, value = line.partition(":")
+        key = re.sub(r"\W+", "_", label.strip().lower()).strip("_")
+        if sep and key in keys and key not in found:
+            found[key] = value.strip()
+    return {k: found.get(k, "") for k in keys}
+
+
+def fake_completion(prompt):
+    """Deterministic, well-formed answer for each of the app's prompt types"""
+    if "mapping every document id" in prompt:
+        head, _, body = prompt.partition("Documents:\n")
+        keys = re.findall(r"^- (\w+)$", head, re.MULTILINE)
+        sections = re.split(r"^=== Document (\S+) ===$", body, flags=re.MULTILINE)
+        return json.dumps({doc_id: _fake_fields(keys, text)
+                           for doc_id, text in zip(sections[1::2], sections[2::2])})
+    if "Respond ONLY as a single-line JSON object" in prompt:
+        keys = re.findall(r"^- (\w+)$", prompt.split("Clean text:\n", 1)[0], re.MULTILINE)
+        return json.dumps(_fake_fields(keys, prompt.split("Clean text:\n", 1)[-1]))
+    if "OCR text:\n" in prompt:
+        return prompt.split("OCR text:\n", 1)[1]
+    return "Not found in context."
+
+
+class LLMProvider:
+    """
+    Provider protocol: complete(prompt, max_tokens) -> {"text", "prompt_tokens", "completion_tokens"}
+    and its coroutine twin acomplete(). The default acomplete runs complete() in a thread;
+    providers with a native async client override it so no thread is held while waiting.
+    """
+
+    name = None
+    default_model = None
+
+    def __init__(self, model=None):
+        self.model = model or self.default_model
+
+    def complete(self, prompt, max_tokens):
+        raise NotImplementedError
+
+    async def acomplete(self, prompt, max_tokens):
+        return await asyncio.to_thread(self.complete, prompt, max_tokens)
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI, or any OpenAI-compatible server via base_url (vLLM, LM Studio, the mock server)"""
+
+    name = "openai"
+    default_model = "gpt-4o-mini"
+
+    def __init__(self, model=None, api_key=None, base_url=None, timeout=None):
+        super().__init__(model)
+        if not api_key or "PASTE" in api_key:
+            raise ValueError("Set OPENAI_API_KEY env or replace with your key.")
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout)
+        self._client_options = {"api_key": api_key, "base_url": base_url, "timeout": timeout}
+        # AsyncOpenAI's connection pool is bound to the event loop it was first used on
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
+
+    def _request(self, prompt, max_tokens):
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": 0,
+        }
+
+    def complete(self, prompt, max_tokens):
+        return self._result(self.client.chat.completions.create(**self._request(prompt, max_tokens)))
+
+    def async_client(self):
+        """AsyncOpenAI client for the running event loop"""
+        from openai import AsyncOpenAI
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = AsyncOpenAI(**self._client_options)
+            return client
+
+    async def acomplete(self, prompt, max_tokens):
+        resp = await self.async_client().chat.completions.create(**self._request(prompt, max_tokens))
+        return self._result(resp)
+
+    @staticmethod
+    def _result(resp):
+        usage = resp.usage
+        return {
+            "text": resp.choices[0].message.content.strip(),
+            "prompt_tokens": usage.prompt_tokens if usage else None,
+            "completion_tokens": usage.completion_tokens if usage else None,
+        }
+
+
+class OllamaProvider(LLMProvider):
+    """
+    Local Ollama over its native /api/generate endpoint, keeping the model warm.
+    acomplete() uses a worker thread; a local model serves few requests at once anyway.
+    """
+
+    name = "ollama"
+    default_model = "llama3"
+
+    def __init__(self, model=None, base_url="http://127.0.0.1:11434", keep_alive="30m", timeout=120):
+        super().__init__(model)
+        self.url = base_url.rstrip("/") + "/api/generate"
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+
+    def complete(self, prompt, max_tokens):
+        body = json.dumps({
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {"num_predict": max_tokens, "temperature": 0},
+        }).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                payload = json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Ollama returned {e.code}: {e.read().decode(errors='replace')[:200]}") from e
+        return {
+            "text": payload.get("response", "").strip(),
+            "prompt_tokens": payload.get("prompt_eval_count"),
+            "completion_tokens": payload.get("eval_count"),
+        }
+
+
+class FakeProvider(LLMProvider):
+    """Offline provider: instant, deterministic answers (see fake_completion)"""
+
+    name = "fake"
+    default_model = "fake"
+
+    async def acomplete(self, prompt, max_tokens):
+        return self.complete(prompt, max_tokens)
+
+    def complete(self, prompt, max_tokens):
+        text = fake_completion(prompt)
+        return {
+            "text": text.strip(),
+            "prompt_tokens": max(1, len(prompt) // 4),
+            "completion_tokens": max(1, len(text) // 4),
+        }
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "ollama": OllamaProvider,
+    "fake": FakeProvider,
+}
+
+
+def build_provider(name=None, **openai_options):
+    """Provider for the LLM_PROVIDER / LLM_MODEL settings"""
+    name = name or getattr(settings, "LLM_PROVIDER", "openai")
+    model = getattr(settings, "LLM_MODEL", None)
+    timeout = getattr(settings, "LLM_TIMEOUT", 120)
+    if name == "openai":
+        return OpenAIProvider(model=model, timeout=timeout, **openai_options)
+    if name == "ollama":
+        return OllamaProvider(
+            model=model,
+            base_url=getattr(settings, "OLLAMA_BASE_URL", "http://127.0.0.1:11434"),
+            keep_alive=getattr(settings, "OLLAMA_KEEP_ALIVE", "30m"),
+            timeout=timeout,
+        )
+    if name == "fake":
+        return FakeProvider(model=model)
+    raise ValueError(f"Unknown LLM provider '{name}'. Known providers: {', '.join(PROVIDERS)}")
@@ -0,0 +1,184 @@
+"""
+Open-loop load generator for the document API
+Drives the real upload/chat routes at a target request rate and summarizes the results
+"""
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib import error, request
+
+from .metrics import latency_summary
+
+
+SCENARIOS = ("upload", "chat", "mixed")
+DEFAULT_QUESTIONS = [
+    "What is the name on the form?",
+    "What is the date of birth?",
+    "Which city and state are listed?",
+    "What is the phone number?",
+]
+
+
+def encode_multipart(field, filename, content, content_type="application/octet-stream"):
+    """Encode a single file as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    return head + content + tail, f"multipart/form-data; boundary={boundary}"
+
+
+def sample_upload():
+    """A rendered synthetic form to upload when no file is given"""
+    import cv2
+    from .ocr_benchmark import form_lines, generate_fields, render_form
+
+    image = render_form(form_lines(generate_fields(random.Random(0))), dpi=150)
+    ok, encoded = cv2.imencode(".png", image)
+    if not ok:
+        raise ValueError("Failed to encode sample form")
+    return "sample_form.png", encoded.tobytes()
+
+
+class LoadTarget:
+    """Builds requests against the app's URL routes"""
+
+    def __init__(self, base_url, upload_name, upload_bytes, document_id=None, questions=None):
+        self.base_url = base_url.rstrip("/")
+        self.upload_name = upload_name
+        self.upload_bytes = upload_bytes
+        self.document_id = document_id
+        self.questions = questions or DEFAULT_QUESTIONS
+
+    def upload(self):
+        body, content_type = encode_multipart("file", self.upload_name, self.upload_bytes)
+        return request.Request(
+            f"{self.base_url}/api/upload/", data=body, method="POST",
+            headers={"Content-Type": content_type},
+        )
+
+    def chat(self):
+        body = json.dumps({"question": random.choice(self.questions)}).encode()
+        return request.Request(
+            f"{self.base_url}/api/documents/{self.document_id}/chat/", data=body, method="POST",
+            headers={"Content-Type": "application/json"},
+        )
+
+
+def classify_error(exc):
+    """Bucket a failed request for the error breakdown"""
+    if isinstance(exc, error.HTTPError):
+        return f"HTTP {exc.code}"
+    if isinstance(exc, (socket.timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(exc, error.URLError):
+        if isinstance(exc.reason, (socket.timeout, TimeoutError)):
+            return "timeout"
+        return f"connection: {exc.reason}"
+    return type(exc).__name__
+
+
+def send(req, timeout):
+    with request.urlopen(req, timeout=timeout) as resp:
+        return resp.status, resp.read()
+
+
+def ensure_document(target, timeout):
+    """Upload once so chat traffic has a document to talk to"""
+    if target.document_id is None:
+        _, body = send(target.upload(), timeout)
+        target.document_id = json.loads(body)["document_id"]
+    return target.document_id
+
+
+def run_load(target, scenario="chat", rate=5.0, duration=30.0, concurrency=16, timeout=60.0,
+             upload_ratio=0.2):
+    """
+    Fire requests at a fixed arrival rate (open loop) and return a report dict.
+
+    Latency is measured from each request's scheduled send time, so client-side
+    queueing behind slow responses is counted instead of hidden.
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario: {scenario}")
+    if scenario in ("chat", "mixed"):
+        ensure_document(target, timeout)
+
+    results = []
+    lock = threading.Lock()
+
+    def fire(endpoint, scheduled):
+        req = target.upload() if endpoint == "upload" else target.chat()
+        sent = time.perf_counter()
+        outcome = None
+        try:
+            status, _ = send(req, timeout)
+            if status >= 400:
+                outcome = f"HTTP {status}"
+        except Exception as exc:
+            outcome = classify_error(exc)
+        finished = time.perf_counter()
+        with lock:
+            results.append((endpoint, scheduled, sent, finished, outcome))
+
+    total = int(rate * duration)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            scheduled = started + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if scenario == "mixed":
+                endpoint = "upload" if random.random() < upload_ratio else "chat"
+            else:
+                endpoint = scenario
+            pool.submit(fire, endpoint, scheduled)
+    wall = time.perf_counter() - started
+
+    ok = [r for r in results if r[4] is None]
+    endpoints = {}
+    for name in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == name]
+        good = [r for r in rows if r[4] is None]
+        endpoints[name] = {
+            "requests": len(rows),
+            "ok": len(good),
+            "latency": latency_summary([r[3] - r[1] for r in good]),
+        }
+
+    return {
+        "config": {
+            "base_url": target.base_url,
+            "scenario": scenario,
+            "offered_rps": rate,
+            "duration_s": duration,
+            "concurrency": concurrency,
+            "timeout_s": timeout,
+        },
+        "wall_seconds": round(wall, 3),
+        "requests": len(results),
+        "ok": len(ok),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else 0.0,
+        "latency": latency_summary([r[3] - r[1] for r in ok]),
+        "service_latency": latency_summary([r[3] - r[2] for r in ok]),
+        "endpoints": endpoints,
+        "errors": dict(Counter(r[4] for r in results if r[4] is not None)),
+    }
+
+
+def load_upload_file(path):
+    """Read the file to upload, or render a synthetic form"""
+    if not path:
+        return sample_upload()
+    p = Path(path)
+    return p.name, p.read_bytes()
@@ -0,0 +1,70 @@
+"""
+Re-extract structured fields for stored documents, packing several documents per LLM request
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.llm_utils import extract_fields, extract_fields_batch
+from myapp.metrics import track_run
+from myapp.models import FIELD_COLUMNS, Document, touch_documents
+
+
+class Command(BaseCommand):
+    help = "Backfill extracted fields from each document's enhanced text, in packed batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Re-extract every document, not only those without a name")
+        parser.add_argument("--ids", help="Comma-separated document ids to backfill")
+        parser.add_argument("--batch-size", type=int, default=8,
+                            help="Documents per LLM request (1 sends one request per document)")
+        parser.add_argument("--chunk", type=int, default=200, help="Documents loaded and saved per round")
+        parser.add_argument("--dry-run", action="store_true", help="Extract but do not save")
+
+    def handle(self, *args, **options):
+        documents = (Document.objects.filter(text__isnull=False).exclude(text__enhanced_text="")
+                     .select_related("text").order_by("id"))
+        if options["ids"]:
+            documents = documents.filter(id__in=[int(i) for i in options["ids"].split(",") if i.strip()])
+        elif not options["all"]:
+            documents = documents.filter(name="")
+        documents = documents.only("id", "text__enhanced_text", *FIELD_COLUMNS)
+
+        started = time.perf_counter()
+        updated = 0
+        with track_run() as run:
+            chunk = []
+            for document in documents.iterator(chunk_size=options["chunk"]):
+                chunk.append(document)
+                if len(chunk) >= options["chunk"]:
+                    updated += self.backfill(chunk, options)
+                    chunk = []
+            if chunk:
+                updated += self.backfill(chunk, options)
+
+        counters = run.counters
+        self.stdout.write(json.dumps({
+            "documents": updated,
+            "llm_requests": counters.get("llm_requests", 0),
+            "batch_requests": counters.get("batch_extract_requests", 0),
+            "retries": counters.get("batch_extract_retries", 0),
+            "prompt_tokens": counters.get("prompt_tokens", 0),
+            "completion_tokens": counters.get("completion_tokens", 0),
+            "seconds": round(time.perf_counter() - started, 3),
+            "saved": not options["dry_run"],
+        }, indent=2))
+
+    def backfill(self, documents, options):
+        if options["batch_size"] > 1:
+            extracted = extract_fields_batch({d.id: d.text.enhanced_text for d in documents},
+                                             batch_size=options["batch_size"])
+        else:
+            extracted = {d.id: extract_fields(d.text.enhanced_text) for d in documents}
+        for document in documents:
+            document.set_fields(extracted[document.id])
+        if not options["dry_run"]:
+            Document.objects.bulk_update(documents, FIELD_COLUMNS)
+            touch_documents([d.id for d in documents])
+        return len(documents)
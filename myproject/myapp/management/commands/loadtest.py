@@ -0,0 +1,45 @@
+"""
+Load-test the upload and chat endpoints of a running server
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from myapp.loadtest import SCENARIOS, LoadTarget, load_upload_file, run_load
+
+
+class Command(BaseCommand):
+    help = "Drive the upload/chat API at a target request rate and report throughput and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--scenario", choices=SCENARIOS, default="chat")
+        parser.add_argument("--rate", type=float, default=5.0, help="Offered requests per second")
+        parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic")
+        parser.add_argument("--concurrency", type=int, default=16, help="Max in-flight requests")
+        parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+        parser.add_argument("--upload-ratio", type=float, default=0.2, help="Share of uploads in 'mixed'")
+        parser.add_argument("--file", help="File to upload (default: a rendered synthetic form)")
+        parser.add_argument("--document-id", type=int, help="Document to chat with (default: upload one)")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        name, content = load_upload_file(options["file"])
+        target = LoadTarget(options["base_url"], name, content, document_id=options["document_id"])
+        report = run_load(
+            target,
+            scenario=options["scenario"],
+            rate=options["rate"],
+            duration=options["duration"],
+            concurrency=options["concurrency"],
+            timeout=options["timeout"],
+            upload_ratio=options["upload_ratio"],
+        )
+
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(payload)
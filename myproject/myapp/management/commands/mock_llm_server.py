@@ -0,0 +1,136 @@
+"""
+Local OpenAI-compatible mock server for offline load tests
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from myapp.llm_providers import fake_completion
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, code, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        return self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "Invalid JSON"}})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "Not found"}})
+
+        server = self.server
+        delay = max(0.0, random.gauss(server.latency, server.jitter))
+        time.sleep(delay)
+        server.record()
+
+        roll = random.random()
+        if roll < server.error_rate:
+            return self._send_json(500, {"error": {"message": "Mock server error", "type": "server_error"}})
+        if roll < server.error_rate + server.rate_limit_rate:
+            return self._send_json(
+                429, {"error": {"message": "Mock rate limit", "type": "rate_limit_error"}},
+                headers={"Retry-After": "1"},
+            )
+
+        messages = payload.get("messages") or [{}]
+        prompt = messages[-1].get("content", "")
+        content = fake_completion(prompt)
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        return self._send_json(200, {
+            "id": f"chatcmpl-mock-{server.count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, jitter=0.1, error_rate=0.0, rate_limit_rate=0.0, verbose=False):
+        super().__init__(address, MockLLMHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.verbose = verbose
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self):
+        with self._lock:
+            self.count += 1
+
+
+class Command(BaseCommand):
+    help = "Run a local OpenAI-compatible mock server with configurable latency, jitter and errors"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.5, help="Mean response latency in seconds")
+        parser.add_argument("--jitter", type=float, default=0.1, help="Std-dev of latency in seconds")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 500")
+        parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction answered 429")
+        parser.add_argument("--seed", type=int, help="Seed latency/error sampling")
+        parser.add_argument("--verbose", action="store_true", help="Log every request")
+
+    def handle(self, *args, **options):
+        if options["seed"] is not None:
+            random.seed(options["seed"])
+        server = MockLLMServer(
+            (options["host"], options["port"]),
+            latency=options["latency"],
+            jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            rate_limit_rate=options["rate_limit_rate"],
+            verbose=options["verbose"],
+        )
+        host, port = server.server_address[:2]
+        self.stdout.write(self.style.SUCCESS(f"Mock LLM listening on http://{host}:{port}/v1"))
+        self.stdout.write(f"Run the app with OPENAI_BASE_URL=http://{host}:{port}/v1")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {server.count} completions")
@@ -0,0 +1,68 @@
+"""
+Run the OCR benchmark over a synthetic forms corpus and emit a JSON report
+"""
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.ocr_benchmark import VARIANTS, run_benchmark
+from myapp.ocr_engines import ENGINES
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+class Command(BaseCommand):
+    help = "Benchmark OCR latency and accuracy (CER/WER/fields) on a synthetic forms corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=10, help="Distinct forms to render")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--variants", default=",".join(VARIANTS),
+                            help="Comma-separated subset of: " + ", ".join(VARIANTS))
+        parser.add_argument("--psm", type=int_list, default=[6], help="e.g. 4,6,11")
+        parser.add_argument("--oem", type=int_list, default=[3], help="e.g. 1,3")
+        parser.add_argument("--dpi", type=int_list, default=[200], help="e.g. 150,300")
+        parser.add_argument("--engines",
+                            help="Route pages through these OCR engines, cheapest first "
+                                 "(e.g. tesseract,donut); reports escalation rates")
+        parser.add_argument("--threshold", type=float,
+                            help="Escalation confidence threshold (default: OCR_ESCALATION_THRESHOLD)")
+        parser.add_argument("--no-refine", action="store_true",
+                            help="Disable selective re-OCR of low-confidence lines")
+        parser.add_argument("--corpus-dir", help="Where to write the corpus (default: temp dir)")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        variants = [v.strip() for v in options["variants"].split(",") if v.strip()]
+        unknown = set(variants) - set(VARIANTS)
+        if unknown:
+            raise CommandError(f"Unknown variants: {', '.join(sorted(unknown))}")
+        engines = [e.strip() for e in (options["engines"] or "").split(",") if e.strip()] or None
+        unknown = set(engines or ()) - set(ENGINES)
+        if unknown:
+            raise CommandError(f"Unknown engines: {', '.join(sorted(unknown))}")
+
+        with tempfile.TemporaryDirectory(prefix="ocr-bench-") as tmp:
+            report = run_benchmark(
+                options["corpus_dir"] or tmp,
+                psms=options["psm"],
+                oems=options["oem"],
+                dpis=options["dpi"],
+                documents=options["documents"],
+                variants=variants,
+                seed=options["seed"],
+                engines=engines,
+                threshold=options["threshold"],
+                refine=not options["no_refine"],
+            )
+
+        payload = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(payload)
@@ -0,0 +1,15 @@
+"""
+Print a signed header value that turns on profiling for a single request
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myapp.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = "Mint a signed token for the request profiling header"
+
+    def handle(self, *args, **options):
+        header = getattr(settings, "PROFILING_HEADER", "X-Profile-Token")
+        self.stdout.write(f"{header}: {make_token()}")
@@ -0,0 +1,149 @@
+"""
+Compare concurrent chat throughput of the app served by a WSGI server and by an ASGI server
+"""
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+import time
+from urllib import error, request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.loadtest import LoadTarget, run_load
+from myapp.management.commands.mock_llm_server import MockLLMServer
+from myapp.models import Document, DocumentText
+
+
+SERVERS = {
+    "wsgi": "gunicorn myproject.wsgi:application --bind {host}:{port} --workers 1 --threads {threads} "
+            "--timeout 300 --log-level warning",
+    "asgi": "uvicorn myproject.asgi:application --host {host} --port {port} --workers 1 "
+            "--no-access-log --log-level warning",
+}
+SAMPLE_TEXT = "Name: Jane Roe\nDOB: 01/02/1980\nPhone: 555-123-4567\nCity: Springfield\nState: IL"
+
+
+def wait_until_ready(url, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited with code {process.returncode}")
+        try:
+            with request.urlopen(url, timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except (error.URLError, OSError):
+            time.sleep(0.2)
+    raise CommandError(f"Server did not answer {url} within {timeout:.0f}s")
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent chat throughput under WSGI (gunicorn) vs ASGI (uvicorn) with a mock LLM"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", default="wsgi,asgi", help="Comma-separated subset of: wsgi, asgi")
+        parser.add_argument("--concurrency", type=int, default=200, help="Max in-flight chat requests")
+        parser.add_argument("--rate", type=float,
+                            help="Offered requests per second (default: concurrency / llm latency)")
+        parser.add_argument("--duration", type=float, default=20.0, help="Seconds of traffic per server")
+        parser.add_argument("--llm-latency", type=float, default=1.0, help="Mock LLM seconds per completion")
+        parser.add_argument("--threads", type=int, default=8, help="WSGI worker threads")
+        parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8100)
+        parser.add_argument("--wsgi-cmd", default=SERVERS["wsgi"], help="WSGI server command template")
+        parser.add_argument("--asgi-cmd", default=SERVERS["asgi"], help="ASGI server command template")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        servers = [s.strip() for s in options["servers"].split(",") if s.strip()]
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f"Unknown servers: {', '.join(sorted(unknown))}")
+        rate = options["rate"] or options["concurrency"] / options["llm_latency"]
+
+        mock = MockLLMServer((options["host"], 0), latency=options["llm_latency"], jitter=0.0)
+        threading.Thread(target=mock.serve_forever, daemon=True).start()
+        mock_url = f"http://{options['host']}:{mock.server_address[1]}/v1"
+
+        document = Document.objects.create(file_type="image", name="Benchmark")
+        DocumentText.objects.create(document=document, enhanced_text=SAMPLE_TEXT)
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "myproject.settings"),
+            "LLM_PROVIDER": "openai",
+            "OPENAI_BASE_URL": mock_url,
+            "OPENAI_API_KEY": "sk-benchmark",
+            "ADMISSION_ENABLED": "0",  # measure the server itself, not the admission limits
+        }
+
+        reports = {}
+        try:
+            for kind in servers:
+                cmd = options[f"{kind}_cmd"].format(host=options["host"], port=options["port"],
+                                                    threads=options["threads"])
+                self.stderr.write(f"{kind}: {cmd}")
+                reports[kind] = self.run_server(cmd, env, document.id, rate, options)
+                self.stderr.write(f"{kind}: {reports[kind]['throughput_rps']} req/s, "
+                                  f"p95 {reports[kind]['latency'].get('p95_ms')} ms")
+        finally:
+            mock.shutdown()
+            document.delete()
+
+        summary = {
+            kind: {
+                "throughput_rps": report["throughput_rps"],
+                "ok": report["ok"],
+                "requests": report["requests"],
+                "latency": report["latency"],
+                "errors": report["errors"],
+            }
+            for kind, report in reports.items()
+        }
+        if reports.get("wsgi", {}).get("throughput_rps") and "asgi" in reports:
+            summary["asgi_vs_wsgi_throughput"] = round(
+                reports["asgi"]["throughput_rps"] / reports["wsgi"]["throughput_rps"], 2
+            )
+        payload = json.dumps({
+            "config": {
+                "concurrency": options["concurrency"],
+                "offered_rps": rate,
+                "duration_s": options["duration"],
+                "llm_latency_s": options["llm_latency"],
+                "wsgi_threads": options["threads"],
+            },
+            "summary": summary,
+            "reports": reports,
+        }, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+    def run_server(self, cmd, env, document_id, rate, options):
+        base_url = f"http://{options['host']}:{options['port']}"
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(shlex.split(cmd), cwd=settings.BASE_DIR, env=env,
+                                       stdout=log, stderr=subprocess.STDOUT)
+            try:
+                try:
+                    wait_until_ready(f"{base_url}/api/documents/{document_id}/status/", process)
+                except CommandError:
+                    log.seek(0)
+                    self.stderr.write(log.read().decode(errors="replace")[-2000:])
+                    raise
+                target = LoadTarget(base_url, "", b"", document_id=document_id)
+                return run_load(target, scenario="chat", rate=rate, duration=options["duration"],
+                                concurrency=options["concurrency"], timeout=options["timeout"])
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
@@ -0,0 +1,128 @@
+"""
+Measure worker startup: how long a fresh process takes to set up Django and load the URLconf,
+which modules that imports (python -X importtime), and what the deferred OCR/LLM imports cost
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.preflight import LLM_MODULES, OCR_MODULES
+
+
+# Run in a fresh interpreter: boot the way a WSGI worker does, then import the deferred modules
+BOOT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+application = get_wsgi_application()
+get_resolver().url_patterns  # the URLconf (and so the views) load on the first request otherwise
+ready = time.perf_counter()
+print({marker!r}, file=sys.stderr, flush=True)
+deferred = {deferred!r}
+loaded_at_boot = [name for name in deferred if name in sys.modules]
+first_use = {{}}
+for name in deferred:
+    if name not in sys.modules:
+        t = time.perf_counter()
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+        first_use[name] = round(time.perf_counter() - t, 4)
+print(json.dumps({{
+    "setup_s": round(setup_done - started, 4),
+    "urls_s": round(ready - setup_done, 4),
+    "boot_s": round(ready - started, 4),
+    "loaded_at_boot": loaded_at_boot,
+    "first_use_s": first_use,
+}}))
+"""
+BOOT_MARKER = "-- boot complete --"
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us)} from python -X importtime output, boot imports only"""
+    modules = {}
+    for line in stderr.partition(BOOT_MARKER)[0].splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue  # the header line
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Benchmark worker startup time and per-module import cost in fresh interpreters"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to start")
+        parser.add_argument("--top", type=int, default=25, help="Slowest modules to report")
+        parser.add_argument("--budget", type=float,
+                            help="Fail when the median boot time exceeds this many seconds")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "myproject.settings"),
+        }
+        script = BOOT_SCRIPT.format(deferred=OCR_MODULES + LLM_MODULES, marker=BOOT_MARKER)
+        runs, module_times = [], {}
+        for _ in range(options["runs"]):
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=settings.BASE_DIR,
+                                  env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise CommandError(f"Boot failed:\n{proc.stderr[-2000:]}")
+            run = json.loads(proc.stdout.strip().splitlines()[-1])
+            runs.append(run)
+            for name, (self_us, cumulative_us) in parse_importtime(proc.stderr).items():
+                module_times.setdefault(name, []).append((self_us, cumulative_us))
+
+        modules = sorted(
+            (
+                {
+                    "module": name,
+                    "self_ms": round(statistics.median(t[0] for t in times) / 1000, 2),
+                    "cumulative_ms": round(statistics.median(t[1] for t in times) / 1000, 2),
+                }
+                for name, times in module_times.items()
+            ),
+            key=lambda m: m["cumulative_ms"],
+            reverse=True,
+        )
+        boot = [run["boot_s"] for run in runs]
+        report = {
+            "runs": options["runs"],
+            "boot_s": {"median": round(statistics.median(boot), 4), "min": min(boot), "max": max(boot)},
+            "setup_s": round(statistics.median(run["setup_s"] for run in runs), 4),
+            "urls_s": round(statistics.median(run["urls_s"] for run in runs), 4),
+            "loaded_at_boot": runs[-1]["loaded_at_boot"],
+            "first_use_s": runs[-1]["first_use_s"],
+            "myapp_modules": [m for m in modules if m["module"].startswith("myapp")],
+            "slowest_modules": modules[:options["top"]],
+        }
+        self.stderr.write(f"boot median {report['boot_s']['median']}s "
+                          f"(setup {report['setup_s']}s, urls {report['urls_s']}s), "
+                          f"heavy modules at boot: {', '.join(report['loaded_at_boot']) or 'none'}")
+
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(payload)
+        if options["budget"] is not None and report["boot_s"]["median"] > options["budget"]:
+            raise CommandError(f"Median boot {report['boot_s']['median']}s exceeds budget {options['budget']}s")
@@ -0,0 +1,247 @@
+"""
+Metrics helpers
+Latency summaries for the benchmark/load-test tools, plus pipeline timers,
+counters and a Prometheus text registry
+"""
+import contextvars
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_summary(seconds):
+    """Summarize a list of durations (seconds) in milliseconds"""
+    ms = [s * 1000.0 for s in seconds]
+    return {
+        "count": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+# Seconds; spans a fast regex pass up to a multi-page OCR + LLM run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple((k, labels[k]) for k in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge:
+    """Current value (e.g. queue depth) keyed by label values"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple((k, labels[k]) for k in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((k, labels[k]) for k in self.label_names)
+        with self._lock:
+            counts, total, count = self._series.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [c + (value <= b) for c, b in zip(counts, self.buckets)]
+            self._series[key] = (counts, total + value, count + 1)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, (counts, total, count) in series:
+            for bound, c in zip(self.buckets, counts):
+                out.append((f"{self.name}_bucket", key + (("le", f"{bound:g}"),), c))
+            out.append((f"{self.name}_bucket", key + (("le", "+Inf"),), count))
+            out.append((f"{self.name}_sum", key, total))
+            out.append((f"{self.name}_count", key, count))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                text = str(value) if isinstance(value, int) else repr(float(value))
+                lines.append(f"{name}{_format_labels(labels)} {text}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "myapp_stage_duration_seconds", "Latency of each document pipeline stage", ("stage",)
+))
+DOCUMENT_SECONDS = REGISTRY.register(Histogram(
+    "myapp_document_processing_seconds", "End-to-end processing time per uploaded document", ("status",)
+))
+PIPELINE_EVENTS = REGISTRY.register(Counter(
+    "myapp_pipeline_events_total",
+    "Pipeline counters: pages, characters, prompt/completion tokens, cache hits/misses",
+    ("event",),
+))
+OCR_ENGINE_PAGES = REGISTRY.register(Counter(
+    "myapp_ocr_engine_pages_total",
+    "Pages seen by each OCR engine, by outcome (accepted, escalated, failed)",
+    ("engine", "outcome"),
+))
+
+
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    "myapp_admission_in_flight", "Requests currently being served, per admission-controlled endpoint", ("endpoint",)
+))
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "myapp_admission_queue_depth", "Requests waiting for a slot, per admission-controlled endpoint", ("endpoint",)
+))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "myapp_admission_rejections_total",
+    "Requests rejected with 429, by endpoint and reason (client, queue_full, queue_timeout)",
+    ("endpoint", "reason"),
+))
+
+
+class RunStats:
+    """Per-document timings and counters collected while a run is active"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.counters = {}
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+    def add_time(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def add_count(self, event, amount):
+        self.counters[event] = self.counters.get(event, 0) + amount
+
+
+@contextmanager
+def track_run():
+    """Collect stage timings/counters for the current document into a RunStats"""
+    run = RunStats()
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = 0.0
+
+
+@contextmanager
+def stage_timer(stage):
+    """Time a pipeline stage into the histogram and the active run, if any"""
+    timer = StageTimer()
+    started = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(timer.seconds, stage=stage)
+        run = _current_run.get()
+        if run is not None:
+            run.add_time(stage, timer.seconds)
+
+
+def timed(stage):
+    """Decorator form of stage_timer"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def incr(event, amount=1):
+    """Bump a pipeline counter globally and on the active run"""
+    if not amount:
+        return
+    PIPELINE_EVENTS.inc(amount, event=event)
+    run = _current_run.get()
+    if run is not None:
+        run.add_count(event, amount)
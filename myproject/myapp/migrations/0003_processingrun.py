@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-19 16:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0002_remove_document_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('duration', models.FloatField(default=0)),
+                ('stage_timings', models.JSONField(blank=True, default=dict)),
+                ('counters', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='processing_runs', to='myapp.document')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.10 on 2026-10-19 16:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+
+def copy_text_out(apps, schema_editor):
+    Document = apps.get_model('myapp', 'Document')
+    DocumentText = apps.get_model('myapp', 'DocumentText')
+    batch = []
+    rows = Document.objects.values_list('id', 'raw_ocr_text', 'enhanced_text').iterator(chunk_size=BATCH_SIZE)
+    for document_id, raw_ocr_text, enhanced_text in rows:
+        batch.append(DocumentText(document_id=document_id, raw_ocr_text=raw_ocr_text, enhanced_text=enhanced_text))
+        if len(batch) >= BATCH_SIZE:
+            DocumentText.objects.bulk_create(batch)
+            batch = []
+    DocumentText.objects.bulk_create(batch)
+
+
+def copy_text_back(apps, schema_editor):
+    Document = apps.get_model('myapp', 'Document')
+    DocumentText = apps.get_model('myapp', 'DocumentText')
+    batch = []
+    for text in DocumentText.objects.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Document(id=text.document_id, raw_ocr_text=text.raw_ocr_text, enhanced_text=text.enhanced_text))
+        if len(batch) >= BATCH_SIZE:
+            Document.objects.bulk_update(batch, ['raw_ocr_text', 'enhanced_text'])
+            batch = []
+    Document.objects.bulk_update(batch, ['raw_ocr_text', 'enhanced_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_processingrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text', serialize=False, to='myapp.document')),
+                ('raw_ocr_text', models.TextField(blank=True)),
+                ('enhanced_text', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(copy_text_out, copy_text_back),
+        migrations.RemoveField(
+            model_name='document',
+            name='enhanced_text',
+        ),
+        migrations.RemoveField(
+            model_name='document',
+            name='raw_ocr_text',
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:02
+
+from datetime import date, datetime
+
+from django.db import migrations, models
+
+
+# A frozen copy of myapp.models.parse_dob as of this migration, so later changes to the
+# parser don't change what this data migration does
+DOB_FORMATS = ('%m/%d/%Y', '%m-%d-%Y', '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%m/%d/%y', '%m-%d-%y')
+TWO_DIGIT_YEAR_FORMATS = ('%m/%d/%y', '%m-%d-%y')
+
+
+def parse_dob(value):
+    for fmt in DOB_FORMATS:
+        try:
+            parsed = datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+        if fmt in TWO_DIGIT_YEAR_FORMATS and parsed.year > date.today().year:
+            parsed = parsed.replace(year=parsed.year - 100)
+        return parsed
+    return None
+
+
+def fill_dob_date(apps, schema_editor):
+    Document = apps.get_model('myapp', 'Document')
+    batch = []
+    for document in Document.objects.exclude(dob='').only('id', 'dob').iterator(chunk_size=500):
+        document.dob_date = parse_dob(document.dob)
+        if document.dob_date:
+            batch.append(document)
+        if len(batch) >= 500:
+            Document.objects.bulk_update(batch, ['dob_date'])
+            batch = []
+    Document.objects.bulk_update(batch, ['dob_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_documenttext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='dob_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='emergency_contact_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='emergency_contact_phone',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='marital_status',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='occupation',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='policy_number',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='zip',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['state', 'city'], name='document_state_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['city'], name='document_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['zip'], name='document_zip_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['dob_date'], name='document_dob_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['policy_number'], name='document_policy_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['gender'], name='document_gender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['marital_status'], name='document_marital_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['occupation'], name='document_occupation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['name'], name='document_name_idx'),
+        ),
+        migrations.RunPython(fill_dob_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_extracted_field_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_document_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingStage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=20)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('artifact', models.JSONField(blank=True, default=dict)),
+                ('duration', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='myapp.document')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('document', 'stage'), name='processingstage_document_stage_uniq')],
+            },
+        ),
+    ]
@@ -1,26 +1,130 @@
+from datetime import date, datetime
+
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+
+# Structured form fields stored on Document (the keys of llm_utils.FIELD_SCHEMA)
+EXTRACTED_FIELDS = (
+    'name', 'dob', 'address', 'city', 'state', 'zip', 'phone', 'email', 'gender', 'marital_status',
+    'occupation', 'emergency_contact_name', 'emergency_contact_phone', 'policy_number', 'date',
+)
+# Columns written from extracted fields (the extracted fields plus derived ones)
+FIELD_COLUMNS = EXTRACTED_FIELDS + ('dob_date',)
+DOB_FORMATS = ('%m/%d/%Y', '%m-%d-%Y', '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%m/%d/%y', '%m-%d-%y')
+TWO_DIGIT_YEAR_FORMATS = ('%m/%d/%y', '%m-%d-%y')
+
+
+def parse_dob(value):
+    """Date of birth from an extracted string, or None when no known format matches"""
+    for fmt in DOB_FORMATS:
+        try:
+            parsed = datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+        if fmt in TWO_DIGIT_YEAR_FORMATS and parsed.year > date.today().year:
+            # Two-digit years in the future belong to the previous century; four-digit ones are kept
+            parsed = parsed.replace(year=parsed.year - 100)
+        return parsed
+    return None
 
 
 class Document(models.Model):
     """Stores uploaded documents and their extracted data"""
     uploaded_file = models.FileField(upload_to='uploads/')
     file_type = models.CharField(max_length=10)  # 'image' or 'pdf'
-    raw_ocr_text = models.TextField(blank=True)
-    enhanced_text = models.TextField(blank=True)
     
     # Structured fields extracted from the form
     name = models.CharField(max_length=200, blank=True)
     dob = models.CharField(max_length=50, blank=True)
+    dob_date = models.DateField(null=True, blank=True)  # parsed dob, for range filters
     address = models.CharField(max_length=500, blank=True)
     city = models.CharField(max_length=100, blank=True)
     state = models.CharField(max_length=50, blank=True)
+    zip = models.CharField(max_length=20, blank=True)
     phone = models.CharField(max_length=50, blank=True)
     email = models.EmailField(blank=True)
     gender = models.CharField(max_length=50, blank=True)
+    marital_status = models.CharField(max_length=50, blank=True)
+    occupation = models.CharField(max_length=100, blank=True)
+    emergency_contact_name = models.CharField(max_length=200, blank=True)
+    emergency_contact_phone = models.CharField(max_length=50, blank=True)
+    policy_number = models.CharField(max_length=100, blank=True)
     date = models.CharField(max_length=50, blank=True)
     
+    # Bumped on every change to the document or its chat; drives ETags and response cache keys
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'city'], name='document_state_city_idx'),
+            models.Index(fields=['city'], name='document_city_idx'),
+            models.Index(fields=['zip'], name='document_zip_idx'),
+            models.Index(fields=['dob_date'], name='document_dob_date_idx'),
+            models.Index(fields=['policy_number'], name='document_policy_number_idx'),
+            models.Index(fields=['gender'], name='document_gender_idx'),
+            models.Index(fields=['marital_status'], name='document_marital_status_idx'),
+            models.Index(fields=['occupation'], name='document_occupation_idx'),
+            models.Index(fields=['name'], name='document_name_idx'),
+        ]
+    
     def __str__(self):
         return f"Document {self.id} - {self.name or 'Unnamed'}"
+    
+    def save(self, *args, **kwargs):
+        """
+        Saving an existing document bumps its version (atomically, in the UPDATE).
+        dob_date is re-derived whenever dob is saved, so edits (e.g. in the admin) keep it in sync
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'dob' in update_fields:
+            self.derive_dob_date()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'dob_date'}
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        self.version = F('version') + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+    
+    def set_fields(self, fields):
+        """Copy extracted fields onto the document and derive dob_date (see FIELD_COLUMNS)"""
+        for field in EXTRACTED_FIELDS:
+            setattr(self, field, fields.get(field, ''))
+        self.derive_dob_date()  # bulk_create skips save()
+    
+    def derive_dob_date(self):
+        self.dob_date = parse_dob(self.dob) if self.dob else None
+    
+    def extracted_data(self):
+        """Extracted fields as a dict, in FIELD_SCHEMA order"""
+        return {field: getattr(self, field) for field in EXTRACTED_FIELDS}
+    
+    def get_text(self):
+        """OCR and enhanced text, or an empty DocumentText when processing never stored any"""
+        try:
+            return self.text
+        except DocumentText.DoesNotExist:
+            return DocumentText(document=self)
+
+
+def touch_documents(document_ids):
+    """Bump version/updated_at of documents changed without Document.save (bulk writes, chat)"""
+    Document.objects.filter(id__in=document_ids).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+class DocumentText(models.Model):
+    """Large OCR/LLM text of a document, kept out of the Document row and loaded on demand"""
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, primary_key=True, related_name='text')
+    raw_ocr_text = models.TextField(blank=True)
+    enhanced_text = models.TextField(blank=True)
+    
+    def __str__(self):
+        return f"Text for Doc {self.document_id}"
 
 
 class ChatMessage(models.Model):
@@ -35,4 +139,48 @@ class ChatMessage(models.Model):
     
     def __str__(self):
         return f"Chat for Doc {self.document.id}: {self.question[:50]}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        touch_documents([self.document_id])
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        touch_documents([self.document_id])
+        return result
+
+
 
+class ProcessingStage(models.Model):
+    """Checkpointed output of one pipeline stage (see myapp.pipeline), tagged with its config fingerprint"""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='stages')
+    stage = models.CharField(max_length=20)  # 'rasterize', 'ocr', 'enhance' or 'extract'
+    fingerprint = models.CharField(max_length=64)  # sha256 of this stage's config and the upstream fingerprint
+    artifact = models.JSONField(default=dict, blank=True)
+    duration = models.FloatField(default=0)  # seconds
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'stage'], name='processingstage_document_stage_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.stage} for Doc {self.document_id}"
+
+
+class ProcessingRun(models.Model):
+    """Per-document pipeline timings and counters from one processing attempt"""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='processing_runs')
+    status = models.CharField(max_length=20)  # 'success' or 'failed'
+    duration = models.FloatField(default=0)  # seconds, end to end
+    stage_timings = models.JSONField(default=dict, blank=True)  # stage -> seconds
+    counters = models.JSONField(default=dict, blank=True)  # pages, tokens, cache hits, ...
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Run for Doc {self.document_id}: {self.status} in {self.duration:.2f}s"
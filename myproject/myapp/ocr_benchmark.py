@@ -0,0 +1,313 @@
+"""
+OCR benchmark harness
+Renders a reproducible synthetic forms corpus and measures OCR latency and accuracy
+"""
+import itertools
+import json
+import platform
+import random
+import re
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from .metrics import latency_summary, track_run
+from .ocr_engines import build_router, recognize_document
+from .ocr_utils import extract_text_document, get_pytesseract
+
+
+VARIANTS = ("clean", "noise", "skew", "blur")
+STAGES = ("rasterize", "preprocess", "tesseract", "reocr")
+
+# Label printed on the form -> FIELD_SCHEMA key
+FORM_FIELDS = [
+    ("Name", "name"),
+    ("DOB", "dob"),
+    ("Address", "address"),
+    ("City", "city"),
+    ("State", "state"),
+    ("Zip", "zip"),
+    ("Phone", "phone"),
+    ("Email", "email"),
+    ("Gender", "gender"),
+    ("Marital Status", "marital_status"),
+    ("Occupation", "occupation"),
+    ("Emergency Contact Name", "emergency_contact_name"),
+    ("Emergency Contact Phone", "emergency_contact_phone"),
+    ("Policy Number", "policy_number"),
+    ("Date", "date"),
+]
+
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+               "David", "Elizabeth", "Ravi", "Priya", "Arjun", "Ananya", "Carlos", "Sofia"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+              "Sharma", "Reddy", "Patel", "Kumar", "Lopez", "Martin", "Clark", "Lewis"]
+STREETS = ["Main St", "Oak Ave", "Maple Dr", "Cedar Ln", "Park Rd", "Lake View", "Hill St"]
+CITIES = [("Springfield", "IL"), ("Austin", "TX"), ("Denver", "CO"), ("Portland", "OR"),
+          ("Columbus", "OH"), ("Madison", "WI"), ("Raleigh", "NC"), ("Phoenix", "AZ")]
+OCCUPATIONS = ["Engineer", "Teacher", "Nurse", "Accountant", "Designer", "Clerk", "Driver"]
+MARITAL = ["Single", "Married", "Divorced", "Widowed"]
+FONT_CANDIDATES = ["DejaVuSans.ttf", "LiberationSans-Regular.ttf", "Arial.ttf", "arial.ttf"]
+
+
+def _date(rng, start_year, end_year):
+    return f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(start_year, end_year)}"
+
+
+def _phone(rng):
+    return f"{rng.randint(200, 989)}-{rng.randint(200, 989)}-{rng.randint(1000, 9999)}"
+
+
+def generate_fields(rng):
+    """Random but reproducible ground-truth field values for one form"""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    city, state = rng.choice(CITIES)
+    return {
+        "name": f"{first} {last}",
+        "dob": _date(rng, 1950, 2005),
+        "address": f"{rng.randint(10, 9999)} {rng.choice(STREETS)}",
+        "city": city,
+        "state": state,
+        "zip": f"{rng.randint(10000, 99999)}",
+        "phone": _phone(rng),
+        "email": f"{first}.{last}{rng.randint(1, 99)}@example.com".lower(),
+        "gender": rng.choice(["Male", "Female"]),
+        "marital_status": rng.choice(MARITAL),
+        "occupation": rng.choice(OCCUPATIONS),
+        "emergency_contact_name": f"{rng.choice(FIRST_NAMES)} {last}",
+        "emergency_contact_phone": _phone(rng),
+        "policy_number": f"POL-{rng.randint(100000, 999999)}",
+        "date": _date(rng, 2023, 2026),
+    }
+
+
+def form_lines(fields):
+    """Text lines printed on the form, which are also the OCR ground truth"""
+    lines = ["PATIENT REGISTRATION FORM"]
+    lines += [f"{label}: {fields[key]}" for label, key in FORM_FIELDS]
+    return lines
+
+
+def _load_font(size):
+    for candidate in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def render_form(lines, dpi=200):
+    """Render form lines onto a US-letter page at the given DPI, as a BGR array"""
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    page = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(page)
+    font = _load_font(max(8, int(12 * dpi / 72)))
+    margin = int(0.75 * dpi)
+    line_height = int(font.size * 1.8)
+    y = margin
+    for line in lines:
+        draw.text((margin, y), line, fill="black", font=font)
+        y += line_height
+    return cv2.cvtColor(np.array(page), cv2.COLOR_RGB2BGR)
+
+
+def apply_variant(image, variant, rng):
+    """Degrade a clean page the way real scans do"""
+    if variant == "clean":
+        return image
+    if variant == "noise":
+        noise = rng.normal(0, 25, image.shape)
+        noisy = np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+        speckle = rng.random(image.shape[:2]) < 0.002
+        noisy[speckle] = 0
+        return noisy
+    if variant == "skew":
+        h, w = image.shape[:2]
+        angle = rng.uniform(1.5, 4.0) * rng.choice([-1, 1])
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        return cv2.warpAffine(image, matrix, (w, h), borderValue=(255, 255, 255))
+    if variant == "blur":
+        return cv2.GaussianBlur(image, (5, 5), 1.5)
+    raise ValueError(f"Unknown variant: {variant}")
+
+
+def generate_corpus(out_dir, documents=10, variants=VARIANTS, dpis=(200,), seed=0):
+    """Write the synthetic corpus as PNGs plus a manifest.json of ground truth"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    forms = [generate_fields(rng) for _ in range(documents)]
+
+    samples = []
+    for dpi in dpis:
+        for idx, fields in enumerate(forms):
+            lines = form_lines(fields)
+            clean = render_form(lines, dpi=dpi)
+            for variant in variants:
+                # Seed per sample so adding variants/DPIs never changes existing images
+                np_rng = np.random.default_rng([seed, idx, dpi, VARIANTS.index(variant)])
+                image = apply_variant(clean, variant, np_rng)
+                path = out_dir / f"dpi{dpi}" / f"form_{idx:03d}_{variant}.png"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                cv2.imwrite(str(path), image)
+                samples.append({
+                    "path": str(path.relative_to(out_dir)),
+                    "document": idx,
+                    "variant": variant,
+                    "dpi": dpi,
+                    "text": "\n".join(lines),
+                    "fields": fields,
+                })
+
+    manifest = {"seed": seed, "documents": documents, "variants": list(variants),
+                "dpis": list(dpis), "samples": samples}
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def levenshtein(a, b):
+    """Edit distance between two sequences"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, start=1):
+        current = [i]
+        for j, y in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def normalize_text(text):
+    """Collapse whitespace so layout differences don't count as errors"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def character_error_rate(reference, hypothesis):
+    ref, hyp = normalize_text(reference), normalize_text(hypothesis)
+    return levenshtein(ref, hyp) / max(1, len(ref))
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = normalize_text(reference).split(), normalize_text(hypothesis).split()
+    return levenshtein(ref, hyp) / max(1, len(ref))
+
+
+def read_fields(ocr_text):
+    """Pull 'Label: value' pairs back out of OCR text"""
+    found = {}
+    labels = sorted(FORM_FIELDS, key=lambda item: -len(item[0]))
+    for line in ocr_text.splitlines():
+        for label, key in labels:
+            m = re.match(rf"\s*{re.escape(label)}\s*[:;.]?\s*(.*)$", line, re.IGNORECASE)
+            if m and key not in found:
+                found[key] = m.group(1)
+                break
+    return found
+
+
+def field_accuracy(expected, ocr_text):
+    """Per-field exact match (case/whitespace-insensitive) against ground truth"""
+    found = read_fields(ocr_text)
+    return {
+        key: normalize_text(found.get(key, "")).lower() == normalize_text(value).lower()
+        for key, value in expected.items()
+    }
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 4) if values else 0.0
+
+
+def run_config(corpus_dir, samples, psm, oem, dpi, engines=None, threshold=None, refine=True):
+    """
+    OCR every sample at one DPI under one psm/oem pair.
+    With `engines`, pages go through a CascadeRouter instead of Tesseract alone.
+    """
+    router = build_router(engines, threshold=threshold, psm=psm, oem=oem, refine=refine) if engines else None
+    stages = STAGES + tuple(f"ocr_{name}" for name in engines or ())
+    stage_seconds = {stage: [] for stage in stages + ("total",)}
+    by_variant = {}
+    per_field = {}
+    cers, wers, field_scores = [], [], []
+    pages = 0
+
+    started = time.perf_counter()
+    for sample in samples:
+        if sample["dpi"] != dpi:
+            continue
+        path = Path(corpus_dir) / sample["path"]
+        t0 = time.perf_counter()
+        with track_run() as run:
+            if router:
+                result = recognize_document(path, router=router, dpi=dpi)
+            else:
+                result = extract_text_document(path, psm=psm, oem=oem, dpi=dpi, refine=refine)
+        stage_seconds["total"].append(time.perf_counter() - t0)
+        for stage in stages:
+            stage_seconds[stage].append(run.timings.get(stage, 0.0))
+        pages += result["page_count"]
+
+        cer = character_error_rate(sample["text"], result["combined_text"])
+        wer = word_error_rate(sample["text"], result["combined_text"])
+        matches = field_accuracy(sample["fields"], result["combined_text"])
+        score = sum(matches.values()) / len(matches)
+        cers.append(cer)
+        wers.append(wer)
+        field_scores.append(score)
+        for key, ok in matches.items():
+            per_field.setdefault(key, []).append(1.0 if ok else 0.0)
+        bucket = by_variant.setdefault(sample["variant"], {"cer": [], "wer": [], "field_accuracy": []})
+        bucket["cer"].append(cer)
+        bucket["wer"].append(wer)
+        bucket["field_accuracy"].append(score)
+    wall = time.perf_counter() - started
+
+    report = {
+        "config": {"psm": psm, "oem": oem, "dpi": dpi, "refine": refine},
+        "pages": pages,
+        "wall_seconds": round(wall, 3),
+        "pages_per_sec": round(pages / wall, 3) if wall else 0.0,
+        "latency": {stage: latency_summary(values) for stage, values in stage_seconds.items()},
+        "accuracy": {
+            "cer": _mean(cers),
+            "wer": _mean(wers),
+            "field_accuracy": _mean(field_scores),
+            "per_field": {key: _mean(values) for key, values in per_field.items()},
+        },
+        "by_variant": {
+            variant: {metric: _mean(values) for metric, values in metrics.items()}
+            for variant, metrics in by_variant.items()
+        },
+    }
+    if router:
+        report["config"].update(engines=list(engines), threshold=router.threshold)
+        report["routing"] = router.report()
+    return report
+
+
+def run_benchmark(corpus_dir, psms=(6,), oems=(3,), dpis=(200,), documents=10,
+                  variants=VARIANTS, seed=0, engines=None, threshold=None, refine=True):
+    """Generate the corpus and OCR it under every psm x oem x dpi combination"""
+    manifest = generate_corpus(corpus_dir, documents=documents, variants=variants, dpis=dpis, seed=seed)
+    runs = [
+        run_config(corpus_dir, manifest["samples"], psm, oem, dpi, engines=engines, threshold=threshold,
+                   refine=refine)
+        for psm, oem, dpi in itertools.product(psms, oems, dpis)
+    ]
+    return {
+        "seed": seed,
+        "documents": documents,
+        "variants": list(variants),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "tesseract": str(get_pytesseract().get_tesseract_version()),
+            "opencv": cv2.__version__,
+        },
+        "runs": runs,
+    }
@@ -0,0 +1,238 @@
+"""
+Pluggable OCR engines
+Every engine turns one page (BGR array) into text, word boxes and a 0-1 confidence;
+the router runs the cheap engine first and escalates low-confidence pages
+"""
+import importlib.util
+import threading
+
+from django.conf import settings
+
+from .metrics import OCR_ENGINE_PAGES, incr, latency_summary, stage_timer
+from .ocr_utils import load_document_pages, run_ocr_on_image
+
+
+class OCREngine:
+    """Engine protocol: recognize(page) -> {"text", "boxes", "confidence"}"""
+
+    name = None
+
+    def recognize(self, page):
+        raise NotImplementedError
+
+
+class TesseractEngine(OCREngine):
+    """Tesseract via ocr_utils (with selective re-OCR); confidence is the mean word confidence"""
+
+    name = "tesseract"
+
+    def __init__(self, lang="eng", psm=6, oem=3, extra_config=None, refine=True):
+        self.lang = lang
+        self.psm = psm
+        self.oem = oem
+        self.extra_config = extra_config
+        self.refine = refine
+
+    def recognize(self, page):
+        result = run_ocr_on_image(page, lang=self.lang, psm=self.psm, oem=self.oem,
+                                  extra_config=self.extra_config, refine=self.refine)
+        # A page with no recognised words scores 0 so it always escalates
+        return {"text": result["text"], "boxes": result["words"], "confidence": result["confidence"]}
+
+
+_donut_lock = threading.Lock()
+_donut_engine = None
+
+
+def load_donut_ocr():
+    """Load DonutOCR from the 'DONUT OCR' app once per process"""
+    global _donut_engine
+    with _donut_lock:
+        if _donut_engine is None:
+            path = settings.DONUT_OCR_DIR / "ocr_engine.py"
+            if not path.exists():
+                raise FileNotFoundError(f"Donut OCR engine not found at: {path}")
+            spec = importlib.util.spec_from_file_location("donut_ocr_engine", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _donut_engine = module.DonutOCR(
+                model_name=getattr(settings, "DONUT_MODEL", "naver-clova-ix/donut-base-finetuned-cord-v2"),
+                backend=getattr(settings, "DONUT_BACKEND", "eager"),
+                task=getattr(settings, "DONUT_TASK", "cord-v2"),
+            )
+        return _donut_engine
+
+
+def flatten_donut(result, prefix=""):
+    """Donut's nested JSON as 'key: value' lines"""
+    if isinstance(result, dict):
+        if set(result) == {"text_sequence"}:
+            return [result["text_sequence"]]
+        lines = []
+        for key, value in result.items():
+            lines += flatten_donut(value, f"{prefix}{key}.")
+        return lines
+    if isinstance(result, list):
+        return [line for item in result for line in flatten_donut(item, prefix)]
+    return [f"{prefix.rstrip('.')}: {result}"]
+
+
+class DonutEngine(OCREngine):
+    """
+    Donut (document-understanding transformer) from the 'DONUT OCR' app.
+    It has no word boxes or calibrated confidence, so it reports confidence None
+    and is meant to be the last engine in a cascade.
+    """
+
+    name = "donut"
+
+    def recognize(self, page):
+        import cv2
+        from PIL import Image
+
+        image = Image.fromarray(cv2.cvtColor(page, cv2.COLOR_BGR2RGB))
+        result = load_donut_ocr().process_image(image)
+        return {"text": "\n".join(flatten_donut(result)), "boxes": [], "confidence": None, "structured": result}
+
+
+ENGINES = {
+    "tesseract": TesseractEngine,
+    "donut": DonutEngine,
+}
+
+
+class CascadeRouter:
+    """
+    Runs engines cheapest first and escalates a page to the next engine while its
+    confidence is below `threshold`. If an escalation fails, the best result so far
+    is kept. Per-engine pages, outcomes and latencies are kept for report().
+    """
+
+    def __init__(self, engines, threshold=0.6):
+        if not engines:
+            raise ValueError("CascadeRouter needs at least one engine")
+        self.engines = list(engines)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._stats = {
+            engine.name: {"pages": 0, "accepted": 0, "escalated": 0, "failed": 0, "seconds": []}
+            for engine in self.engines
+        }
+
+    def _record(self, engine, outcome, seconds=None):
+        OCR_ENGINE_PAGES.inc(engine=engine.name, outcome=outcome)
+        with self._lock:
+            stats = self._stats[engine.name]
+            stats["pages"] += 1
+            stats[outcome] += 1
+            if seconds is not None:
+                stats["seconds"].append(seconds)
+
+    def recognize(self, page):
+        attempts = []
+        for index, engine in enumerate(self.engines):
+            last = index == len(self.engines) - 1
+            try:
+                with stage_timer(f"ocr_{engine.name}") as timer:
+                    result = engine.recognize(page)
+            except Exception:
+                self._record(engine, "failed")
+                if not attempts and last:
+                    raise
+                continue
+            result = {**result, "engine": engine.name, "seconds": timer.seconds}
+            attempts.append(result)
+            confidence = result["confidence"]
+            if last or confidence is None or confidence >= self.threshold:
+                self._record(engine, "accepted", timer.seconds)
+                break
+            self._record(engine, "escalated", timer.seconds)
+            incr("ocr_escalations")
+
+        accepted = attempts[-1]
+        if accepted["confidence"] is not None or not accepted["text"].strip():
+            # Escalation didn't help (or failed): keep whichever engine was most sure
+            accepted = max(attempts, key=lambda a: (bool(a["text"].strip()), a["confidence"] or 0))
+        summary = [{"engine": a["engine"], "confidence": a["confidence"], "seconds": round(a["seconds"], 4)}
+                   for a in attempts]
+        return {**accepted, "attempts": summary}
+
+    def report(self):
+        """Per-engine page counts, latency summary and escalation rate"""
+        with self._lock:
+            return {
+                name: {
+                    "pages": stats["pages"],
+                    "accepted": stats["accepted"],
+                    "escalated": stats["escalated"],
+                    "failed": stats["failed"],
+                    "escalation_rate": round(stats["escalated"] / stats["pages"], 4) if stats["pages"] else 0.0,
+                    "latency": latency_summary(stats["seconds"]),
+                }
+                for name, stats in self._stats.items()
+            }
+
+
+def build_router(engine_names=None, threshold=None, **tesseract_options):
+    """Router for the configured OCR_ENGINES / OCR_ESCALATION_THRESHOLD settings"""
+    names = engine_names or getattr(settings, "OCR_ENGINES", ["tesseract"])
+    unknown = [name for name in names if name not in ENGINES]
+    if unknown:
+        raise ValueError(f"Unknown OCR engines: {', '.join(unknown)}")
+    engines = [
+        TesseractEngine(**tesseract_options) if name == "tesseract" else ENGINES[name]()
+        for name in names
+    ]
+    if threshold is None:
+        threshold = getattr(settings, "OCR_ESCALATION_THRESHOLD", 0.6)
+    return CascadeRouter(engines, threshold=threshold)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Process-wide router built from settings, once even under concurrent first requests"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = build_router()
+        return _router
+
+
+def recognize_pages(pages, router=None):
+    """Route already rasterized pages (BGR arrays); recognize_document without the rasterization"""
+    router = router or get_router()
+    results = []
+    for idx, page in enumerate(pages, start=1):
+        results.append({"page": idx, **router.recognize(page)})
+
+    combined_text = "\n\n".join(r["text"] for r in results)
+    confidences = [r["confidence"] for r in results]
+    incr("pages", len(pages))
+    incr("ocr_characters", len(combined_text))
+    return {
+        "pages": results,
+        "combined_text": combined_text,
+        "page_count": len(pages),
+        "engines": [r["engine"] for r in results],
+        # Unknown (None) when there are no pages or any page came from an engine without
+        # calibrated confidence
+        "confidence": (None if not confidences or None in confidences
+                       else round(sum(confidences) / len(confidences), 4)),
+    }
+
+
+def recognize_document(doc_path, router=None, dpi=200, keep_images=False):
+    """
+    Route every page of a PDF/image. Same shape as ocr_utils.extract_text_document.
+    keep_images=True also returns the rasterized pages as "images" (for previews).
+    """
+    with stage_timer("rasterize") as rasterize_timer:
+        pages = load_document_pages(doc_path, dpi=dpi)
+    result = recognize_pages(pages, router)
+    result["timings"] = {"rasterize": rasterize_timer.seconds}
+    if keep_images:
+        result["images"] = pages
+    return result
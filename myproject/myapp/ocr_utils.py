@@ -2,18 +2,19 @@
 OCR utility module - extracted from ocr.ipynb
 Handles image/PDF OCR processing using Tesseract
 """
+import functools
+import shutil
+from collections import OrderedDict
 from pathlib import Path
-import cv2
-import numpy as np
-import pytesseract
-from PIL import Image
-from pdf2image import convert_from_path
+
+from .metrics import incr, stage_timer
+
+# cv2, numpy, pytesseract and pdf2image are imported inside the functions that use them,
+# so importing this module (and the views) stays cheap until the first OCR
 
 
 # Tesseract configuration
 TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-if Path(TESSERACT_CMD).exists():
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 
 # Poppler path for PDF to image conversion
 POPPLER_PATH = r"C:\Users\tsheikh\Downloads\Release-25.12.0-0\poppler-25.12.0\Library\bin"
@@ -21,20 +22,52 @@ if POPPLER_PATH and not Path(POPPLER_PATH).exists():
     POPPLER_PATH = None
 
 
+# Selective re-OCR: lines containing a word below this confidence (0-1) are cropped,
+# upscaled, Otsu-binarized and read again as a single line
+REOCR_LINE_CONFIDENCE = 0.6
+REOCR_SCALE = 2.0
+REOCR_PSM = 7
+REOCR_MAX_LINES = 20  # per page, weakest first
+
+
+@functools.lru_cache(maxsize=None)
+def find_tesseract():
+    """Tesseract binary (TESSERACT_CMD, else on PATH) or None; looked up once per process"""
+    if Path(TESSERACT_CMD).exists():
+        return TESSERACT_CMD
+    return shutil.which("tesseract")
+
+
+@functools.lru_cache(maxsize=None)
+def find_poppler():
+    """Poppler's pdftoppm (in POPPLER_PATH, else on PATH) or None; looked up once per process"""
+    if POPPLER_PATH:
+        return shutil.which("pdftoppm", path=POPPLER_PATH)
+    return shutil.which("pdftoppm")
+
+
 def assert_tesseract_available():
     """Raise a helpful error if Tesseract is missing."""
-    cmd = Path(pytesseract.pytesseract.tesseract_cmd or "tesseract")
-    if not cmd.exists() and cmd.name == "tesseract":
+    if find_tesseract() is None:
         raise FileNotFoundError(
             "Tesseract not found. Install it and/or set TESSERACT_CMD to the exe path."
         )
-    if cmd.exists():
-        return
-    raise FileNotFoundError(f"Tesseract binary not found at: {cmd}")
+
+
+def get_pytesseract():
+    """pytesseract, pointed at the binary find_tesseract() located"""
+    import pytesseract
+
+    cmd = find_tesseract()
+    if cmd:
+        pytesseract.pytesseract.tesseract_cmd = cmd
+    return pytesseract
 
 
 def load_image(path):
     """Load an image from file path"""
+    import cv2
+
     img_path = Path(path)
     if not img_path.exists():
         raise FileNotFoundError(f"Image not found: {img_path}")
@@ -46,6 +79,9 @@ def load_image(path):
 
 def preprocess_image(image):
     """Lightweight cleanup tuned for filled forms"""
+    import cv2
+    import numpy as np
+
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     denoised = cv2.fastNlMeansDenoising(gray, h=15)
     thresh = cv2.adaptiveThreshold(
@@ -56,14 +92,18 @@ def preprocess_image(image):
     return processed
 
 
-def load_document_pages(path):
+def load_document_pages(path, dpi=200):
     """Load document pages - handles both images and PDFs"""
     doc_path = Path(path)
     if not doc_path.exists():
         raise FileNotFoundError(f"Document not found: {doc_path}")
 
     if doc_path.suffix.lower() == ".pdf":
-        pil_pages = convert_from_path(doc_path, poppler_path=POPPLER_PATH)
+        import cv2
+        import numpy as np
+        from pdf2image import convert_from_path
+
+        pil_pages = convert_from_path(doc_path, dpi=dpi, poppler_path=POPPLER_PATH)
         pages = []
         for pil_img in pil_pages:
             rgb = np.array(pil_img)
@@ -74,41 +114,183 @@ def load_document_pages(path):
     return [load_image(str(doc_path))]
 
 
-def run_ocr_on_image(image, lang="eng", psm=6, oem=3, extra_config=None):
-    """Run OCR on a single image"""
+def word_boxes(data):
+    """Recognised words from image_to_data with boxes and a 0-1 confidence"""
+    words = []
+    for i, text in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if not text.strip() or conf < 0:
+            continue
+        words.append({
+            "text": text,
+            "left": int(data["left"][i]),
+            "top": int(data["top"][i]),
+            "width": int(data["width"][i]),
+            "height": int(data["height"][i]),
+            "confidence": round(conf / 100, 4),
+            "line": (data["block_num"][i], data["par_num"][i], data["line_num"][i]),
+        })
+    return words
+
+
+def page_confidence(words):
+    """Mean word confidence; 0 when nothing was recognised"""
+    if not words:
+        return 0.0
+    return round(sum(w["confidence"] for w in words) / len(words), 4)
+
+
+def group_lines(words):
+    """Words grouped by Tesseract line, in reading order"""
+    lines = OrderedDict()
+    for word in words:
+        lines.setdefault(tuple(word["line"]), []).append(word)
+    return list(lines.items())
+
+
+def lines_to_text(lines):
+    """Rebuild page text from grouped lines, with a blank line between paragraphs"""
+    out, previous = [], None
+    for key, words in lines:
+        if previous is not None and key[:2] != previous:
+            out.append("")
+        out.append(" ".join(w["text"] for w in words))
+        previous = key[:2]
+    return "\n".join(out)
+
+
+def reocr_line(image, words, lang="eng", scale=REOCR_SCALE, psm=REOCR_PSM, padding=4):
+    """Read one line again from an upscaled, Otsu-binarized crop of the original page"""
+    import cv2
+
+    pytesseract = get_pytesseract()
+    height, width = image.shape[:2]
+    x0 = max(0, min(w["left"] for w in words) - padding)
+    y0 = max(0, min(w["top"] for w in words) - padding)
+    x1 = min(width, max(w["left"] + w["width"] for w in words) + padding)
+    y1 = min(height, max(w["top"] + w["height"] for w in words) + padding)
+    crop = image[y0:y1, x0:x1]
+    if crop.size == 0:
+        return []
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    upscaled = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    _, binary = cv2.threshold(upscaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    data = pytesseract.image_to_data(
+        binary, lang=lang, config=f"--psm {psm} --oem 3", output_type=pytesseract.Output.DICT
+    )
+    line_key = words[0]["line"]
+    candidate = []
+    for word in word_boxes(data):
+        # Map the box back to page coordinates and keep the original line identity
+        candidate.append({
+            **word,
+            "left": x0 + int(word["left"] / scale),
+            "top": y0 + int(word["top"] / scale),
+            "width": int(word["width"] / scale),
+            "height": int(word["height"] / scale),
+            "line": line_key,
+        })
+    return candidate
+
+
+def refine_low_confidence(image, words, lang="eng", threshold=REOCR_LINE_CONFIDENCE,
+                          max_lines=REOCR_MAX_LINES):
+    """
+    Re-OCR weak lines and keep whichever reading has the higher mean confidence, as long as the
+    re-read covers at least as many words (dropping hard words would otherwise raise the mean)
+    """
+    lines = group_lines(words)
+    weak = sorted(
+        (idx for idx, (_, line_words) in enumerate(lines)
+         if min(w["confidence"] for w in line_words) < threshold),
+        key=lambda idx: page_confidence(lines[idx][1]),
+    )[:max_lines]
+    improved = 0
+    for idx in weak:
+        key, line_words = lines[idx]
+        candidate = reocr_line(image, line_words, lang=lang)
+        if len(candidate) >= len(line_words) and page_confidence(candidate) > page_confidence(line_words):
+            lines[idx] = (key, candidate)
+            improved += 1
+    incr("reocr_lines_checked", len(weak))
+    incr("reocr_lines_improved", improved)
+    return lines, {"lines_checked": len(weak), "lines_improved": improved}
+
+
+def run_ocr_on_image(image, lang="eng", psm=6, oem=3, extra_config=None, refine=True):
+    """
+    Run OCR on a single image.
+    With `refine`, low-confidence lines are re-read (see refine_low_confidence) and the
+    better readings merged back into the text.
+    """
     assert_tesseract_available()
-    preprocessed = preprocess_image(image)
+    pytesseract = get_pytesseract()
+    with stage_timer("preprocess") as preprocess_timer:
+        preprocessed = preprocess_image(image)
 
     config_parts = [f"--psm {psm}", f"--oem {oem}"]
     if extra_config:
         config_parts.append(extra_config)
     config = " ".join(config_parts)
 
-    text = pytesseract.image_to_string(preprocessed, lang=lang, config=config)
-    data = pytesseract.image_to_data(
-        preprocessed, lang=lang, config=config, output_type=pytesseract.Output.DICT
-    )
+    with stage_timer("tesseract") as tesseract_timer:
+        text = pytesseract.image_to_string(preprocessed, lang=lang, config=config)
+        data = pytesseract.image_to_data(
+            preprocessed, lang=lang, config=config, output_type=pytesseract.Output.DICT
+        )
+
+    words = word_boxes(data)
+    reocr = {"lines_checked": 0, "lines_improved": 0}
+    reocr_seconds = 0.0
+    if refine and words:
+        with stage_timer("reocr") as reocr_timer:
+            lines, reocr = refine_low_confidence(image, words, lang=lang)
+            if reocr["lines_improved"]:
+                words = [w for _, line_words in lines for w in line_words]
+                text = lines_to_text(lines)
+        reocr_seconds = reocr_timer.seconds
 
     return {
         "text": text.strip(),
         "raw_data": data,
+        "words": words,
+        "confidence": page_confidence(words),
+        "reocr": reocr,
         "config_used": config,
+        "timings": {
+            "preprocess": preprocess_timer.seconds,
+            "tesseract": tesseract_timer.seconds,
+            "reocr": reocr_seconds,
+        },
     }
 
 
-def extract_text(image_path, lang="eng", psm=6, oem=3, extra_config=None):
+def extract_text(image_path, lang="eng", psm=6, oem=3, extra_config=None, refine=True):
     """OCR for a single image file"""
     image = load_image(image_path)
-    return run_ocr_on_image(image, lang=lang, psm=psm, oem=oem, extra_config=extra_config)
+    return run_ocr_on_image(image, lang=lang, psm=psm, oem=oem, extra_config=extra_config, refine=refine)
 
 
-def extract_text_document(doc_path, lang="eng", psm=6, oem=3, extra_config=None):
-    """OCR for PDFs or images. Returns per-page results and combined text."""
-    pages = load_document_pages(doc_path)
+def extract_text_document(doc_path, lang="eng", psm=6, oem=3, extra_config=None, dpi=200, refine=True):
+    """OCR for PDFs or images. Returns per-page results, combined text and confidence."""
+    with stage_timer("rasterize") as rasterize_timer:
+        pages = load_document_pages(doc_path, dpi=dpi)
+    timings = {"rasterize": rasterize_timer.seconds, "preprocess": 0.0, "tesseract": 0.0, "reocr": 0.0}
     results = []
     for idx, page in enumerate(pages, start=1):
-        page_result = run_ocr_on_image(page, lang=lang, psm=psm, oem=oem, extra_config=extra_config)
+        page_result = run_ocr_on_image(page, lang=lang, psm=psm, oem=oem, extra_config=extra_config,
+                                       refine=refine)
+        for stage, seconds in page_result["timings"].items():
+            timings[stage] += seconds
         results.append({"page": idx, **page_result})
 
     combined_text = "\n\n".join(r["text"] for r in results)
-    return {"pages": results, "combined_text": combined_text, "page_count": len(pages)}
+    incr("pages", len(pages))
+    incr("ocr_characters", len(combined_text))
+    return {
+        "pages": results,
+        "combined_text": combined_text,
+        "page_count": len(pages),
+        "confidence": page_confidence([w for r in results for w in r["words"]]),
+        "timings": timings,
+    }
@@ -0,0 +1,248 @@
+"""
+Staged processing pipeline
+rasterize -> ocr -> enhance -> extract. Each stage's output is checkpointed as a ProcessingStage
+tagged with a fingerprint of its configuration chained with the stages before it, so a retry
+or a config change re-runs only the stages after the latest checkpoint that still matches
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .llm_utils import FIELD_SCHEMA, PROMPT_BUDGETS, PROMPT_VERSIONS, clean_ocr_text, extract_fields, get_provider
+from .metrics import DOCUMENT_SECONDS, incr, stage_timer
+from .models import FIELD_COLUMNS, DocumentText, ProcessingRun, ProcessingStage
+from .ocr_engines import recognize_pages
+from .ocr_utils import REOCR_LINE_CONFIDENCE, REOCR_MAX_LINES, REOCR_PSM, REOCR_SCALE, load_document_pages
+from .prompt_budget import JUNK_CONFIDENCE
+
+
+STAGES = ("rasterize", "ocr", "enhance", "extract")
+RASTERIZE_DPI = 200
+PNG_COMPRESSION = 1  # fast; pages are lossless so a re-OCR sees exactly what the first run saw
+
+
+class StageFailed(Exception):
+    """A pipeline stage raised; the checkpoints of the stages before it are kept"""
+
+    def __init__(self, stage, error):
+        super().__init__(f"{stage} stage failed: {error}")
+        self.stage = stage
+
+
+def stage_configs():
+    """Everything that determines each stage's output, per stage"""
+    provider = get_provider()
+    llm = {"provider": provider.name, "model": provider.model}
+    engines = list(getattr(settings, "OCR_ENGINES", ["tesseract"]))
+    ocr = {
+        "engines": engines,
+        "threshold": getattr(settings, "OCR_ESCALATION_THRESHOLD", 0.6),
+        "reocr": [REOCR_LINE_CONFIDENCE, REOCR_SCALE, REOCR_PSM, REOCR_MAX_LINES],
+    }
+    if "donut" in engines:
+        ocr["donut"] = [getattr(settings, "DONUT_MODEL", None), getattr(settings, "DONUT_TASK", None)]
+    return {
+        "rasterize": {"dpi": RASTERIZE_DPI},
+        "ocr": ocr,
+        "enhance": {
+            **llm,
+            "prompt": PROMPT_VERSIONS["enhance_text"],
+            "budget": PROMPT_BUDGETS["enhance_text"],
+            "skip_above": getattr(settings, "OCR_SKIP_ENHANCE_CONFIDENCE", None),
+            "junk_confidence": JUNK_CONFIDENCE,
+        },
+        "extract": {
+            **llm,
+            "prompt": PROMPT_VERSIONS["extract_fields"],
+            "budget": PROMPT_BUDGETS["extract_fields"],
+            # ingest_documents checkpoints its packed extraction as this stage too
+            "batch_prompt": PROMPT_VERSIONS["extract_fields_batch"],
+            "fields": list(FIELD_SCHEMA),
+        },
+    }
+
+
+def stage_fingerprints(configs=None):
+    """{stage: sha256}; each includes the previous stage's fingerprint, so changes cascade downstream"""
+    configs = configs or stage_configs()
+    fingerprints, upstream = {}, ""
+    for stage in STAGES:
+        payload = json.dumps({"upstream": upstream, "config": configs[stage]}, sort_keys=True)
+        upstream = fingerprints[stage] = hashlib.sha256(payload.encode()).hexdigest()
+    return fingerprints
+
+
+def plan_stages(checkpoints, fingerprints, start=None):
+    """
+    Stages to run, given {stage: stored fingerprint}: those after the latest checkpoint that
+    matches the current fingerprint. `start` forces that stage and everything after it.
+    """
+    end = STAGES.index(start) if start else len(STAGES)
+    for index in range(end - 1, -1, -1):
+        stage = STAGES[index]
+        if checkpoints.get(stage) == fingerprints[stage]:
+            return list(STAGES[index + 1:])
+    return list(STAGES)
+
+
+def pages_dir(document_id):
+    return os.path.join(settings.MEDIA_ROOT, "pipeline", str(document_id))
+
+
+def store_pages(document_id, images):
+    """Write rasterized pages as PNGs; returns the rasterize artifact"""
+    import cv2
+
+    target = pages_dir(document_id)
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target)
+    names = []
+    for number, image in enumerate(images, start=1):
+        name = f"page-{number}.png"
+        if not cv2.imwrite(os.path.join(target, name), image, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]):
+            raise OSError(f"Failed to write page {number} of document {document_id}")
+        names.append(name)
+    return {"dpi": RASTERIZE_DPI, "pages": names}
+
+
+def pages_exist(document_id, artifact):
+    return all(os.path.exists(os.path.join(pages_dir(document_id), name)) for name in artifact.get("pages", ()))
+
+
+def load_pages(document_id, artifact):
+    import cv2
+
+    return [cv2.imread(os.path.join(pages_dir(document_id), name)) for name in artifact["pages"]]
+
+
+def ocr_artifact(result):
+    """The JSON-serializable part of a recognize_pages/recognize_document result"""
+    return {
+        "text": result["combined_text"],
+        "confidence": result["confidence"],
+        "page_count": result["page_count"],
+        "pages": [
+            {"page": page["page"], "text": page["text"], "confidence": page["confidence"],
+             "engine": page["engine"], "boxes": page["boxes"]}
+            for page in result["pages"]
+        ],
+    }
+
+
+def enhance_artifact(ocr):
+    """Enhanced text for an OCR artifact (see llm_utils.clean_ocr_text)"""
+    return {
+        "enhanced_text": clean_ocr_text(
+            ocr["text"],
+            confidence=ocr["confidence"],
+            skip_enhance_above=getattr(settings, "OCR_SKIP_ENHANCE_CONFIDENCE", None),
+            pages=[page["text"] for page in ocr["pages"]],
+            page_words=[page["boxes"] for page in ocr["pages"]],
+        )
+    }
+
+
+def _rasterize(document, artifacts, state):
+    with stage_timer("rasterize"):
+        state["images"] = load_document_pages(document.uploaded_file.path, dpi=RASTERIZE_DPI)
+    with stage_timer("store_pages"):
+        return store_pages(document.id, state["images"])
+
+
+def _ocr(document, artifacts, state):
+    if state.get("images") is None:
+        state["images"] = load_pages(document.id, artifacts["rasterize"])
+    return ocr_artifact(recognize_pages(state["images"]))
+
+
+def _enhance(document, artifacts, state):
+    return enhance_artifact(artifacts["ocr"])
+
+
+def _extract(document, artifacts, state):
+    return {"fields": extract_fields(artifacts["enhance"]["enhanced_text"])}
+
+
+def _checkpoint(document, stage, fingerprint, artifact, duration):
+    ProcessingStage.objects.update_or_create(
+        document=document, stage=stage,
+        defaults={"fingerprint": fingerprint, "artifact": artifact, "duration": duration},
+    )
+
+
+RUNNERS = {"rasterize": _rasterize, "ocr": _ocr, "enhance": _enhance, "extract": _extract}
+
+
+def run_pipeline(document, start=None, fingerprints=None):
+    """
+    Bring a document up to date: run the stages plan_stages() selects, checkpointing each one
+    as it finishes; the extract checkpoint is written in one transaction with the fields and
+    text. Raises StageFailed naming the failed stage.
+    Returns {"ran", "reused", "fields", "enhanced_text", "raw_ocr_text", "images"}; "images"
+    are the page arrays when this run rasterized or loaded them, else None.
+    """
+    fingerprints = fingerprints or stage_fingerprints()
+    checkpoints = {row.stage: row for row in ProcessingStage.objects.filter(document=document)}
+    todo = plan_stages({stage: row.fingerprint for stage, row in checkpoints.items()}, fingerprints, start)
+    artifacts = {stage: row.artifact for stage, row in checkpoints.items() if stage not in todo}
+    if "ocr" in todo and "rasterize" not in todo and not pages_exist(document.id, artifacts["rasterize"]):
+        todo.insert(0, "rasterize")  # the stored pages were removed; rasterize again
+
+    state, durations = {}, {}
+    for stage in todo:
+        started = time.perf_counter()
+        try:
+            artifacts[stage] = RUNNERS[stage](document, artifacts, state)
+            durations[stage] = round(time.perf_counter() - started, 4)
+            if stage != STAGES[-1]:
+                _checkpoint(document, stage, fingerprints[stage], artifacts[stage], durations[stage])
+        except Exception as e:
+            incr("pipeline_stage_failures")
+            raise StageFailed(stage, e) from e
+    incr("pipeline_stages_run", len(todo))
+    incr("pipeline_stages_reused", len(STAGES) - len(todo))
+
+    if todo:
+        # The last checkpoint commits with the fields and text it produced, so a failed write
+        # leaves extract stale and the next run redoes it instead of reporting nothing to do
+        document.set_fields(artifacts["extract"]["fields"])
+        try:
+            with stage_timer("db_save"), transaction.atomic():
+                _checkpoint(document, STAGES[-1], fingerprints[STAGES[-1]], artifacts[STAGES[-1]],
+                            durations[STAGES[-1]])
+                document.save(update_fields=FIELD_COLUMNS)
+                DocumentText.objects.update_or_create(
+                    document=document,
+                    defaults={"raw_ocr_text": artifacts["ocr"]["text"],
+                              "enhanced_text": artifacts["enhance"]["enhanced_text"]},
+                )
+        except Exception as e:
+            incr("pipeline_stage_failures")
+            raise StageFailed(STAGES[-1], e) from e
+    return {
+        "ran": todo,
+        "reused": [stage for stage in STAGES if stage not in todo],
+        "fields": artifacts["extract"]["fields"],
+        "enhanced_text": artifacts["enhance"]["enhanced_text"],
+        "raw_ocr_text": artifacts["ocr"]["text"],
+        "images": state.get("images"),
+    }
+
+
+def record_processing_run(document, run, error=None):
+    """Persist per-stage timings for one pipeline run and feed the latency histogram"""
+    run_status = "failed" if error else "success"
+    DOCUMENT_SECONDS.observe(run.duration, status=run_status)
+    ProcessingRun.objects.create(
+        document=document,
+        status=run_status,
+        duration=run.duration,
+        stage_timings=run.timings,
+        counters=run.counters,
+        error=str(error) if error else "",
+    )
@@ -0,0 +1,29 @@
+"""
+Startup preflight
+Checks once per process, when the app is ready, that the OCR binaries and Python packages are
+present. Packages are located with importlib.util.find_spec, so nothing heavy is imported.
+"""
+import functools
+import importlib.util
+import logging
+
+from .ocr_utils import find_poppler, find_tesseract
+
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use by ocr_utils, ocr_engines, previews and llm_providers
+OCR_MODULES = ("cv2", "numpy", "pytesseract", "pdf2image", "PIL")
+LLM_MODULES = ("openai",)
+
+
+@functools.lru_cache(maxsize=None)
+def preflight():
+    """{"tools": {name: path or None}, "modules": {name: bool}, "problems": [...]}, computed once"""
+    tools = {"tesseract": find_tesseract(), "pdftoppm": find_poppler()}
+    modules = {name: importlib.util.find_spec(name) is not None for name in OCR_MODULES + LLM_MODULES}
+    problems = [f"{name} binary not found" for name, path in tools.items() if path is None]
+    problems += [f"Python package '{name}' not installed" for name, found in modules.items() if not found]
+    for problem in problems:
+        logger.warning("Preflight: %s", problem)
+    return {"tools": tools, "modules": modules, "problems": problems}
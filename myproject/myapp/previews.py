@@ -0,0 +1,170 @@
+"""
+Page previews
+JPEG previews and thumbnails of every page, rendered once (from the OCR rasterization at upload,
+or lazily on first request) and stored under MEDIA_ROOT/previews/<document id>/
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import incr, stage_timer
+from .ocr_utils import load_document_pages
+
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_SIZES = {"thumb": 240, "full": 1200}  # maximum width in pixels
+PREVIEW_DPI = 150  # rasterization DPI when previews are rendered lazily
+PREVIEW_QUALITY = 85  # JPEG quality
+PREVIEW_MAX_AGE = 365 * 24 * 3600  # previews never change for a stored upload
+PREVIEW_RETRY_SECONDS = 300  # after a failed render, previews 404 for this long before retrying
+
+_render_locks = {}
+_render_locks_guard = threading.Lock()
+
+
+def preview_dir(document_id):
+    return os.path.join(settings.MEDIA_ROOT, "previews", str(document_id))
+
+
+def preview_path(document_id, page, size):
+    return os.path.join(preview_dir(document_id), f"page-{page}-{size}.jpg")
+
+
+def _resize(image, width):
+    import cv2
+
+    height, current = image.shape[:2]
+    if current <= width:
+        return image
+    return cv2.resize(image, (width, round(height * width / current)), interpolation=cv2.INTER_AREA)
+
+
+def encode_previews(pages):
+    """JPEG bytes of every page at every PREVIEW_SIZES width, keyed by file name"""
+    import cv2
+
+    encoded = {}
+    for number, image in enumerate(pages, start=1):
+        for size, width in PREVIEW_SIZES.items():
+            ok, data = cv2.imencode(".jpg", _resize(image, width), [cv2.IMWRITE_JPEG_QUALITY, PREVIEW_QUALITY])
+            if not ok:
+                raise ValueError(f"Failed to encode page {number} preview")
+            encoded[f"page-{number}-{size}.jpg"] = data.tobytes()
+    return encoded
+
+
+def store_previews(document_id, encoded):
+    """
+    Write encoded previews for a document. Files go to a temporary directory that is
+    renamed into place, so readers never see a partial set.
+    """
+    target = preview_dir(document_id)
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{document_id}-", dir=parent)
+    try:
+        for name, data in encoded.items():
+            with open(os.path.join(staging, name), "wb") as fh:
+                fh.write(data)
+        os.replace(staging, target)
+    except OSError:
+        # Another worker finished first; keep its copy
+        if not os.path.isdir(target):
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    incr("previews_rendered", len(encoded) // len(PREVIEW_SIZES))
+
+
+def render_previews(document, pages=None):
+    """
+    Render and store every page's previews. `pages` are the BGR page images already
+    rasterized for OCR; without them the upload is rasterized at PREVIEW_DPI.
+    Returns the page count.
+    """
+    with stage_timer("previews"):
+        if pages is None:
+            pages = load_document_pages(document.uploaded_file.path, dpi=PREVIEW_DPI)
+        store_previews(document.id, encode_previews(pages))
+    return len(pages)
+
+
+def try_render_previews(document, pages=None):
+    """render_previews that logs instead of raising, so a preview never fails an upload"""
+    try:
+        return render_previews(document, pages)
+    except Exception:
+        logger.warning("Preview rendering failed for document %s", document.id, exc_info=True)
+        return 0
+
+
+def _render_failure_key(document_id):
+    return f"preview-render-failed:{document_id}"
+
+
+def render_failed_recently(document_id):
+    """Whether rendering the document's previews failed within the last PREVIEW_RETRY_SECONDS"""
+    return cache.get(_render_failure_key(document_id)) is not None
+
+
+def ensure_previews(document):
+    """
+    Render the document's previews unless they already exist (one render per document at a time).
+    A failed render is remembered in the cache for PREVIEW_RETRY_SECONDS before the lock is
+    released, so requests that waited on it don't repeat it.
+    """
+    if os.path.isdir(preview_dir(document.id)):
+        return
+    with _render_locks_guard:
+        lock = _render_locks.setdefault(document.id, threading.Lock())
+    try:
+        with lock:
+            if os.path.isdir(preview_dir(document.id)) or render_failed_recently(document.id):
+                return
+            try:
+                render_previews(document)
+            except Exception:
+                cache.set(_render_failure_key(document.id), True, PREVIEW_RETRY_SECONDS)
+                raise
+    finally:
+        with _render_locks_guard:
+            _render_locks.pop(document.id, None)
+
+
+def try_ensure_previews(document):
+    """
+    ensure_previews that logs instead of raising (missing upload, no poppler, corrupt PDF, ...).
+    A failure is remembered for PREVIEW_RETRY_SECONDS, so requests in between don't re-render.
+    Returns False while the document's previews are unavailable.
+    """
+    if render_failed_recently(document.id):
+        return False
+    try:
+        ensure_previews(document)
+    except Exception:
+        logger.warning("Preview rendering failed for document %s", document.id, exc_info=True)
+        return False
+    return not render_failed_recently(document.id)
+
+
+def preview_stat(document_id, page, size):
+    """os.stat of a stored preview, or None when it does not exist"""
+    try:
+        return os.stat(preview_path(document_id, page, size))
+    except FileNotFoundError:
+        return None
+
+
+def preview_etag(stat):
+    return f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def preview_last_modified(stat):
+    return datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
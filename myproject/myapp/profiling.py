@@ -0,0 +1,255 @@
+"""
+Opt-in request profiling
+Profiles individual requests with cProfile plus a stack sampler and keeps the
+results in a bounded on-disk ring (pstats + flamegraph-ready collapsed stacks)
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.core import signing
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from django.urls import Resolver404, get_resolver
+
+
+logger = logging.getLogger(__name__)
+
+SIGNING_SALT = "myapp.profiling"
+TOKEN_VALUE = "profile"
+
+
+def profiling_dir():
+    return Path(getattr(settings, "PROFILING_DIR", settings.BASE_DIR / "profiles"))
+
+
+def make_token():
+    """Signed value for the profiling request header"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(TOKEN_VALUE)
+
+
+def token_is_valid(token):
+    max_age = getattr(settings, "PROFILING_TOKEN_MAX_AGE", 3600)
+    try:
+        return signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=max_age) == TOKEN_VALUE
+    except signing.BadSignature:
+        return False
+
+
+class StackSampler:
+    """Samples one thread's Python stack on an interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def resolves_to_sync_view(request):
+    """Whether the request's URL maps to a sync view (one Django runs in a thread under ASGI)"""
+    try:
+        match = get_resolver(getattr(request, "urlconf", None)).resolve(request.path_info)
+    except Resolver404:
+        return False
+    return not iscoroutinefunction(match.func)
+
+
+def view_was_profiled(request, profiler):
+    """
+    Whether the profiled thread ran code from the view's module; None when there was no view.
+    False means the view ran on another thread and the profile does not cover it.
+    """
+    match = getattr(request, "resolver_match", None)
+    module = sys.modules.get(match.func.__module__) if match else None
+    filename = getattr(module, "__file__", None)
+    if filename is None:
+        return None
+    return any(key[0] == filename for key in pstats.Stats(profiler).stats)
+
+
+def list_profiles():
+    """Metadata for every captured profile, newest first"""
+    entries = []
+    for meta_path in profiling_dir().glob("*.json"):
+        try:
+            entries.append(json.loads(meta_path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return sorted(entries, key=lambda e: e["started_at"], reverse=True)
+
+
+def enforce_ring(limit):
+    """Drop the oldest profiles beyond the configured limit"""
+    for entry in list_profiles()[limit:]:
+        for suffix in (".pstats", ".collapsed", ".json"):
+            (profiling_dir() / f"{entry['id']}{suffix}").unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when PROFILING_ENABLED is set, or when the request carries
+    a valid signed token in the PROFILING_HEADER header (see `manage.py profiling_token`).
+    Works under WSGI and ASGI. On ASGI one request is profiled at a time: async views are
+    profiled on the event loop thread (concurrent requests' frames can show up in them), sync
+    views on the executor thread that runs them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self._async_profile_lock = threading.Lock()
+
+    def should_profile(self, request):
+        if getattr(settings, "PROFILING_ENABLED", False):
+            return True
+        header = getattr(settings, "PROFILING_HEADER", "X-Profile-Token")
+        token = request.headers.get(header)
+        return bool(token) and token_is_valid(token)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        capture = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(capture)
+        return self.finish(capture, request, response)
+
+    async def __acall__(self, request):
+        if not self.should_profile(request) or not self._async_profile_lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            if resolves_to_sync_view(request):
+                # The view runs in asgiref's thread-sensitive executor thread, not on the loop
+                return await sync_to_async(self.profile_in_thread, thread_sensitive=True)(request)
+            capture = self.start()
+            try:
+                response = await self.get_response(request)
+            finally:
+                self.stop(capture)
+        finally:
+            self._async_profile_lock.release()
+        return self.finish(capture, request, response)
+
+    def profile_in_thread(self, request):
+        """Profile this (executor) thread while it drives the rest of the async stack, so the
+        sync view, which asgiref sends back to the thread that called async_to_sync, runs here"""
+        capture = self.start()
+        try:
+            response = async_to_sync(self.get_response)(request)
+        finally:
+            self.stop(capture)
+        return self.finish(capture, request, response)
+
+    def start(self):
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), getattr(settings, "PROFILING_SAMPLE_INTERVAL", 0.005))
+        capture = {"profiler": profiler, "sampler": sampler, "started_at": time.time(),
+                   "started": time.perf_counter()}
+        sampler.start()
+        profiler.enable()
+        return capture
+
+    def stop(self, capture):
+        capture["profiler"].disable()
+        capture["sampler"].stop()
+        capture["duration"] = time.perf_counter() - capture["started"]
+
+    def finish(self, capture, request, response):
+        started_at = capture["started_at"]
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime(started_at))}-{uuid.uuid4().hex[:8]}"
+        try:
+            self.save(profile_id, request, response, capture["profiler"], capture["sampler"],
+                      started_at, capture["duration"])
+            response["X-Profile-Id"] = profile_id
+        except OSError:
+            pass
+        return response
+
+    def save(self, profile_id, request, response, profiler, sampler, started_at, duration):
+        view_profiled = view_was_profiled(request, profiler)
+        if view_profiled is False:
+            logger.warning("Profile %s of %s did not capture the view's thread", profile_id, request.path)
+        out_dir = profiling_dir()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(out_dir / f"{profile_id}.pstats"))
+        (out_dir / f"{profile_id}.collapsed").write_text(sampler.collapsed())
+        (out_dir / f"{profile_id}.json").write_text(json.dumps({
+            "id": profile_id,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "samples": sum(sampler.stacks.values()),
+            "view_profiled": view_profiled,
+            "started_at": started_at,
+        }))
+        enforce_ring(getattr(settings, "PROFILING_MAX_PROFILES", 50))
+
+
+def profiles_view(request):
+    """Admin page listing the slowest captured requests"""
+    entries = sorted(list_profiles(), key=lambda e: e["duration_ms"], reverse=True)
+    for entry in entries:
+        entry["started"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(entry["started_at"]))
+    context = {
+        **admin.site.each_context(request),
+        "title": "Request profiles",
+        "profiles": entries,
+        "enabled": getattr(settings, "PROFILING_ENABLED", False),
+        "header": getattr(settings, "PROFILING_HEADER", "X-Profile-Token"),
+    }
+    return render(request, "admin/profiles.html", context)
+
+
+def profile_download(request, profile_id, kind):
+    """Serve a captured profile file"""
+    if kind not in ("pstats", "collapsed") or profile_id not in {e["id"] for e in list_profiles()}:
+        raise Http404("Profile not found")
+    path = profiling_dir() / f"{profile_id}.{kind}"
+    if not path.exists():
+        raise Http404("Profile not found")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=path.name)
@@ -0,0 +1,177 @@
+"""
+Prompt budgeting
+Measures prompts in model tokens (tiktoken when available) and compresses OCR text
+deterministically so every LLM call fits its token budget
+"""
+import logging
+import re
+import threading
+
+from .metrics import incr
+
+
+logger = logging.getLogger(__name__)
+
+ENCODING_NAME = "o200k_base"  # gpt-4o / gpt-4o-mini tokenizer
+JUNK_CONFIDENCE = 0.3  # OCR words below this (0-1) are candidates for removal
+JUNK_CHARS = set("|~_=*^`'\"°•·»«¦{}[]<>\\")
+SEPARATOR_RUN = re.compile(r"([-_=.*~#])\1{3,}")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """The tiktoken encoding, or None when tiktoken (or its BPE file) is unavailable"""
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(ENCODING_NAME)
+            except Exception:
+                # Not installed, or offline with no cached BPE file
+                _encoding = None
+        return _encoding
+
+
+def count_tokens(text):
+    """Prompt size in tokens; estimated from word pieces when tiktoken is unavailable"""
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # BPE vocabularies cover roughly four letters per token, punctuation is its own token
+    return len(re.findall(r"\w{1,4}|[^\w\s]", text))
+
+
+def truncate_to_tokens(text, budget):
+    """Longest prefix of text within `budget` tokens, cut at a line break when possible"""
+    if budget <= 0:
+        return ""
+    if count_tokens(text) <= budget:
+        return text
+    kept, used = [], 0
+    for line in text.splitlines():
+        cost = count_tokens(line + "\n")
+        if used + cost > budget:
+            if not kept:
+                # A single oversized line: cut it by characters
+                low, high = 0, len(line)
+                while low < high:
+                    mid = (low + high + 1) // 2
+                    if count_tokens(line[:mid]) <= budget:
+                        low = mid
+                    else:
+                        high = mid - 1
+                kept.append(line[:low])
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+def _is_junk(token):
+    return all(c in JUNK_CHARS for c in token)
+
+
+def _looks_like_junk(token):
+    """A weak reading that doesn't look like a word or number (mostly symbols)"""
+    return sum(c.isalnum() for c in token) / len(token) < 0.5
+
+
+def _align(token, words, cursor, lookahead=3):
+    """Index of the OCR word this text token came from, searching a few words past `cursor`"""
+    for index in range(cursor, min(cursor + lookahead, len(words))):
+        if words[index]["text"] == token:
+            return index
+    return None
+
+
+def drop_weak_words(text, words, threshold=JUNK_CONFIDENCE):
+    """
+    Page text without the words OCR read below `threshold` that look like junk. Tokens are
+    matched to `words` (ocr_utils.word_boxes, in reading order) by position, so a weak reading
+    only removes that occurrence, never other occurrences of the same string.
+    """
+    lines, cursor = [], 0
+    for line in text.splitlines():
+        kept = []
+        for token in line.split():
+            index = _align(token, words, cursor)
+            if index is not None:
+                cursor = index + 1
+                confidence = words[index].get("confidence")
+                if confidence is not None and confidence < threshold and _looks_like_junk(token):
+                    continue
+            kept.append(token)
+        lines.append(" ".join(kept))
+    return "\n".join(lines)
+
+
+def dedupe_page_furniture(pages, edge_lines=3):
+    """Drop header/footer lines that already appeared at the top or bottom of an earlier page"""
+    seen = set()
+    result = []
+    for page in pages:
+        lines = page.splitlines()
+        content = [i for i, line in enumerate(lines) if line.strip()]
+        edges = set(content[:edge_lines] + content[-edge_lines:])
+        kept = []
+        for i, line in enumerate(lines):
+            key = " ".join(line.lower().split())
+            if i in edges and key in seen:
+                continue
+            kept.append(line)
+        seen.update(" ".join(lines[i].lower().split()) for i in edges)
+        result.append("\n".join(kept))
+    return result
+
+
+def compress_ocr_text(text, pages=None, page_words=None):
+    """
+    Deterministic, meaning-preserving shrink of OCR text:
+    repeated page headers/footers (when `pages` is given), separator runs, stray
+    symbol tokens, low-confidence junk (when `page_words`, each page's OCR words, is given),
+    whitespace runs and consecutive duplicate lines.
+    """
+    if page_words:
+        if not pages or len(pages) != len(page_words):
+            pages, page_words = [text], [[w for words in page_words for w in words]]
+        pages = [drop_weak_words(page, words) for page, words in zip(pages, page_words)]
+        text = "\n\n".join(pages)
+    if pages and len(pages) > 1:
+        text = "\n\n".join(dedupe_page_furniture(pages))
+    lines = []
+    for line in text.splitlines():
+        if not line.strip():
+            if lines and lines[-1]:
+                lines.append("")  # keep a single blank line as a paragraph break
+            continue
+        line = SEPARATOR_RUN.sub(" ", line)
+        line = " ".join(t for t in line.split() if not _is_junk(t))
+        if not line:
+            continue
+        if lines and line == lines[-1]:
+            continue
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def fit_prompt(call, build, text, budget, original_text=None):
+    """
+    Build the prompt for `call` with build(text), shrinking `text` until it fits
+    `budget` tokens. Logs and counts the size before compression/trimming and after.
+    Returns (prompt, text actually used).
+    """
+    before = count_tokens(build(original_text if original_text is not None else text))
+    prompt = build(text)
+    if count_tokens(prompt) > budget:
+        overhead = count_tokens(build(""))
+        text = truncate_to_tokens(text, budget - overhead)
+        prompt = build(text)
+    after = count_tokens(prompt)
+    incr("prompt_tokens_saved", max(0, before - after))
+    logger.info("%s prompt: %d -> %d tokens (budget %d)", call, before, after, budget)
+    return prompt, text
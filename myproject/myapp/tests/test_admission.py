@@ -0,0 +1,171 @@
+import asyncio
+import json
+import threading
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from myapp import admission
+from myapp.admission import AdmissionController, Rejected
+
+
+def controller(**limits):
+    return AdmissionController("test", **{"concurrency": 1, "queue": 1, "per_client": 2, "queue_timeout": 5.0, **limits})
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def acquire_in_thread(self, controller, client):
+        """Start acquire() in a thread; returns (thread, outcome list) once it is queued or done"""
+        outcome = []
+
+        def run():
+            try:
+                controller.acquire(client)
+                outcome.append("admitted")
+            except Rejected as rejected:
+                outcome.append(rejected.reason)
+
+        queued = len(controller.waiters)
+        thread = threading.Thread(target=run)
+        thread.start()
+        while thread.is_alive() and len(controller.waiters) == queued:
+            thread.join(0.01)
+        return thread, outcome
+
+    def test_admits_up_to_concurrency(self):
+        gate = controller(concurrency=2, per_client=5)
+        gate.acquire("a")
+        gate.acquire("b")
+        self.assertEqual(gate.in_flight, 2)
+        self.assertEqual(gate.clients, {"a": 1, "b": 1})
+
+    def test_release_hands_the_slot_to_the_next_waiter(self):
+        gate = controller()
+        gate.acquire("a")
+        thread, outcome = self.acquire_in_thread(gate, "b")
+        self.assertEqual(len(gate.waiters), 1)
+
+        gate.release("a", 0.5)
+        thread.join(5)
+        self.assertEqual(outcome, ["admitted"])
+        self.assertEqual(gate.in_flight, 1)
+        self.assertEqual(gate.clients, {"b": 1})
+
+        gate.release("b", 0.5)
+        self.assertEqual(gate.in_flight, 0)
+        self.assertEqual(gate.clients, {})
+
+    def test_full_queue_rejects(self):
+        gate = controller()
+        gate.acquire("a")
+        thread, _ = self.acquire_in_thread(gate, "b")
+        with self.assertRaises(Rejected) as raised:
+            gate.acquire("c")
+        self.assertEqual(raised.exception.reason, "queue_full")
+        gate.release("a", 0.1)
+        thread.join(5)
+
+    def test_per_client_bound_counts_queued_requests(self):
+        gate = controller(per_client=1)
+        gate.acquire("a")
+        with self.assertRaises(Rejected) as raised:
+            gate.acquire("a")
+        self.assertEqual(raised.exception.reason, "client")
+        self.assertEqual(len(gate.waiters), 0)
+
+    def test_queue_timeout_rejects_and_leaves_the_queue(self):
+        gate = controller(queue_timeout=0.05)
+        gate.acquire("a")
+        with self.assertRaises(Rejected) as raised:
+            gate.acquire("b")
+        self.assertEqual(raised.exception.reason, "queue_timeout")
+        self.assertEqual(len(gate.waiters), 0)
+        self.assertEqual(gate.clients, {"a": 1})
+
+    async def test_async_waiter_is_admitted_on_release(self):
+        gate = controller()
+        await gate.aacquire("a")
+        waiting = asyncio.ensure_future(gate.aacquire("b"))
+        await asyncio.sleep(0)
+        self.assertEqual(len(gate.waiters), 1)
+
+        gate.release("a", 0.1)
+        await asyncio.wait_for(waiting, 5)
+        self.assertEqual(gate.clients, {"b": 1})
+        self.assertEqual(gate.in_flight, 1)
+
+    async def test_async_timeout_and_cancel_leave_no_trace(self):
+        gate = controller(queue=2, queue_timeout=0.05)
+        await gate.aacquire("a")
+        with self.assertRaises(Rejected):
+            await gate.aacquire("b")
+
+        waiting = asyncio.ensure_future(gate.aacquire("c"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(len(gate.waiters), 0)
+        self.assertEqual(gate.clients, {"a": 1})
+
+    def test_retry_after_scales_with_service_time_and_queue(self):
+        gate = controller(concurrency=2, queue=4)
+        self.assertEqual(gate.retry_after(), 1)
+        gate.acquire("a")
+        gate.release("a", 4.0)
+        self.assertEqual(gate.service_time, 4.0)
+        self.assertEqual(gate.retry_after(), 2)  # 4s for the next slot, two slots draining
+        gate.release("a", 0.0)  # no sample: the estimate is unchanged
+        self.assertEqual(gate.service_time, 4.0)
+
+
+@override_settings(ADMISSION_ENABLED=True, ADMISSION_LIMITS={"upload": {"concurrency": 1, "queue": 0}})
+class AdmissionDecoratorTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(admission._controllers, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = RequestFactory().post("/api/upload/", REMOTE_ADDR="10.0.0.1")
+
+    def test_settings_override_the_defaults(self):
+        gate = admission.get_controller("upload")
+        self.assertEqual((gate.concurrency, gate.queue_size), (1, 0))
+        self.assertEqual(gate.per_client, admission.DEFAULT_LIMITS["upload"]["per_client"])
+        self.assertIs(admission.get_controller("upload"), gate)
+
+    def test_overload_gets_429_with_retry_after(self):
+        view = admission.admission("upload")(lambda request: HttpResponse("ok"))
+        admission.get_controller("upload").acquire("10.0.0.2")
+
+        response = view(self.request)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(json.loads(response.content)["reason"], "queue_full")
+
+    def test_admitted_request_releases_its_slot(self):
+        view = admission.admission("upload")(lambda request: HttpResponse("ok"))
+        self.assertEqual(view(self.request).status_code, 200)
+        gate = admission.get_controller("upload")
+        self.assertEqual((gate.in_flight, gate.clients), (0, {}))
+        self.assertIsNotNone(gate.service_time)
+
+    @override_settings(ADMISSION_ENABLED=False)
+    def test_disabled_admission_skips_the_controller(self):
+        view = admission.admission("upload")(lambda request: HttpResponse("ok"))
+        admission.get_controller("upload").acquire("10.0.0.2")
+        self.assertEqual(view(self.request).status_code, 200)
+
+    async def test_async_view_overload_gets_429(self):
+        async def view(request):
+            return HttpResponse("ok")
+
+        await admission.get_controller("upload").aacquire("10.0.0.2")
+        response = await admission.admission("upload")(view)(self.request)
+        self.assertEqual(response.status_code, 429)
+
+    def test_forwarded_for_only_when_trusted(self):
+        request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.2.3.4, 10.0.0.1")
+        self.assertEqual(admission.client_id(request), "10.0.0.1")
+        with override_settings(ADMISSION_TRUST_FORWARDED_FOR=True):
+            self.assertEqual(admission.client_id(request), "1.2.3.4")
@@ -0,0 +1,104 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from myapp import llm_utils
+from myapp.llm_providers import LLMProvider
+from myapp.llm_utils import FIELD_SCHEMA, _batch_prompt, _pack, _valid_slice, extract_fields_batch
+from myapp.metrics import track_run
+from myapp.prompt_budget import count_tokens
+
+
+class ScriptedProvider(LLMProvider):
+    """Answers each prompt with reply(prompt) and records the prompts"""
+
+    name = "scripted"
+    default_model = "scripted"
+
+    def __init__(self, reply):
+        super().__init__()
+        self.reply = reply
+        self.prompts = []
+
+    def complete(self, prompt, max_tokens):
+        self.prompts.append(prompt)
+        return {"text": self.reply(prompt), "prompt_tokens": 1, "completion_tokens": 1}
+
+
+def fields(**values):
+    return {**{key: "" for key in FIELD_SCHEMA}, **values}
+
+
+class PackTests(SimpleTestCase):
+    def test_respects_batch_size(self):
+        texts = {i: f"Name: Person {i}" for i in range(7)}
+        batches = list(_pack(texts, batch_size=3, budget=10_000))
+        self.assertEqual([list(batch) for batch in batches], [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_respects_token_budget(self):
+        texts = {i: "\n".join(f"Field {j}: value {i}-{j}" for j in range(20)) for i in range(6)}
+        budget = count_tokens(_batch_prompt({0: texts[0], 1: texts[1]}))
+        batches = list(_pack(texts, batch_size=8, budget=budget))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 2])
+        for batch in batches:
+            self.assertLessEqual(count_tokens(_batch_prompt(batch)), budget)
+
+    def test_oversized_document_gets_its_own_batch(self):
+        texts = {1: "short", 2: "long " * 2000, 3: "short"}
+        self.assertEqual([list(batch) for batch in _pack(texts, batch_size=8, budget=200)], [[1], [2], [3]])
+
+
+class ValidSliceTests(SimpleTestCase):
+    def test_complete_object_of_strings_is_valid(self):
+        self.assertTrue(_valid_slice(fields(name="John")))
+
+    def test_missing_keys_wrong_types_and_non_objects_are_invalid(self):
+        incomplete = fields()
+        del incomplete["zip"]
+        for value in (incomplete, fields(zip=94105), None, "John", []):
+            with self.subTest(value=value):
+                self.assertFalse(_valid_slice(value))
+
+
+NAMES = ["Ann", "Bob", "Cy", "Dee", "Eve"]
+
+
+class ExtractFieldsBatchTests(SimpleTestCase):
+    def run_batch(self, reply, documents, **options):
+        provider = ScriptedProvider(reply)
+        with mock.patch.object(llm_utils, "_provider", provider), track_run() as run:
+            results = extract_fields_batch(documents, **options)
+        return results, provider, run.counters
+
+    def test_one_request_per_batch(self):
+        def reply(prompt):
+            ids = [line.split()[2] for line in prompt.splitlines() if line.startswith("=== Document ")]
+            return json.dumps({doc_id: fields(name=NAMES[int(doc_id)]) for doc_id in ids})
+
+        documents = {i: f"Name: {name}" for i, name in enumerate(NAMES)}
+        results, provider, counters = self.run_batch(reply, documents, batch_size=2)
+        self.assertEqual(len(provider.prompts), 3)
+        self.assertEqual([results[i]["name"] for i in documents], NAMES)
+        self.assertEqual(counters.get("batch_extract_retries", 0), 0)
+
+    def test_malformed_slices_are_retried_one_by_one(self):
+        def reply(prompt):
+            if "=== Document " in prompt:
+                # Document 1 is fine, 2 has a wrong type, 3 is missing
+                return json.dumps({"1": fields(name="Ann"), "2": fields(zip=94105)})
+            return json.dumps(fields(name="Retried"))
+
+        results, provider, counters = self.run_batch(reply, {1: "a", 2: "b", 3: "c"})
+        self.assertEqual(len(provider.prompts), 3)
+        self.assertEqual([results[i]["name"] for i in (1, 2, 3)], ["Ann", "Retried", "Retried"])
+        self.assertEqual(counters["batch_extract_retries"], 2)
+
+    def test_unparseable_response_retries_every_document(self):
+        results, provider, counters = self.run_batch(
+            lambda prompt: "not json" if "=== Document " in prompt else json.dumps(fields(city="Springfield")),
+            {1: "a", 2: "b"},
+        )
+        self.assertEqual(counters["batch_extract_retries"], 2)
+        self.assertEqual({r["city"] for r in results.values()}, {"Springfield"})
+        self.assertEqual(set(results[1]), set(FIELD_SCHEMA))
@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from myapp.metrics import track_run
+from myapp.models import ChatMessage, Document, touch_documents
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.document = Document.objects.create(uploaded_file="uploads/test.pdf", file_type="pdf", name="John Smith")
+
+    def url(self, name="get_document"):
+        return reverse(name, args=[self.document.id])
+
+    def test_get_carries_version_etag_and_revalidation_headers(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], f'"{self.document.id}-{self.document.version}"')
+        self.assertIn("Last-Modified", response)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(self.url())["ETag"]
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_save_bumps_version_and_etag(self):
+        etag = self.client.get(self.url())["ETag"]
+        version = self.document.version
+        self.document.name = "Jane Smith"
+        self.document.save()
+        self.assertEqual(self.document.version, version + 1)
+
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["extracted_data"]["name"], "Jane Smith")
+
+    def test_chat_message_invalidates_history(self):
+        etag = self.client.get(self.url("get_chat_history"))["ETag"]
+        ChatMessage.objects.create(document=self.document, question="Who?", answer="John")
+
+        response = self.client.get(self.url("get_chat_history"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m["question"] for m in response.json()["messages"]], ["Who?"])
+
+    def test_missing_document_is_404(self):
+        response = self.client.get(reverse("get_document", args=[self.document.id + 100]))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.document = Document.objects.create(uploaded_file="uploads/test.pdf", file_type="pdf", name="John Smith")
+
+    def fetch(self, name="get_document"):
+        with track_run() as run:
+            response = self.client.get(reverse(name, args=[self.document.id]))
+        self.assertEqual(response.status_code, 200)
+        return response, run.counters
+
+    def test_second_read_is_a_hit(self):
+        _, counters = self.fetch()
+        self.assertEqual(counters, {"response_cache_misses": 1})
+        _, counters = self.fetch()
+        self.assertEqual(counters, {"response_cache_hits": 1})
+
+    def test_endpoints_are_cached_separately(self):
+        self.fetch()
+        for name in ("download_json", "download_txt", "get_chat_history"):
+            with self.subTest(name=name):
+                _, counters = self.fetch(name)
+                self.assertEqual(counters, {"response_cache_misses": 1})
+
+    def test_bulk_update_with_touch_invalidates(self):
+        self.fetch("download_txt")
+        Document.objects.filter(id=self.document.id).update(name="Jane Smith")
+        touch_documents([self.document.id])
+
+        response, counters = self.fetch("download_txt")
+        self.assertEqual(counters, {"response_cache_misses": 1})
+        self.assertIn(b"Name: Jane Smith", response.content)
+
+    def test_save_invalidates(self):
+        self.fetch("download_json")
+        self.document.city = "Springfield"
+        self.document.save(update_fields=["city"])
+
+        response, counters = self.fetch("download_json")
+        self.assertEqual(counters, {"response_cache_misses": 1})
+        self.assertEqual(response.json()["extracted_fields"]["city"], "Springfield")
@@ -0,0 +1,114 @@
+from datetime import date
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from myapp.filters import FilterError, facet_counts, parse_facets, parse_filters
+from myapp.models import Document, parse_dob
+
+
+class ParseDobTests(SimpleTestCase):
+    def test_known_formats(self):
+        for value in ("01/02/1980", "01-02-1980", "1980-01-02", "1980/01/02"):
+            with self.subTest(value=value):
+                self.assertEqual(parse_dob(value), date(1980, 1, 2))
+        self.assertIsNone(parse_dob("second of January"))
+
+    def test_two_digit_future_years_belong_to_the_previous_century(self):
+        this_year = date.today().year % 100
+        self.assertEqual(parse_dob(f"01/02/{this_year + 1:02d}").year, 1900 + this_year + 1)
+        self.assertEqual(parse_dob("01/02/05"), date(2005, 1, 2))
+
+    def test_four_digit_years_are_kept(self):
+        self.assertEqual(parse_dob("01/02/2090"), date(2090, 1, 2))
+
+
+class DocumentFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rows = [
+            ("John Smith", "01/02/1980", "CA", "San Jose", "95112", "Single"),
+            ("joan Baker", "1975-06-07", "CA", "San Mateo", "94401", "Married"),
+            ("Jonas Park", "03/04/92", "CA", "Santa Cruz", "95060", "Married"),
+            ("Mary Jones", "", "NY", "New York", "10001", "Single"),
+        ]
+        for name, dob, state, city, zip_code, marital_status in rows:
+            document = Document(uploaded_file="uploads/test.pdf", file_type="pdf")
+            document.set_fields({"name": name, "dob": dob, "state": state, "city": city, "zip": zip_code,
+                                 "marital_status": marital_status})
+            document.save()
+
+    def names(self, **params):
+        return sorted(Document.objects.filter(parse_filters(params)).values_list("name", flat=True))
+
+    def test_exact_and_prefix(self):
+        self.assertEqual(self.names(state="NY"), ["Mary Jones"])
+        self.assertEqual(self.names(zip__prefix="95"), ["John Smith", "Jonas Park"])
+        self.assertEqual(self.names(city__prefix="San", state="CA"), ["John Smith", "Jonas Park", "joan Baker"])
+
+    def test_prefix_is_case_sensitive(self):
+        self.assertEqual(self.names(name__prefix="Jo"), ["John Smith", "Jonas Park"])
+        self.assertEqual(self.names(name__prefix="jo"), ["joan Baker"])
+
+    def test_empty_prefix_matches_everything(self):
+        self.assertEqual(len(self.names(name__prefix="")), 4)
+
+    def test_dob_ranges_use_the_parsed_date(self):
+        self.assertEqual(self.names(dob__gte="1980-01-01"), ["John Smith", "Jonas Park"])
+        self.assertEqual(self.names(dob__lt="1980-01-01"), ["joan Baker"])
+        self.assertEqual(self.names(dob="1992-03-04"), ["Jonas Park"])
+
+    def test_unknown_filters_and_bad_dates_raise(self):
+        for params in ({"color": "red"}, {"gender__prefix": "F"}, {"dob__gte": "yesterday"}):
+            with self.subTest(params=params), self.assertRaises(FilterError):
+                parse_filters(params)
+
+    def test_paging_parameters_are_ignored(self):
+        self.assertEqual(len(self.names(limit="10", offset="0", facets="state")), 4)
+
+    def test_facet_counts_over_the_filtered_set(self):
+        counts = facet_counts(Document.objects.filter(parse_filters({"state": "CA"})), ["marital_status", "state"])
+        self.assertEqual(counts["marital_status"], [{"value": "Married", "count": 2}, {"value": "Single", "count": 1}])
+        self.assertEqual(counts["state"], [{"value": "CA", "count": 3}])
+
+    def test_facet_counts_respect_the_limit_and_skip_blanks(self):
+        Document.objects.create(uploaded_file="uploads/blank.pdf", file_type="pdf")
+        counts = facet_counts(Document.objects.all(), ["city"], limit=2)
+        self.assertEqual(len(counts["city"]), 2)
+        self.assertNotIn("", [row["value"] for row in counts["city"]])
+
+    def test_parse_facets(self):
+        self.assertEqual(parse_facets("state, city"), ["state", "city"])
+        self.assertEqual(parse_facets(None), [])
+        with self.assertRaises(FilterError):
+            parse_facets("state,name")
+
+    def test_prefix_compares_under_a_binary_collation_on_locale_collated_backends(self):
+        with mock.patch("myapp.filters.connection") as connection:
+            connection.vendor = "postgresql"
+            sql = str(Document.objects.filter(parse_filters({"name__prefix": "Jo"})).query)
+        self.assertIn('COLLATE "C"', sql)
+
+
+class DobDateTests(TestCase):
+    def test_dob_date_follows_dob_on_every_save(self):
+        document = Document.objects.create(uploaded_file="uploads/test.pdf", dob="01/02/1980")
+        self.assertEqual(document.dob_date, date(1980, 1, 2))
+
+        document.dob = "1975-06-07"
+        document.save()
+        document.refresh_from_db()
+        self.assertEqual(document.dob_date, date(1975, 6, 7))
+
+        document.dob = "unknown"
+        document.save(update_fields=["dob"])
+        document.refresh_from_db()
+        self.assertIsNone(document.dob_date)
+
+    def test_saving_other_fields_leaves_dob_date_alone(self):
+        document = Document.objects.create(uploaded_file="uploads/test.pdf", dob="01/02/1980")
+        Document.objects.filter(id=document.id).update(dob="1999-01-01")
+        document.name = "Renamed"
+        document.save(update_fields=["name"])
+        document.refresh_from_db()
+        self.assertEqual(document.dob_date, date(1980, 1, 2))
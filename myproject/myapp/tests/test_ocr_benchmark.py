@@ -0,0 +1,46 @@
+import random
+
+from django.test import SimpleTestCase
+
+from myapp.ocr_benchmark import (
+    FORM_FIELDS, character_error_rate, field_accuracy, form_lines, generate_fields, levenshtein,
+    read_fields, word_error_rate,
+)
+
+
+class ScoringTests(SimpleTestCase):
+    def test_levenshtein(self):
+        self.assertEqual(levenshtein("kitten", "sitting"), 3)
+        self.assertEqual(levenshtein("", "abc"), 3)
+        self.assertEqual(levenshtein(["a", "b"], ["a", "b"]), 0)
+
+    def test_error_rates_ignore_layout_whitespace(self):
+        self.assertEqual(character_error_rate("Name: John", "Name:   John\n"), 0)
+        self.assertEqual(word_error_rate("Name: John Smith", "Name:\nJohn  Smith"), 0)
+
+    def test_error_rates(self):
+        self.assertAlmostEqual(character_error_rate("abcd", "abxd"), 0.25)
+        self.assertAlmostEqual(word_error_rate("one two three four", "one too three"), 0.5)
+        self.assertEqual(character_error_rate("", "noise"), 5)
+
+    def test_read_fields_prefers_the_longest_label(self):
+        found = read_fields("Emergency Contact Name: Mary Smith\nName; John Smith\nDate: 01/02/2024\nDOB. 03/04/1980")
+        self.assertEqual(found["emergency_contact_name"], "Mary Smith")
+        self.assertEqual(found["name"], "John Smith")
+        self.assertEqual(found["date"], "01/02/2024")
+        self.assertEqual(found["dob"], "03/04/1980")
+
+    def test_field_accuracy_on_perfect_and_damaged_text(self):
+        fields = generate_fields(random.Random(0))
+        lines = form_lines(fields)
+        self.assertTrue(all(field_accuracy(fields, "\n".join(lines)).values()))
+
+        damaged = "\n".join(line.replace(fields["city"], fields["city"].upper()) if line.startswith("City")
+                            else line.replace("@", "(a)") for line in lines)
+        accuracy = field_accuracy(fields, damaged)
+        self.assertTrue(accuracy["city"])  # case-insensitive
+        self.assertFalse(accuracy["email"])
+
+    def test_corpus_fields_are_reproducible(self):
+        self.assertEqual(generate_fields(random.Random(7)), generate_fields(random.Random(7)))
+        self.assertEqual(set(generate_fields(random.Random(7))), {key for _, key in FORM_FIELDS})
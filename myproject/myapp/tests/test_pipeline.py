@@ -0,0 +1,165 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from myapp import llm_utils, pipeline
+from myapp.llm_providers import FakeProvider
+from myapp.models import Document, ProcessingStage
+from myapp.pipeline import STAGES, StageFailed, plan_stages, run_pipeline, stage_fingerprints
+
+FINGERPRINTS = {stage: f"{stage}-v1" for stage in STAGES}
+
+
+class PlanStagesTests(SimpleTestCase):
+    def test_nothing_checkpointed_runs_everything(self):
+        self.assertEqual(plan_stages({}, FINGERPRINTS), list(STAGES))
+
+    def test_up_to_date_runs_nothing(self):
+        self.assertEqual(plan_stages(FINGERPRINTS, FINGERPRINTS), [])
+
+    def test_resumes_after_the_latest_matching_checkpoint(self):
+        checkpoints = {"rasterize": "rasterize-v1", "ocr": "ocr-v1"}
+        self.assertEqual(plan_stages(checkpoints, FINGERPRINTS), ["enhance", "extract"])
+
+    def test_stale_stage_and_everything_after_it_rerun(self):
+        checkpoints = {**FINGERPRINTS, "enhance": "enhance-v0", "extract": "extract-v0"}
+        self.assertEqual(plan_stages(checkpoints, FINGERPRINTS), ["enhance", "extract"])
+
+    def test_start_forces_that_stage_onwards(self):
+        self.assertEqual(plan_stages(FINGERPRINTS, FINGERPRINTS, start="ocr"), ["ocr", "enhance", "extract"])
+        self.assertEqual(plan_stages(FINGERPRINTS, FINGERPRINTS, start="rasterize"), list(STAGES))
+        # ...but never reuses a stale checkpoint before it
+        self.assertEqual(plan_stages({"rasterize": "rasterize-v1"}, FINGERPRINTS, start="extract"),
+                         ["ocr", "enhance", "extract"])
+
+
+class StageFingerprintTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(llm_utils, "_provider", FakeProvider())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stable_for_the_same_config(self):
+        self.assertEqual(stage_fingerprints(), stage_fingerprints())
+
+    def test_config_change_cascades_downstream(self):
+        before = stage_fingerprints()
+        with override_settings(OCR_ENGINES=["tesseract", "easyocr"]):
+            after = stage_fingerprints()
+        self.assertEqual(after["rasterize"], before["rasterize"])
+        for stage in ("ocr", "enhance", "extract"):
+            self.assertNotEqual(after[stage], before[stage])
+
+    def test_model_change_leaves_ocr_alone(self):
+        before = stage_fingerprints()
+        with mock.patch.object(llm_utils, "_provider", FakeProvider(model="other")):
+            after = stage_fingerprints()
+        self.assertEqual([after[s] == before[s] for s in STAGES], [True, True, False, False])
+
+
+class RunPipelineTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.calls = []
+        self.fail = set()
+        runners = mock.patch.dict(pipeline.RUNNERS, {stage: self.runner(stage) for stage in STAGES})
+        runners.start()
+        self.addCleanup(runners.stop)
+        self.document = Document.objects.create(uploaded_file="uploads/test.pdf", file_type="pdf")
+
+    def runner(self, stage):
+        def run(document, artifacts, state):
+            self.calls.append(stage)
+            if stage in self.fail:
+                raise RuntimeError(f"{stage} broke")
+            if stage == "rasterize":
+                os.makedirs(pipeline.pages_dir(document.id), exist_ok=True)
+                open(os.path.join(pipeline.pages_dir(document.id), "page-1.png"), "wb").close()
+                return {"pages": ["page-1.png"]}
+            if stage == "ocr":
+                return {"text": "Name:   John Smith", "confidence": 0.9, "page_count": 1, "pages": []}
+            if stage == "enhance":
+                return {"enhanced_text": " ".join(artifacts["ocr"]["text"].split())}
+            return {"fields": {"name": artifacts["enhance"]["enhanced_text"].split(": ")[1], "dob": "01/02/1980"}}
+        return run
+
+    def checkpoints(self):
+        return dict(self.document.stages.values_list("stage", "fingerprint"))
+
+    def test_first_run_checkpoints_every_stage_and_saves_results(self):
+        result = run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.assertEqual(result["ran"], list(STAGES))
+        self.assertEqual(result["reused"], [])
+        self.assertEqual(self.checkpoints(), FINGERPRINTS)
+
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.name, "John Smith")
+        self.assertEqual(self.document.dob_date.year, 1980)
+        text = self.document.get_text()
+        self.assertEqual((text.raw_ocr_text, text.enhanced_text), ("Name:   John Smith", "Name: John Smith"))
+
+    def test_rerun_with_unchanged_config_reuses_everything(self):
+        run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.calls.clear()
+        result = run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(result["reused"], list(STAGES))
+        self.assertEqual(result["fields"]["name"], "John Smith")
+
+    def test_failed_stage_keeps_earlier_checkpoints_and_resumes_there(self):
+        self.fail.add("enhance")
+        with self.assertRaises(StageFailed) as raised:
+            run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.assertEqual(raised.exception.stage, "enhance")
+        self.assertEqual(set(self.checkpoints()), {"rasterize", "ocr"})
+
+        self.fail.clear()
+        self.calls.clear()
+        result = run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.assertEqual(self.calls, ["enhance", "extract"])
+        self.assertEqual(result["reused"], ["rasterize", "ocr"])
+
+    def test_stale_fingerprint_reruns_from_that_stage(self):
+        run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.calls.clear()
+        run_pipeline(self.document, fingerprints={**FINGERPRINTS, "enhance": "enhance-v2", "extract": "extract-v2"})
+        self.assertEqual(self.calls, ["enhance", "extract"])
+        self.assertEqual(self.checkpoints()["extract"], "extract-v2")
+
+    def test_start_forces_a_rerun(self):
+        run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.calls.clear()
+        run_pipeline(self.document, start="ocr", fingerprints=FINGERPRINTS)
+        self.assertEqual(self.calls, ["ocr", "enhance", "extract"])
+
+    def test_missing_pages_are_rasterized_again(self):
+        run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        os.remove(os.path.join(pipeline.pages_dir(self.document.id), "page-1.png"))
+        self.calls.clear()
+        run_pipeline(self.document, start="ocr", fingerprints=FINGERPRINTS)
+        self.assertEqual(self.calls, list(STAGES))
+
+    def test_checkpoint_write_failure_is_a_stage_failure(self):
+        with mock.patch.object(pipeline, "_checkpoint", side_effect=RuntimeError("disk full")):
+            with self.assertRaises(StageFailed) as raised:
+                run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.assertEqual(raised.exception.stage, "rasterize")
+        self.assertFalse(ProcessingStage.objects.filter(document=self.document).exists())
+
+    def test_failed_final_write_leaves_extract_stale(self):
+        with mock.patch.object(Document, "save", side_effect=RuntimeError("db gone")):
+            with self.assertRaises(StageFailed) as raised:
+                run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.assertEqual(raised.exception.stage, "extract")
+        self.assertNotIn("extract", self.checkpoints())
+
+        self.calls.clear()
+        run_pipeline(self.document, fingerprints=FINGERPRINTS)
+        self.assertEqual(self.calls, ["extract"])
@@ -0,0 +1,91 @@
+from django.test import SimpleTestCase
+
+from myapp.prompt_budget import (
+    JUNK_CONFIDENCE, compress_ocr_text, count_tokens, drop_weak_words, fit_prompt, truncate_to_tokens,
+)
+
+
+def words(*readings):
+    """OCR words in reading order from (text, confidence) pairs"""
+    return [{"text": text, "confidence": confidence} for text, confidence in readings]
+
+
+class DropWeakWordsTests(SimpleTestCase):
+    weak = JUNK_CONFIDENCE / 2
+
+    def test_drops_weak_symbol_tokens(self):
+        text = "Name: ;;' John"
+        ocr = words(("Name:", 0.9), (";;'", self.weak), ("John", 0.9))
+        self.assertEqual(drop_weak_words(text, ocr), "Name: John")
+
+    def test_keeps_weak_alphanumeric_tokens(self):
+        text = "State: IL M"
+        ocr = words(("State:", 0.9), ("IL", self.weak), ("M", self.weak))
+        self.assertEqual(drop_weak_words(text, ocr), text)
+
+    def test_only_the_weak_occurrence_is_dropped(self):
+        text = "a ;;' b\nc ;;' d"
+        ocr = words(("a", 0.9), (";;'", self.weak), ("b", 0.9), ("c", 0.9), (";;'", 0.95), ("d", 0.9))
+        self.assertEqual(drop_weak_words(text, ocr), "a b\nc ;;' d")
+
+    def test_unaligned_tokens_are_kept(self):
+        self.assertEqual(drop_weak_words("x ~~ y", words(("q", self.weak))), "x ~~ y")
+
+
+class CompressOcrTextTests(SimpleTestCase):
+    def test_collapses_separators_junk_and_duplicate_lines(self):
+        text = "Name: John\nName: John\n----------\nDOB  |  01/02/1980\n\n\n\nCity: Springfield"
+        self.assertEqual(compress_ocr_text(text), "Name: John\nDOB 01/02/1980\n\nCity: Springfield")
+
+    def test_drops_repeated_page_furniture(self):
+        pages = ["ACME Insurance\nName: John", "ACME Insurance\nCity: Springfield"]
+        compressed = compress_ocr_text("\n\n".join(pages), pages=pages)
+        self.assertEqual(compressed.count("ACME Insurance"), 1)
+        self.assertIn("City: Springfield", compressed)
+
+    def test_drops_weak_words_per_page(self):
+        pages = ["Name: ;;' John", "City: ;;' Springfield"]
+        page_words = [
+            words(("Name:", 0.9), (";;'", 0.1), ("John", 0.9)),
+            words(("City:", 0.9), (";;'", 0.9), ("Springfield", 0.9)),
+        ]
+        compressed = compress_ocr_text("\n\n".join(pages), pages=pages, page_words=page_words)
+        self.assertEqual(compressed, "Name: John\n\nCity: ;;' Springfield")
+
+
+class BudgetTests(SimpleTestCase):
+    def build(self, text):
+        return f"Clean this OCR text.\nOCR text:\n{text}"
+
+    def test_truncate_cuts_at_line_breaks_within_budget(self):
+        text = "\n".join(f"line number {i}" for i in range(200))
+        truncated = truncate_to_tokens(text, 50)
+        self.assertLessEqual(count_tokens(truncated), 50)
+        self.assertTrue(text.startswith(truncated))
+        self.assertTrue(truncated.endswith(str(len(truncated.splitlines()) - 1)))
+
+    def test_truncate_cuts_a_single_oversized_line(self):
+        truncated = truncate_to_tokens("word " * 500, 20)
+        self.assertLessEqual(count_tokens(truncated), 20)
+        self.assertTrue(truncated)
+        self.assertEqual(truncate_to_tokens("anything", 0), "")
+
+    def fit(self, text, budget):
+        with self.assertLogs("myapp.prompt_budget", "INFO") as logs:
+            result = fit_prompt("test", self.build, text, budget)
+        self.assertIn(f"(budget {budget})", logs.output[0])
+        return result
+
+    def test_fit_prompt_keeps_prompts_that_fit(self):
+        prompt, used = self.fit("Name: John", 100)
+        self.assertEqual(prompt, self.build("Name: John"))
+        self.assertEqual(used, "Name: John")
+
+    def test_fit_prompt_trims_text_to_the_budget(self):
+        text = "\n".join(f"Field {i}: value {i}" for i in range(300))
+        for budget in (40, 128, 512):
+            with self.subTest(budget=budget):
+                prompt, used = self.fit(text, budget)
+                self.assertLessEqual(count_tokens(prompt), budget)
+                self.assertEqual(prompt, self.build(used))
+                self.assertTrue(text.startswith(used))
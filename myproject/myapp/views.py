@@ -1,26 +1,41 @@
 """
 API Views for document upload, processing, and chat functionality
 """
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.views.decorators.http import condition, require_http_methods
+from rest_framework.authentication import CSRFCheck
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+import json
 import os
 
-from .models import Document, ChatMessage
-from .ocr_utils import extract_text_document
-from .llm_utils import process_ocr_text, answer_query
+from .admission import admission
+from .models import Document, ChatMessage, ProcessingRun, ProcessingStage
+from .llm_utils import aanswer_query
+from .pipeline import STAGES, StageFailed, record_processing_run, run_pipeline
+from .previews import (
+    PREVIEW_MAX_AGE, PREVIEW_SIZES, preview_etag, preview_last_modified, preview_path,
+    preview_stat, try_ensure_previews, try_render_previews,
+)
+from .filters import FilterError, facet_counts, parse_facets, parse_filters
+from .metrics import REGISTRY, incr, stage_timer, track_run
 
 
+@ensure_csrf_cookie
 def index(request):
-    """Home page with upload interface"""
+    """Home page with upload interface (sets the CSRF cookie the page's chat requests send back)"""
     return render(request, 'index.html')
 
 
 @api_view(['POST'])
+@admission('upload')
 def upload_document(request):
     """
     Upload and process a document (image or PDF)
@@ -44,156 +59,284 @@ def upload_document(request):
     # Determine file type
     file_type = 'pdf' if file_ext == '.pdf' else 'image'
     
+    document = None
+    run = None
     try:
-        # Create document record
-        document = Document.objects.create(
-            uploaded_file=uploaded_file,
-            file_type=file_type
-        )
-        
-        # Get file path
-        file_path = document.uploaded_file.path
-        
-        # Step 1: Run OCR
-        ocr_result = extract_text_document(file_path, psm=6, oem=3, lang='eng')
-        raw_ocr_text = ocr_result['combined_text']
-        document.raw_ocr_text = raw_ocr_text
-        
-        # Step 2: Process with LLM
-        llm_result = process_ocr_text(raw_ocr_text)
-        document.enhanced_text = llm_result['enhanced_text']
+        with track_run() as run:
+            # Create document record
+            with stage_timer('store_upload'):
+                document = Document.objects.create(
+                    uploaded_file=uploaded_file,
+                    file_type=file_type
+                )
+            
+            # Rasterize -> OCR -> enhance -> extract, checkpointing each stage (see myapp.pipeline),
+            # then save the extracted fields and the text
+            result = run_pipeline(document)
+            
+            # Previews from the pages OCR already rasterized
+            try_render_previews(document, result['images'])
         
-        # Step 3: Save extracted fields
-        fields = llm_result['fields']
-        document.name = fields.get('name', '')
-        document.dob = fields.get('dob', '')
-        document.address = fields.get('address', '')
-        document.city = fields.get('city', '')
-        document.state = fields.get('state', '')
-        document.phone = fields.get('phone', '')
-        document.email = fields.get('email', '')
-        document.gender = fields.get('gender', '')
-        document.date = fields.get('date', '')
-        
-        document.save()
+        record_processing_run(document, run)
         
         # Return success with extracted data
         return Response({
             'success': True,
             'document_id': document.id,
             'message': 'Document processed successfully',
-            'extracted_data': {
-                'name': document.name,
-                'dob': document.dob,
-                'address': document.address,
-                'city': document.city,
-                'state': document.state,
-                'phone': document.phone,
-                'email': document.email,
-                'gender': document.gender,
-                'date': document.date,
-            },
-            'enhanced_text': document.enhanced_text
+            'extracted_data': document.extracted_data(),
+            'enhanced_text': result['enhanced_text']
         }, status=status.HTTP_201_CREATED)
         
+    except StageFailed as e:
+        # The stages before the failed one are kept; reprocessing resumes from here
+        record_processing_run(document, run, error=e)
+        return Response({
+            'error': f'Error processing document: {str(e)}',
+            'document_id': document.id,
+            'failed_stage': e.stage,
+            'retry_url': reverse('reprocess_document', args=[document.id]),
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     except Exception as e:
+        if document is not None and run is not None:
+            record_processing_run(document, run, error=e)
         return Response({
             'error': f'Error processing document: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@admission('upload')
+def reprocess_document(request, document_id):
+    """
+    Re-run the stages of a document's pipeline that are missing, failed or stale.
+    Optional 'from' (a stage name) forces that stage and everything after it.
+    """
+    document = get_object_or_404(Document, id=document_id)
+    start = request.data.get('from') or None
+    if start is not None and start not in STAGES:
+        return Response({'error': f"'from' must be one of: {', '.join(STAGES)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        with track_run() as run:
+            result = run_pipeline(document, start=start)
+            if 'rasterize' in result['ran']:
+                try_render_previews(document, result['images'])
+    except StageFailed as e:
+        record_processing_run(document, run, error=e)
+        return Response({'error': str(e), 'document_id': document.id, 'failed_stage': e.stage},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except Exception as e:
+        record_processing_run(document, run, error=e)
+        return Response({'error': f'Error processing document: {str(e)}', 'document_id': document.id},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if result['ran']:
+        record_processing_run(document, run)
+    return Response({
+        'success': True,
+        'document_id': document.id,
+        'stages_run': result['ran'],
+        'stages_reused': result['reused'],
+        'extracted_data': document.extracted_data(),
+    })
+
+
+def _document_version(request, document_id):
+    """(version, updated_at) of the document, read once per request; None if it does not exist"""
+    if not hasattr(request, '_document_version'):
+        request._document_version = (
+            Document.objects.filter(id=document_id).values_list('version', 'updated_at').first()
+        )
+    return request._document_version
+
+
+def _document_etag(request, document_id):
+    version = _document_version(request, document_id)
+    return f'"{document_id}-{version[0]}"' if version else None
+
+
+def _document_last_modified(request, document_id):
+    version = _document_version(request, document_id)
+    return version[1] if version else None
+
+
+# ETag/Last-Modified from the document's version marker; matching conditional GETs get a 304
+document_condition = condition(etag_func=_document_etag, last_modified_func=_document_last_modified)
+
+
+def cached_payload(request, document_id, name, build):
+    """
+    Serialized response for one of the document's read endpoints, from the cache when possible.
+    Keys carry the document version, so any change to the document or its chat invalidates them.
+    """
+    version = _document_version(request, document_id)
+    if version is None:
+        return build()  # raises 404
+    key = f"document:{document_id}:v{version[0]}:{name}"
+    payload = cache.get(key)
+    if payload is None:
+        incr('response_cache_misses')
+        payload = build()
+        cache.set(key, payload, getattr(settings, 'RESPONSE_CACHE_SECONDS', 3600))
+    else:
+        incr('response_cache_hits')
+    return payload
+
+
 @api_view(['GET'])
+@cache_control(private=True, no_cache=True)
+@document_condition
 def get_document(request, document_id):
     """Get document details and extracted data"""
-    document = get_object_or_404(Document, id=document_id)
+    def build():
+        document = get_object_or_404(Document.objects.select_related('text'), id=document_id)
+        return {
+            'id': document.id,
+            'file_type': document.file_type,
+            'extracted_data': document.extracted_data(),
+            'enhanced_text': document.get_text().enhanced_text
+        }
     
-    return Response({
-        'id': document.id,
-        'file_type': document.file_type,
-        'extracted_data': {
-            'name': document.name,
-            'dob': document.dob,
-            'address': document.address,
-            'city': document.city,
-            'state': document.state,
-            'phone': document.phone,
-            'email': document.email,
-            'gender': document.gender,
-            'date': document.date,
-        },
-        'enhanced_text': document.enhanced_text
-    })
+    return Response(cached_payload(request, document_id, 'detail', build))
 
 
-@api_view(['POST'])
-def chat_with_document(request, document_id):
+def _request_data(request):
+    """JSON or form body of a plain (non-DRF) view"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+async def _session_csrf_failure(request):
+    """
+    DRF's CSRF rule for a plain view: only requests authenticated by a session must carry the
+    token, so API clients keep working as they do against the @api_view endpoints.
+    Returns a 403 response, or None when the request may proceed.
+    """
+    user = await request.auser()
+    if not (user.is_authenticated and user.is_active):
+        return None
+    check = CSRFCheck(lambda request: None)
+    check.process_request(request)
+    reason = check.process_view(request, None, (), {})
+    if reason:
+        return JsonResponse({'detail': f'CSRF Failed: {reason}'}, status=status.HTTP_403_FORBIDDEN)
+    return None
+
+
+@csrf_exempt  # checked in the view with the same rule as the DRF endpoints
+@require_http_methods(['POST'])
+@admission('chat')
+async def chat_with_document(request, document_id):
     """
     Chat with a document - ask questions about extracted data
+    Async: under ASGI the LLM call is awaited, so a slow completion holds no worker thread
     """
-    document = get_object_or_404(Document, id=document_id)
+    csrf_failure = await _session_csrf_failure(request)
+    if csrf_failure is not None:
+        return csrf_failure
+
+    try:
+        document = await Document.objects.select_related('text').aget(id=document_id)
+    except Document.DoesNotExist:
+        return JsonResponse({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    question = request.data.get('question', '').strip()
+    question = str(_request_data(request).get('question', '')).strip()
     if not question:
-        return Response({'error': 'Question is required'}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': 'Question is required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
         # Build context from enhanced text and structured fields
-        fields = {
-            'name': document.name,
-            'dob': document.dob,
-            'address': document.address,
-            'city': document.city,
-            'state': document.state,
-            'phone': document.phone,
-            'email': document.email,
-            'gender': document.gender,
-            'date': document.date,
-        }
+        fields = document.extracted_data()
         
         context = (
             "Structured fields:\n" + str(fields) + "\n\n" + 
-            "Clean text:\n" + document.enhanced_text
+            "Clean text:\n" + document.get_text().enhanced_text
         )
         
         # Get answer from LLM
-        answer = answer_query(question, context)
+        answer = await aanswer_query(question, context)
         
         # Save chat message
-        chat_message = ChatMessage.objects.create(
+        chat_message = await ChatMessage.objects.acreate(
             document=document,
             question=question,
             answer=answer
         )
         
-        return Response({
+        return JsonResponse({
             'question': question,
             'answer': answer,
             'created_at': chat_message.created_at
         })
         
     except Exception as e:
-        return Response({
+        return JsonResponse({
             'error': f'Error processing question: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@require_http_methods(['GET'])
+async def document_status(request, document_id):
+    """
+    Processing status of an upload, for polling: 'processing' until its run is recorded,
+    then that run's status ('success' or 'failed') with its timings. 'unknown' when there is
+    neither a run nor a pipeline checkpoint (e.g. documents stored before runs were recorded)
+    """
+    document = await Document.objects.filter(id=document_id).values('version', 'updated_at').afirst()
+    if document is None:
+        return JsonResponse({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
+    run = await (
+        ProcessingRun.objects.filter(document_id=document_id)
+        .values('status', 'duration', 'stage_timings', 'error', 'created_at')
+        .afirst()
+    )
+    stages = [
+        stage async for stage in
+        ProcessingStage.objects.filter(document_id=document_id).values_list('stage', flat=True)
+    ]
+    if run:
+        run_status = run['status']
+    else:
+        run_status = 'processing' if stages else 'unknown'
+    return JsonResponse({
+        'document_id': document_id,
+        'status': run_status,
+        'version': document['version'],
+        'updated_at': document['updated_at'],
+        'duration': run['duration'] if run else None,
+        'stage_timings': run['stage_timings'] if run else {},
+        'error': run['error'] if run else '',
+        'finished_at': run['created_at'] if run else None,
+        'stages_completed': [stage for stage in STAGES if stage in stages],
+    })
+
+
 @api_view(['GET'])
+@cache_control(private=True, no_cache=True)
+@document_condition
 def get_chat_history(request, document_id):
     """Get all chat messages for a document"""
-    document = get_object_or_404(Document, id=document_id)
-    messages = document.chat_messages.all()
+    def build():
+        document = get_object_or_404(Document.objects.only('id'), id=document_id)
+        messages = document.chat_messages.all()
+        return {
+            'document_id': document.id,
+            'messages': [
+                {
+                    'question': msg.question,
+                    'answer': msg.answer,
+                    'created_at': msg.created_at
+                }
+                for msg in messages
+            ]
+        }
     
-    return Response({
-        'document_id': document.id,
-        'messages': [
-            {
-                'question': msg.question,
-                'answer': msg.answer,
-                'created_at': msg.created_at
-            }
-            for msg in messages
-        ]
-    })
+    return Response(cached_payload(request, document_id, 'chat_history', build))
 
 
 @api_view(['GET'])
@@ -214,62 +357,89 @@ def list_documents(request):
     
     return Response({
         'count': documents.count(),
-        'documents': [
-            {
-                'id': doc.id,
-                'name': doc.name or 'Unnamed',
-                'dob': doc.dob,
-                'email': doc.email,
-                'phone': doc.phone,
-                'city': doc.city,
-                'state': doc.state,
-                'gender': doc.gender,
-                'file_type': doc.file_type
-            }
-            for doc in documents
-        ]
+        'documents': [document_summary(doc) for doc in documents]
+    })
+
+
+def document_summary(doc):
+    """One row of a document list"""
+    return {
+        'id': doc.id,
+        'name': doc.name or 'Unnamed',
+        'dob': doc.dob,
+        'email': doc.email,
+        'phone': doc.phone,
+        'city': doc.city,
+        'state': doc.state,
+        'zip': doc.zip,
+        'gender': doc.gender,
+        'policy_number': doc.policy_number,
+        'file_type': doc.file_type,
+        'thumbnail_url': reverse('document_preview', args=[doc.id, 1]) + '?size=thumb',
+    }
+
+
+@api_view(['GET'])
+def filter_documents(request):
+    """
+    Filter documents on indexed fields and count facets
+    - exact: ?state=CA, prefix: ?zip__prefix=94, range: ?dob__gte=1980-01-01&dob__lt=1990-01-01
+    - ?facets=state,gender adds per-value counts over the filtered set
+    - ?limit= / ?offset= page through the matches
+    """
+    try:
+        documents = Document.objects.filter(parse_filters(request.GET))
+        facets = parse_facets(request.GET.get('facets'))
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+        offset = max(int(request.GET.get('offset', 0)), 0)
+    except (FilterError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    page = documents.order_by('-id')[offset:offset + limit]
+    return Response({
+        'count': documents.count(),
+        'limit': limit,
+        'offset': offset,
+        'documents': [document_summary(doc) for doc in page],
+        'facets': facet_counts(documents, facets),
     })
 
 
 @api_view(['GET'])
+@cache_control(private=True, no_cache=True)
+@document_condition
 def download_json_report(request, document_id):
     """Download document data as JSON"""
-    from django.http import JsonResponse
-    
-    document = get_object_or_404(Document, id=document_id)
-    
-    data = {
-        'document_id': document.id,
-        'file_type': document.file_type,
-        'extracted_fields': {
-            'name': document.name,
-            'dob': document.dob,
-            'address': document.address,
-            'city': document.city,
-            'state': document.state,
-            'phone': document.phone,
-            'email': document.email,
-            'gender': document.gender,
-            'date': document.date,
-        },
-        'raw_ocr_text': document.raw_ocr_text,
-        'enhanced_text': document.enhanced_text,
-    }
+
+    def build():
+        document = get_object_or_404(Document.objects.select_related('text'), id=document_id)
+        text = document.get_text()
+        return {
+            'document_id': document.id,
+            'file_type': document.file_type,
+            'extracted_fields': document.extracted_data(),
+            'raw_ocr_text': text.raw_ocr_text,
+            'enhanced_text': text.enhanced_text,
+        }
     
+    data = cached_payload(request, document_id, 'report_json', build)
     response = JsonResponse(data, json_dumps_params={'indent': 2})
     response['Content-Disposition'] = f'attachment; filename="document_{document_id}_report.json"'
     return response
 
 
 @api_view(['GET'])
+@cache_control(private=True, no_cache=True)
+@document_condition
 def download_text_report(request, document_id):
     """Download document data as TXT"""
-    from django.http import HttpResponse
-    
-    document = get_object_or_404(Document, id=document_id)
-    
-    # Build text report
-    report = f"""
+
+    def build():
+        document = get_object_or_404(Document.objects.select_related('text'), id=document_id)
+        text = document.get_text()
+        
+        # Build text report
+        report = f"""
 DOCUMENT EXTRACTION REPORT
 {'='*50}
 
@@ -283,21 +453,69 @@ Date of Birth: {document.dob}
 Address: {document.address}
 City: {document.city}
 State: {document.state}
+Zip: {document.zip}
 Phone: {document.phone}
 Email: {document.email}
 Gender: {document.gender}
+Marital Status: {document.marital_status}
+Occupation: {document.occupation}
+Emergency Contact: {document.emergency_contact_name}
+Emergency Contact Phone: {document.emergency_contact_phone}
+Policy Number: {document.policy_number}
 Date: {document.date}
 
 RAW OCR TEXT:
 {'='*50}
-{document.raw_ocr_text}
+{text.raw_ocr_text}
 
 ENHANCED TEXT:
 {'='*50}
-{document.enhanced_text}
+{text.enhanced_text}
 """
+        return report
     
+    report = cached_payload(request, document_id, 'report_txt', build)
     response = HttpResponse(report, content_type='text/plain')
     response['Content-Disposition'] = f'attachment; filename="document_{document_id}_report.txt"'
     return response
 
+
+
+def metrics(request):
+    """Prometheus text endpoint for stage latency histograms and pipeline counters"""
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _preview_stat(request, document_id, page):
+    """Stat of the requested preview, rendering the document's previews on first use"""
+    if not hasattr(request, '_preview_stat'):
+        request._preview_stat = None
+        size = request.GET.get('size', 'full')
+        document = Document.objects.filter(id=document_id).only('id', 'uploaded_file').first()
+        if size in PREVIEW_SIZES and document is not None and try_ensure_previews(document):
+            request._preview_stat = preview_stat(document_id, page, size)
+    return request._preview_stat
+
+
+def _preview_etag(request, document_id, page):
+    stat = _preview_stat(request, document_id, page)
+    return preview_etag(stat) if stat else None
+
+
+def _preview_last_modified(request, document_id, page):
+    stat = _preview_stat(request, document_id, page)
+    return preview_last_modified(stat) if stat else None
+
+
+@require_http_methods(['GET', 'HEAD'])
+@cache_control(public=True, max_age=PREVIEW_MAX_AGE)
+@condition(etag_func=_preview_etag, last_modified_func=_preview_last_modified)
+def document_preview(request, document_id, page):
+    """
+    Page preview image (?size=full, default) or thumbnail (?size=thumb)
+    Rendered once and served with ETag/Last-Modified; revalidation returns 304
+    """
+    if _preview_stat(request, document_id, page) is None:
+        raise Http404('No such page preview')
+    size = request.GET.get('size', 'full')
+    return FileResponse(open(preview_path(document_id, page, size), 'rb'), content_type='image/jpeg')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'myapp.profiling.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -118,10 +120,74 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Cache for serialized read responses (myapp.views.cached_payload). Keys include the
+# document version, so a change never serves stale data. Local memory is per process;
+# point this at Redis/Memcached to share it between workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'myapp-responses',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    }
+}
+RESPONSE_CACHE_SECONDS = 3600
+
+# Admission control (myapp.admission): per endpoint, at most `concurrency` requests are
+# served at once and `queue` more wait up to `queue_timeout` seconds; a client holds at most
+# `per_client` of both. Anything beyond is answered 429 with a Retry-After estimate.
+# Limits are per process, so size them per worker. Defaults are DEFAULT_LIMITS in
+# myapp/admission.py; list only the values to change, e.g. {'upload': {'concurrency': 4}}.
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1') != '0'
+ADMISSION_LIMITS = {}
+# Key clients by the first X-Forwarded-For hop; only enable behind a trusted proxy
+ADMISSION_TRUST_FORWARDED_FOR = False
+
 # Media files (uploaded content)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# OCR engine routing (myapp.ocr_engines)
+# Engines run in order; a page escalates to the next one while its confidence is
+# below the threshold. Add 'donut' to escalate to the Donut model from DONUT OCR/.
+OCR_ENGINES = ['tesseract']
+OCR_ESCALATION_THRESHOLD = 0.6  # mean Tesseract word confidence, 0-1
+DONUT_OCR_DIR = BASE_DIR.parent / 'DONUT OCR'
+DONUT_MODEL = 'naver-clova-ix/donut-base-finetuned-cord-v2'
+DONUT_BACKEND = 'eager'  # or 'int8' / 'onnx'
+DONUT_TASK = 'cord-v2'
+# Pages whose (re-OCR'd) confidence reaches this skip the LLM clean-up pass; None always enhances
+OCR_SKIP_ENHANCE_CONFIDENCE = 0.9
+
+# LLM backend (myapp.llm_providers)
+# 'openai' (also any OpenAI-compatible server via OPENAI_BASE_URL), 'ollama' for a local
+# Ollama, or 'fake' for deterministic offline answers in tests and benchmarks
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'openai')
+LLM_MODEL = os.getenv('LLM_MODEL') or None  # None = provider default (gpt-4o-mini / llama3)
+LLM_TIMEOUT = 120  # seconds per completion request
+OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://127.0.0.1:11434')
+OLLAMA_KEEP_ALIVE = '30m'  # keep the local model loaded between requests
+
+# Log myapp events (e.g. prompt token counts before/after budgeting) to the console
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'myapp': {'handlers': ['console'], 'level': os.getenv('MYAPP_LOG_LEVEL', 'INFO')},
+    },
+}
+
+# Request profiling (myapp.profiling.ProfilingMiddleware)
+# Off by default; a request can opt in with a signed header from `manage.py profiling_token`
+PROFILING_ENABLED = False
+PROFILING_HEADER = 'X-Profile-Token'
+PROFILING_TOKEN_MAX_AGE = 3600  # seconds a signed token stays valid
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_PROFILES = 50  # oldest profiles are deleted beyond this
+PROFILING_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -19,7 +19,12 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from myapp import profiling
+
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profiling.profiles_view), name='profiles'),
+    path('admin/profiles/<str:profile_id>/<str:kind>/', admin.site.admin_view(profiling.profile_download),
+         name='profile_download'),
     path('admin/', admin.site.urls),
     path('', include('myapp.urls')),
 ]